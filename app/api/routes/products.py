@@ -3,6 +3,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Optional
 from pydantic import BaseModel
+from app.core.cache import purge_product_cache
 from app.db.supabase import get_supabase
 
 router = APIRouter()
@@ -78,6 +79,7 @@ async def create_product(product: ProductCreate):
     try:
         supabase = get_supabase()
         response = supabase.table('products').insert(product.dict()).execute()
+        await purge_product_cache([product.code], [product.meat_type])
         return response.data[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -87,6 +89,8 @@ async def update_product(code: str, product: ProductBase):
     """Update a product."""
     try:
         supabase = get_supabase()
+        # The old meat type is needed to purge alternatives of its former group
+        existing = supabase.table('products').select('meat_type').eq('code', code).execute()
         response = supabase.table('products').update(
             product.dict()
         ).eq('code', code).execute()
@@ -94,6 +98,8 @@ async def update_product(code: str, product: ProductBase):
         if not response.data:
             raise HTTPException(status_code=404, detail="Product not found")
             
+        old_meat_types = [row.get('meat_type') for row in existing.data or []]
+        await purge_product_cache([code], old_meat_types + [product.meat_type])
         return response.data[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -108,6 +114,8 @@ async def delete_product(code: str):
         if not response.data:
             raise HTTPException(status_code=404, detail="Product not found")
             
+        await purge_product_cache([code], [row.get('meat_type') for row in response.data])
+        
         return {"message": "Product deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""Async product endpoints for the MeatWise API.
+
+The hottest product reads (count, product by code, alternatives) served from an
+AsyncSession, so they run on the event loop instead of holding a threadpool
+thread while waiting on the database. They read from a replica when one is
+healthy (see app/db/replicas.py). Responses, ETags and cache tags match the
+sync routes in products.py; this router is mounted ahead of them when
+async_db_enabled() is true.
+"""
+
+from typing import Any, Dict, List
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1 import models
+from app.api.v1.endpoints.products import build_alternatives_response
+from app.core.cache import CATALOG_TAG, SURROGATE_KEY_HEADER, meat_type_tag, product_tag, surrogate_keys
+from app.db import models as db_models
+from app.db.async_session import get_async_read_db
+from app.db.projections import PRODUCT_ALTERNATIVE, PRODUCT_DETAIL
+from app.utils import conditional, helpers
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+router = APIRouter()
+
+
+@router.get("/count", response_model=Dict[str, int])
+async def get_product_count(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
+) -> Any:
+    """
+    Get the total count of products in the database.
+
+    Responds with 304 Not Modified when the client's ETag or Last-Modified
+    still matches the current count and latest product update.
+
+    Args:
+        request: Incoming request (for conditional headers)
+        response: Outgoing response (for validator headers)
+        db: Async database session
+
+    Returns:
+        Dict[str, int]: Total count of products
+    """
+    try:
+        result, last_modified = (await db.execute(
+            select(func.count(), func.max(db_models.Product.last_updated)).select_from(db_models.Product)
+        )).one()
+    except Exception as e:
+        logger.error(f"Error getting product count: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error getting product count: {str(e)}"
+        )
+
+    etag = conditional.make_etag("count", result, last_modified)
+    if conditional.is_not_modified(request.headers, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    conditional.set_validators(response, etag, last_modified)
+    response.headers[SURROGATE_KEY_HEADER] = surrogate_keys(CATALOG_TAG)
+    return {"count": result or 0}
+
+
+@router.get("/{code}")
+async def get_product(
+    code: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
+) -> Any:
+    """
+    Get a specific product by barcode with a structured response format.
+
+    Conditional requests are answered with 304 from a primary-key lookup of
+    code and last_updated without loading the full row.
+
+    Args:
+        code: Product barcode
+        request: Incoming request (for conditional headers)
+        response: Outgoing response (for validator headers)
+        db: Async database session
+
+    Returns:
+        dict: Structured product details
+
+    Raises:
+        HTTPException: If product not found or if there's an error processing the data
+    """
+    try:
+        # Look up validators first so conditional requests never load the full row
+        meta = (await db.execute(
+            select(db_models.Product.code, db_models.Product.last_updated)
+            .where(db_models.Product.code == code)
+        )).first()
+
+        if not meta:
+            logger.warning(f"Product with code {code} not found")
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        etag = None
+        if meta.last_updated is not None:
+            etag = conditional.make_etag("product", meta.code, meta.last_updated)
+            if conditional.is_not_modified(request.headers, etag, meta.last_updated):
+                return conditional.not_modified(etag, meta.last_updated)
+
+        product = await db.get(db_models.Product, code, options=[PRODUCT_DETAIL])
+        if not product:
+            logger.warning(f"Product with code {code} not found")
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        structured_response = helpers.build_health_assessment_input(product)
+
+        # Products without last_updated fall back to a hash of the response content
+        if etag is None:
+            etag = conditional.content_etag(structured_response.model_dump_json().encode())
+            if conditional.is_not_modified(request.headers, etag):
+                return conditional.not_modified(etag)
+        conditional.set_validators(response, etag, meta.last_updated)
+        response.headers[SURROGATE_KEY_HEADER] = surrogate_keys(product_tag(code))
+
+        return structured_response
+
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving product: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error retrieving product: {str(e)}"
+        )
+
+
+@router.get("/{code}/alternatives", response_model=List[models.ProductAlternative])
+async def get_product_alternatives(
+    code: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
+) -> Any:
+    """
+    Get alternative products for a specific product.
+
+    The ETag covers the product's risk rating plus the count and latest
+    update of its meat type group, as in the sync route.
+
+    Args:
+        code: Product barcode
+        request: Incoming request (for conditional headers)
+        response: Outgoing response (for validator headers)
+        db: Async database session
+
+    Returns:
+        List[models.ProductAlternative]: List of alternative products
+
+    Raises:
+        HTTPException: If product not found
+    """
+    try:
+        # Check if product exists, loading only the columns alternatives depend on
+        product = (await db.execute(
+            select(
+                db_models.Product.code,
+                db_models.Product.meat_type,
+                db_models.Product.risk_rating,
+                db_models.Product.last_updated,
+            )
+            .where(db_models.Product.code == code)
+        )).first()
+
+        if not product:
+            logger.warning(f"Product with code {code} not found")
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        group_count, group_last_updated = (await db.execute(
+            select(func.count(db_models.Product.code), func.max(db_models.Product.last_updated))
+            .where(db_models.Product.meat_type == product.meat_type)
+        )).one()
+        etag = conditional.make_etag(
+            "alternatives", code, product.meat_type, product.risk_rating, group_count, group_last_updated
+        )
+        last_modified = max(
+            (ts for ts in (product.last_updated, group_last_updated) if ts is not None),
+            default=None,
+        )
+        if conditional.is_not_modified(request.headers, etag, last_modified):
+            return conditional.not_modified(etag, last_modified)
+
+        # Find alternative products with similar characteristics
+        alternatives = (await db.execute(
+            select(db_models.Product)
+            .options(PRODUCT_ALTERNATIVE)
+            .where(db_models.Product.meat_type == product.meat_type)
+            .where(db_models.Product.code != code)
+            .where(db_models.Product.risk_rating < product.risk_rating)
+            .limit(5)
+        )).scalars().all()
+
+        conditional.set_validators(response, etag, last_modified)
+        response.headers[SURROGATE_KEY_HEADER] = surrogate_keys(product_tag(code), meat_type_tag(product.meat_type))
+
+        return build_alternatives_response(alternatives)
+
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(f"Error processing product alternatives: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing product alternatives: {str(e)}"
+        )
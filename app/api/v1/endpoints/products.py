@@ -1,23 +1,29 @@
 """Product endpoints for the MeatWise API."""
 
-from typing import Any, List, Optional, Dict, Tuple, Union
+from typing import Any, List, Literal, Optional, Dict, Tuple, Union
 import logging
 import os
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 import uuid
 
 from app.api.v1 import models
+from app.core.cache import (
+    CATALOG_TAG, NO_STORE_HEADER, SURROGATE_KEY_HEADER, meat_type_tag, product_tag, surrogate_keys
+)
 from app.db import models as db_models
-from app.db.connection import get_db, get_supabase_client, is_using_local_db
-from app.utils import helpers
+from app.db.connection import get_supabase_client, is_using_local_db
+from app.db.projections import PRODUCT_ALTERNATIVE, PRODUCT_DETAIL, PRODUCT_LISTING, loaded_columns
+from app.db.session import get_read_db
+from app.utils import conditional, helpers
+from app.utils.pagination import NEXT_CURSOR_HEADER, InvalidCursor, decode_cursor, fetch_page, next_cursor
 from app.internal.dependencies import get_current_active_user
 from app.services.recommendation_service import (
     get_personalized_recommendations, analyze_product_match
 )
-from app.services.health_assessment_service import generate_health_assessment
+from app.services.health_assessment_service import generate_health_assessment, is_fallback_assessment
 from app.utils.personalization import apply_user_preferences
 
 # Configure logging for this module
@@ -26,14 +32,36 @@ logger.setLevel(logging.INFO)
 
 router = APIRouter()
 
+# Sort orders of the product list, each ending with the unique code. Every
+# filter and sort combination pages along an index, equality filters first:
+# (code), (meat_type, code), (risk_rating, code) and (meat_type, risk_rating,
+# code) from migration 20250602000000_products_keyset_pagination, and
+# (risk_rating, meat_type, code) from 20250603000000_products_risk_meat_pagination.
+PRODUCT_SORTS = {
+    "code": ("code",),
+    "meat_type": ("meat_type", "code"),
+    "risk_rating": ("risk_rating", "code"),
+}
+
+# Risk ratings behind the numeric risk_rating filter values accepted before
+# the filter took the rating itself, in green-to-red order
+LEGACY_RISK_RATINGS = {"0": "Green", "1": "Yellow", "2": "Red"}
+
 @router.get("/count", response_model=Dict[str, int])
 def get_product_count(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
 ) -> Any:
     """
     Get the total count of products in the database.
     
+    Responds with 304 Not Modified when the client's ETag or Last-Modified
+    still matches the current count and latest product update.
+    
     Args:
+        request: Incoming request (for conditional headers)
+        response: Outgoing response (for validator headers)
         db: Database session
         
     Returns:
@@ -43,9 +71,17 @@ def get_product_count(
         logger.info(f"Getting product count (using local DB: {is_using_local_db()})")
         
         try:
-            # Try an optimized SQL count that's more efficient than ORM
-            from sqlalchemy import text
-            result = db.execute(text("SELECT COUNT(*) FROM products")).scalar()
+            # Try an optimized SQL count that's more efficient than ORM;
+            # MAX(last_updated) is typed so it comes back as a datetime on every backend
+            from sqlalchemy import select
+            result, last_modified = db.execute(
+                select(func.count(), func.max(db_models.Product.last_updated)).select_from(db_models.Product)
+            ).one()
+            etag = conditional.make_etag("count", result, last_modified)
+            if conditional.is_not_modified(request.headers, etag, last_modified):
+                return conditional.not_modified(etag, last_modified)
+            conditional.set_validators(response, etag, last_modified)
+            response.headers[SURROGATE_KEY_HEADER] = surrogate_keys(CATALOG_TAG)
             return {"count": result or 0}
         except Exception as sql_err:
             logger.warning(f"Optimized count failed, falling back to ORM: {str(sql_err)}")
@@ -64,8 +100,8 @@ def get_product_count(
                         with get_supabase_client() as supabase:
                             # Use a more efficient query that doesn't try to count exact records
                             # but instead gets the first 1000 and returns that count
-                            response = supabase.table("products").select("code").limit(1000).execute()
-                            return {"count": len(response.data), "note": "Approximate count"}
+                            sb_response = supabase.table("products").select("code").limit(1000).execute()
+                            return {"count": len(sb_response.data), "note": "Approximate count"}
                     except Exception as sb_err:
                         logger.error(f"All count methods failed: {str(sb_err)}")
                         
@@ -80,50 +116,91 @@ def get_product_count(
 
 @router.get("/", response_model=List[models.Product])
 def get_products(
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
-    risk_rating: Optional[int] = None,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    skip: int = Query(0, ge=0, deprecated=True, description="Records to skip on the first page; use cursor instead"),
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    sort: Literal["code", "meat_type", "risk_rating"] = "code",
+    meat_type: Optional[str] = None,
+    risk_rating: Optional[str] = Query(
+        None, description="Risk rating (Green, Yellow or Red); the legacy values 0, 1 and 2 are still accepted"
+    ),
     current_user: db_models.User = Depends(get_current_active_user)
 ) -> Any:
     """
-    Retrieve products with optional filtering and preference-based sorting.
+    Retrieve products with optional filtering, one page at a time.
+    
+    Pages use keyset pagination: each response carries the cursor of the next
+    page in the X-Next-Cursor header (absent on the last page), and a page
+    costs the same at any depth.
     
     Args:
+        response: Outgoing response (for cache tags and the next cursor)
         db: Database session
-        skip: Number of records to skip
+        skip: Number of records to skip (first page only; deprecated)
         limit: Maximum number of records to return
-        risk_rating: Filter by risk rating
+        cursor: Cursor of the page to return
+        sort: Sort order, by code or by a filter column then code
+        meat_type: Filter by meat type
+        risk_rating: Filter by risk rating, or its legacy numeric value
         current_user: Current active user
         
     Returns:
         List[models.Product]: List of products
+        
+    Raises:
+        HTTPException: If the cursor is invalid
     """
     try:
         logger.info(f"Getting products (using local DB: {is_using_local_db()})")
         
+        keys = PRODUCT_SORTS[sort]
+        try:
+            key = decode_cursor(cursor, sort, len(keys)) if cursor else None
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
+        
         # Using SQLAlchemy ORM for either local or production database
-        # Build query
-        query = db.query(db_models.Product)
+        # Build query (list responses leave out image_data)
+        query = db.query(db_models.Product).options(PRODUCT_LISTING)
         
+        if meat_type is not None:
+            query = query.filter(db_models.Product.meat_type == meat_type)
+            logger.debug("Added meat type filter")
         if risk_rating is not None:
+            risk_rating = LEGACY_RISK_RATINGS.get(risk_rating.strip(), risk_rating)
             query = query.filter(db_models.Product.risk_rating == risk_rating)
             logger.debug("Added risk rating filter")
         
-        # Add pagination
-        query = query.offset(skip).limit(limit)
-        logger.debug("Added pagination")
-        
-        # Execute query
-        products = query.all()
+        # Execute query, one page after the cursor
+        columns = [getattr(db_models.Product, name) for name in keys]
+        if key is None and skip:
+            # Deprecated offset paging: the page starts after the row before
+            # the offset, found by scanning past the skipped rows
+            row = (
+                query.with_entities(*columns)
+                .order_by(*(column.asc().nulls_last() for column in columns))
+                .offset(skip - 1)
+                .first()
+            )
+            products = fetch_page(query, columns, list(row), limit) if row else []
+        else:
+            products = fetch_page(query, columns, key, limit)
+        response.headers[SURROGATE_KEY_HEADER] = surrogate_keys(CATALOG_TAG)
+        next_page = next_cursor(products, sort, keys, limit)
+        if next_page:
+            response.headers[NEXT_CURSOR_HEADER] = next_page
         
         if not products:
             logger.warning("No products found")
             return []
             
         # Convert to Pydantic models
-        return [models.Product.from_orm(product) for product in products]
+        return [models.Product.model_validate(loaded_columns(product)) for product in products]
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving products: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -132,13 +209,21 @@ def get_products(
 @router.get("/{code}")
 def get_product(
     code: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
 ) -> Any:
     """
     Get a specific product by barcode with a structured response format.
     
+    The ETag is derived from the product's last_updated timestamp, so
+    conditional requests are answered with 304 from a primary-key lookup of
+    code and last_updated without loading the full row.
+    
     Args:
         code: Product barcode
+        request: Incoming request (for conditional headers)
+        response: Outgoing response (for validator headers)
         db: Database session
         
     Returns:
@@ -150,75 +235,44 @@ def get_product(
     try:
         logger.info(f"Getting product with code {code} (using local DB: {is_using_local_db()})")
         
+        # Look up validators first so conditional requests never load the full row
+        meta = (
+            db.query(db_models.Product.code, db_models.Product.last_updated)
+            .filter(db_models.Product.code == code)
+            .first()
+        )
+        
+        if not meta:
+            logger.warning(f"Product with code {code} not found")
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        etag = None
+        if meta.last_updated is not None:
+            etag = conditional.make_etag("product", meta.code, meta.last_updated)
+            if conditional.is_not_modified(request.headers, etag, meta.last_updated):
+                return conditional.not_modified(etag, meta.last_updated)
+        
         # Query the product from database
-        product = db.query(db_models.Product).filter(db_models.Product.code == code).first()
+        product = (
+            db.query(db_models.Product)
+            .options(PRODUCT_DETAIL)
+            .filter(db_models.Product.code == code)
+            .first()
+        )
         
         if not product:
             logger.warning(f"Product with code {code} not found")
             raise HTTPException(status_code=404, detail="Product not found")
             
-        # Extract additives from ingredients text
-        additives = helpers.extract_additives_from_text(product.ingredients_text or "")
-        
-        # Assess health concerns based on data
-        health_concerns = []
-        if product.protein and product.protein < 10:
-            health_concerns.append("Low protein content")
-        if product.fat and product.fat > 25:
-            health_concerns.append("High fat content")
-        if product.salt and product.salt > 1.5:
-            health_concerns.append("High salt content")
-            
-        # Create basic environmental impact assessment
-        env_impact = {
-            "impact": "Moderate",
-            "details": "Based on default meat product environmental impact assessment",
-            "sustainability_practices": ["Unknown"]
-        }
-        
-        if product.meat_type == "beef":
-            env_impact["impact"] = "High"
-            env_impact["details"] = "Beef production typically has higher environmental impact"
-        elif product.meat_type in ["chicken", "turkey"]:
-            env_impact["impact"] = "Lower"
-            env_impact["details"] = "Poultry typically has lower environmental impact compared to red meat"
-        
-        # Build structured response
-        structured_response = models.ProductStructured(
-            product=models.ProductInfo(
-                code=product.code,
-                name=product.name,
-                brand=product.brand,
-                description=product.description,
-                ingredients_text=product.ingredients_text,
-                image_url=product.image_url,
-                image_data=product.image_data,
-                meat_type=product.meat_type
-            ),
-            criteria=models.ProductCriteria(
-                risk_rating=product.risk_rating,
-                additives=additives
-            ),
-            health=models.ProductHealth(
-                nutrition=models.ProductNutrition(
-                    calories=product.calories,
-                    protein=product.protein,
-                    fat=product.fat,
-                    carbohydrates=product.carbohydrates,
-                    salt=product.salt
-                ),
-                health_concerns=health_concerns
-            ),
-            environment=models.ProductEnvironment(
-                impact=env_impact["impact"],
-                details=env_impact["details"],
-                sustainability_practices=env_impact["sustainability_practices"]
-            ),
-            metadata=models.ProductMetadata(
-                last_updated=product.last_updated,
-                created_at=product.created_at
-            )
-        )
+        structured_response = helpers.build_health_assessment_input(product)
+        
+        # Products without last_updated fall back to a hash of the response content
+        if etag is None:
+            etag = conditional.content_etag(structured_response.model_dump_json().encode())
+            if conditional.is_not_modified(request.headers, etag):
+                return conditional.not_modified(etag)
+        conditional.set_validators(response, etag, meta.last_updated)
+        response.headers[SURROGATE_KEY_HEADER] = surrogate_keys(product_tag(code))
         
         return structured_response
     
@@ -233,16 +287,39 @@ def get_product(
         )
 
 
+def build_alternatives_response(alternatives: List[db_models.Product]) -> List[models.ProductAlternative]:
+    """Convert alternative product rows to response models."""
+    return [
+        models.ProductAlternative(
+            code=alt.code,
+            name=alt.name,
+            brand=alt.brand,
+            risk_rating=alt.risk_rating,
+            reason="Lower risk alternative"
+        )
+        for alt in alternatives
+    ]
+
+
 @router.get("/{code}/alternatives", response_model=List[models.ProductAlternative])
 def get_product_alternatives(
     code: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
 ) -> Any:
     """
     Get alternative products for a specific product.
     
+    Alternatives depend on every product of the same meat type, so the ETag
+    covers the product's risk rating plus the count and latest update of its
+    meat type group (an index-only aggregate on the meat_type/risk_rating/
+    last_updated index).
+    
     Args:
         code: Product barcode
+        request: Incoming request (for conditional headers)
+        response: Outgoing response (for validator headers)
         db: Database session
         
     Returns:
@@ -254,16 +331,41 @@ def get_product_alternatives(
     try:
         logger.debug(f"Checking if product {code} exists in database (using local DB: {is_using_local_db()})")
         
-        # Check if product exists
-        product = db.query(db_models.Product).filter(db_models.Product.code == code).first()
+        # Check if product exists, loading only the columns alternatives depend on
+        product = (
+            db.query(
+                db_models.Product.code,
+                db_models.Product.meat_type,
+                db_models.Product.risk_rating,
+                db_models.Product.last_updated,
+            )
+            .filter(db_models.Product.code == code)
+            .first()
+        )
         
         if not product:
             logger.warning(f"Product with code {code} not found")
             raise HTTPException(status_code=404, detail="Product not found")
         
+        group_count, group_last_updated = (
+            db.query(func.count(db_models.Product.code), func.max(db_models.Product.last_updated))
+            .filter(db_models.Product.meat_type == product.meat_type)
+            .one()
+        )
+        etag = conditional.make_etag(
+            "alternatives", code, product.meat_type, product.risk_rating, group_count, group_last_updated
+        )
+        last_modified = max(
+            (ts for ts in (product.last_updated, group_last_updated) if ts is not None),
+            default=None,
+        )
+        if conditional.is_not_modified(request.headers, etag, last_modified):
+            return conditional.not_modified(etag, last_modified)
+        
         # Find alternative products with similar characteristics
         alternatives = (
             db.query(db_models.Product)
+            .options(PRODUCT_ALTERNATIVE)
             .filter(db_models.Product.meat_type == product.meat_type)
             .filter(db_models.Product.code != code)
             .filter(db_models.Product.risk_rating < product.risk_rating)
@@ -271,17 +373,10 @@ def get_product_alternatives(
             .all()
         )
         
-        # Convert to alternative product models
-        return [
-            models.ProductAlternative(
-                code=alt.code,
-                name=alt.name,
-                brand=alt.brand,
-                risk_rating=alt.risk_rating,
-                reason="Lower risk alternative"
-            )
-            for alt in alternatives
-        ]
+        conditional.set_validators(response, etag, last_modified)
+        response.headers[SURROGATE_KEY_HEADER] = surrogate_keys(product_tag(code), meat_type_tag(product.meat_type))
+        
+        return build_alternatives_response(alternatives)
                 
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -295,7 +390,8 @@ def get_product_alternatives(
 
 @router.get("/recommendations", response_model=models.RecommendationResponse)
 def get_product_recommendations(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: db_models.User = Depends(get_current_active_user),
     limit: int = Query(30, ge=1, le=100, description="Maximum number of recommendations to return"),
 ) -> Any:
@@ -306,6 +402,7 @@ def get_product_recommendations(
     including nutrition focus, additives, ethical concerns, and preferred meat types.
     
     Args:
+        response: Outgoing response (for cache tags)
         db: Database session
         current_user: Current active user
         limit: Maximum number of recommendations to return (1-100, default 30)
@@ -329,6 +426,7 @@ def get_product_recommendations(
         
         # Get personalized recommendations
         recommended_products = get_personalized_recommendations(db, preferences, limit)
+        response.headers[SURROGATE_KEY_HEADER] = surrogate_keys(CATALOG_TAG)
         
         if not recommended_products:
             logger.warning("No recommendations found")
@@ -345,7 +443,7 @@ def get_product_recommendations(
             
             # Create RecommendedProduct object
             recommended_product = models.RecommendedProduct(
-                product=models.Product.from_orm(product),
+                product=models.Product.model_validate(loaded_columns(product)),
                 match_details=models.ProductMatch(
                     matches=matches,
                     concerns=concerns
@@ -371,7 +469,8 @@ def get_product_recommendations(
 @router.get("/{code}/health-assessment", response_model=models.HealthAssessment)
 def get_product_health_assessment(
     code: str,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: db_models.User = Depends(get_current_active_user),
 ) -> Any:
     """
@@ -385,6 +484,7 @@ def get_product_health_assessment(
     
     Args:
         code: Product barcode
+        response: Outgoing response (for cache tags and the no-store marker)
         db: Database session
         
     Returns:
@@ -398,74 +498,19 @@ def get_product_health_assessment(
         logger.info(f"Generating health assessment for product with code {code}")
         
         # Query the product from database
-        product = db.query(db_models.Product).filter(db_models.Product.code == code).first()
+        product = (
+            db.query(db_models.Product)
+            .options(PRODUCT_DETAIL)
+            .filter(db_models.Product.code == code)
+            .first()
+        )
         
         if not product:
             logger.warning(f"Product with code {code} not found")
             raise HTTPException(status_code=404, detail="Product not found")
             
-        # Extract additives from ingredients text
-        additives = helpers.extract_additives_from_text(product.ingredients_text or "")
-        
-        # Assess health concerns based on data
-        health_concerns = []
-        if product.protein and product.protein < 10:
-            health_concerns.append("Low protein content")
-        if product.fat and product.fat > 25:
-            health_concerns.append("High fat content")
-        if product.salt and product.salt > 1.5:
-            health_concerns.append("High salt content")
-            
-        # Create basic environmental impact assessment
-        env_impact = {
-            "impact": "Moderate",
-            "details": "Based on default meat product environmental impact assessment",
-            "sustainability_practices": ["Unknown"]
-        }
-        
-        if product.meat_type == "beef":
-            env_impact["impact"] = "High"
-            env_impact["details"] = "Beef production typically has higher environmental impact"
-        elif product.meat_type in ["chicken", "turkey"]:
-            env_impact["impact"] = "Lower"
-            env_impact["details"] = "Poultry typically has lower environmental impact compared to red meat"
-        
-        # Build structured response for the health assessment service
-        structured_product = models.ProductStructured(
-            product=models.ProductInfo(
-                code=product.code,
-                name=product.name,
-                brand=product.brand,
-                description=product.description,
-                ingredients_text=product.ingredients_text,
-                image_url=product.image_url,
-                image_data=product.image_data,
-                meat_type=product.meat_type
-            ),
-            criteria=models.ProductCriteria(
-                risk_rating=product.risk_rating,
-                additives=additives
-            ),
-            health=models.ProductHealth(
-                nutrition=models.ProductNutrition(
-                    calories=product.calories,
-                    protein=product.protein,
-                    fat=product.fat,
-                    carbohydrates=product.carbohydrates,
-                    salt=product.salt
-                ),
-                health_concerns=health_concerns
-            ),
-            environment=models.ProductEnvironment(
-                impact=env_impact["impact"],
-                details=env_impact["details"],
-                sustainability_practices=env_impact["sustainability_practices"]
-            ),
-            metadata=models.ProductMetadata(
-                last_updated=product.last_updated,
-                created_at=product.created_at
-            )
-        )
+        # Build structured input for the health assessment service
+        structured_product = helpers.build_health_assessment_input(product)
         
         # Generate health assessment with database access for recommendations
         health_assessment = generate_health_assessment(structured_product, db)
@@ -478,6 +523,10 @@ def get_product_health_assessment(
             )
             
         logger.info(f"Successfully generated health assessment for product {code}")
+        response.headers[SURROGATE_KEY_HEADER] = surrogate_keys(product_tag(code))
+        if is_fallback_assessment(health_assessment):
+            # Degraded while Gemini is unavailable; don't keep it for the cache TTL
+            response.headers[NO_STORE_HEADER] = "1"
         
         # Apply user preferences to flag matching ingredients
         user_preferences = getattr(current_user, "preferences", {}) or {}
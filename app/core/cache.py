@@ -0,0 +1,642 @@
+"""In-process cache primitives for the MeatWise API."""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence
+
+from app.core.cache_codec import CacheEntryError, decode_entry, encode_entry
+from app.core.config import settings
+from app.core.metrics import Sample, register_collector
+from app.core.redis_client import RedisManager, get_redis_manager
+
+# Redis imports - will be conditionally used
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    """A cached value with its accounted size and expiry."""
+
+    __slots__ = ("value", "size", "expires_at")
+
+    def __init__(self, value: Any, size: int, expires_at: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class BoundedTTLCache:
+    """
+    LRU cache bounded by total byte size, with per-entry TTL.
+
+    Entries are sized by the caller (e.g. the response body length), so the
+    budget tracks real memory use rather than entry count. Expired entries are
+    dropped on access and by a periodic sweep, so keys that are never requested
+    again do not linger until eviction.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        default_ttl: float,
+        sweep_interval: float = 60.0,
+        name: Optional[str] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Byte budget for all entries combined
+            default_ttl: TTL in seconds used when set() is not given one
+            sweep_interval: Minimum seconds between expiry sweeps
+            name: Optional name; when given, stats are exported as metrics
+        """
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.sweep_interval = sweep_interval
+        self.name = name
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.resident_bytes = 0
+
+        # Counters for monitoring
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+        if name:
+            register_collector(f"cache_{name}", self._collect_metrics)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, count=False) is not None
+
+    def _remove(self, key: Hashable) -> Optional[_Entry]:
+        """Remove an entry and update the byte total. Caller holds the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.resident_bytes -= entry.size
+        return entry
+
+    def _maybe_sweep(self, now: float) -> None:
+        """Run an expiry sweep if the interval has elapsed. Caller holds the lock."""
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        if expired:
+            self.expirations += len(expired)
+            logger.debug(f"Swept {len(expired)} expired entries from cache {self.name or ''}")
+
+    def get(self, key: Hashable, count: bool = True) -> Optional[Any]:
+        """
+        Get a value if present and not expired, marking it most recently used.
+
+        Args:
+            key: Cache key
+            count: Whether the lookup counts towards hit/miss stats
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_sweep(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+            if entry.expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                if count:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry.value
+
+    def ttl_remaining(self, key: Hashable) -> Optional[float]:
+        """Return seconds until the entry expires, or None if it is absent."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return max(0.0, entry.expires_at - time.monotonic())
+
+    def set(self, key: Hashable, value: Any, size: int, ttl: Optional[float] = None) -> bool:
+        """
+        Store a value, evicting least recently used entries to stay within budget.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            size: Accounted size of the value in bytes
+            ttl: TTL in seconds (defaults to default_ttl)
+
+        Returns:
+            bool: False if the value alone exceeds the byte budget and was not stored
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_sweep(now)
+            self._remove(key)
+            if size > self.max_bytes:
+                self.rejected += 1
+                return False
+
+            self._entries[key] = _Entry(value, size, now + (self.default_ttl if ttl is None else ttl))
+            self.resident_bytes += size
+
+            while self.resident_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.resident_bytes -= evicted.size
+                self.evictions += 1
+            return True
+
+    def delete(self, key: Hashable) -> bool:
+        """Delete an entry. Returns True if it was present."""
+        with self._lock:
+            return self._remove(key) is not None
+
+    def purge(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove all entries for which predicate(key, value) is true. Returns the count."""
+        with self._lock:
+            matched = [key for key, entry in self._entries.items() if predicate(key, entry.value)]
+            for key in matched:
+                self._remove(key)
+            return len(matched)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self.resident_bytes = 0
+
+    def sweep(self) -> None:
+        """Force an expiry sweep now."""
+        with self._lock:
+            self._next_sweep = 0.0
+            self._maybe_sweep(time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and resident size."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejected": self.rejected,
+            }
+
+    def _collect_metrics(self) -> Iterable[Sample]:
+        """Expose stats as metrics."""
+        labels = {"cache": self.name or ""}
+        stats = self.stats()
+        samples: List[Sample] = [
+            ("cache_entries", labels, stats["entries"]),
+            ("cache_resident_bytes", labels, stats["resident_bytes"]),
+            ("cache_max_bytes", labels, stats["max_bytes"]),
+            ("cache_hits_total", labels, stats["hits"]),
+            ("cache_misses_total", labels, stats["misses"]),
+            ("cache_evictions_total", labels, stats["evictions"]),
+            ("cache_expirations_total", labels, stats["expirations"]),
+            ("cache_rejected_total", labels, stats["rejected"]),
+        ]
+        return samples
+
+
+INVALIDATION_CHANNEL = "meatwise:cache:invalidate"
+
+# Surrogate keys (cache tags). Routes name the data a response was built from
+# in a Surrogate-Key header; writes purge every response carrying a tag.
+SURROGATE_KEY_HEADER = "Surrogate-Key"
+CATALOG_TAG = "catalog"
+TAG_SET_PREFIX = "cache:tag:"
+
+# Internal header marking a response the response cache must not store, e.g. a
+# degraded fallback; stripped before the response is sent
+NO_STORE_HEADER = "X-Cache-No-Store"
+
+
+def product_tag(code: str) -> str:
+    """Tag for responses built from a single product."""
+    return f"product:{code}"
+
+
+def meat_type_tag(meat_type: Optional[str]) -> str:
+    """Tag for responses built from all products of a meat type."""
+    return f"{CATALOG_TAG}:{meat_type or 'unknown'}"
+
+
+def surrogate_keys(*tags: str) -> str:
+    """Format tags as a Surrogate-Key header value."""
+    return " ".join(tags)
+
+
+def product_write_tags(codes: Iterable[str], meat_types: Iterable[Optional[str]] = ()) -> List[str]:
+    """
+    Tags to purge after products are inserted, updated or deleted.
+
+    Args:
+        codes: Codes of the written products
+        meat_types: Meat types of the written products (old and new, if it changed)
+    """
+    tags = [CATALOG_TAG]
+    tags.extend(sorted({product_tag(code) for code in codes}))
+    tags.extend(sorted({meat_type_tag(meat_type) for meat_type in meat_types}))
+    return tags
+
+
+async def purge_redis_tags(
+    redis: RedisManager,
+    tags: Sequence[str],
+    channel: str = INVALIDATION_CHANNEL,
+    origin: str = "",
+) -> Optional[List[str]]:
+    """
+    Delete every Redis cache entry indexed under the given tags.
+
+    The deleted keys are published on the invalidation channel so that all API
+    processes drop them from their L1 caches. Usable without a
+    TieredResponseCache, e.g. from scripts that write to the database directly.
+
+    Args:
+        redis: Redis manager
+        tags: Tags to purge
+        channel: Invalidation channel
+        origin: Identifier of the purging process (its own L1 is purged separately)
+
+    Returns:
+        Optional[List[str]]: The purged cache keys, or None if Redis failed
+    """
+    if not tags:
+        return []
+
+    def read_tag_sets(pipe) -> None:
+        for tag in tags:
+            pipe.smembers(TAG_SET_PREFIX + tag)
+
+    members = await redis.pipeline(read_tag_sets)
+    if members is None:
+        return None
+    keys = sorted({
+        key.decode() if isinstance(key, bytes) else key
+        for tag_members in members for key in tag_members
+    })
+
+    def delete_and_publish(pipe) -> None:
+        if keys:
+            pipe.delete(*keys)
+        pipe.delete(*(TAG_SET_PREFIX + tag for tag in tags))
+        pipe.publish(channel, json.dumps({"origin": origin, "keys": keys, "tags": list(tags)}))
+
+    if await redis.pipeline(delete_and_publish) is None:
+        return None
+    return keys
+
+
+def entry_size(value: Dict) -> int:
+    """Approximate the memory held by a cached response: body plus headers."""
+    size = len(value.get("content", b""))
+    for name, header_value in value.get("headers", []):
+        size += len(name) + len(header_value)
+    return size
+
+
+class TieredResponseCache:
+    """
+    Read-through response cache: an in-process L1 in front of a shared Redis L2.
+
+    Hits are served from L1 when possible; L1 misses fall through to Redis and
+    promote the entry into L1 for the rest of its Redis TTL (capped by
+    l1_max_ttl). Redis is reached through the shared async RedisManager, so
+    lookups and writes do not block the event loop and each one is a single
+    pipelined round trip. Deletes are published on a Redis channel, and every
+    process runs a subscriber thread (with its own blocking connection) that
+    drops the published keys from its L1, so workers do not keep serving
+    entries that were invalidated elsewhere.
+
+    Entries can be stored with tags (surrogate keys). purge_tags() deletes every
+    entry carrying one of the tags: L1 entries are matched directly, and in
+    Redis each tag has a set of the keys stored under it.
+
+    Without Redis this degrades to the L1 cache alone, and entry TTLs are capped
+    at the default TTL since other processes cannot be told about purges.
+    """
+
+    def __init__(
+        self,
+        ttl: int,
+        redis_url: Optional[str] = None,
+        max_bytes: int = 64 * 1024 * 1024,
+        sweep_interval: float = 60.0,
+        l1_max_ttl: float = 300.0,
+        compress_min_bytes: int = 1024,
+        tag_ttl: int = 7 * 24 * 3600,
+        channel: str = INVALIDATION_CHANNEL,
+        redis_manager: Optional[RedisManager] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl: Default TTL for entries in seconds
+            redis_url: Optional Redis URL for the shared L2 tier
+            max_bytes: Byte budget for the in-process L1 tier
+            sweep_interval: Seconds between L1 expiry sweeps
+            l1_max_ttl: Upper bound on how long an entry lives in L1 when Redis is used
+            compress_min_bytes: Bodies at least this large are compressed in Redis (0 disables)
+            tag_ttl: Minimum lifetime of a Redis tag set (extended to the TTL of longer-lived entries)
+            channel: Redis pub/sub channel for invalidation messages
+            redis_manager: Shared Redis manager (defaults to the one for redis_url)
+        """
+        self.ttl = ttl
+        self.l1_max_ttl = l1_max_ttl
+        self.compress_min_bytes = compress_min_bytes
+        self.tag_ttl = tag_ttl
+        self.channel = channel
+        self.l1 = BoundedTTLCache(
+            max_bytes=max_bytes,
+            default_ttl=ttl,
+            sweep_interval=sweep_interval,
+            name="response_l1",
+        )
+        self._origin = uuid.uuid4().hex
+
+        # Counters for monitoring
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.invalidations_received = 0
+
+        # Redis is optional; the manager falls back (returns None) while it is down
+        self.redis = redis_manager or (get_redis_manager(redis_url) if redis_url else None)
+        self._subscriber: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        if self.redis is not None and REDIS_AVAILABLE:
+            self._pubsub_client = redis.from_url(self.redis.redis_url)
+            self._subscriber = threading.Thread(
+                target=self._listen_for_invalidations,
+                name="response-cache-invalidation",
+                daemon=True,
+            )
+            self._subscriber.start()
+
+        register_collector("response_cache", self._collect_metrics)
+
+    def _encode(self, value: Dict) -> bytes:
+        """Serialize an entry for Redis."""
+        headers = value.get("headers", [])
+        # Bodies sent with a Content-Encoding are already compressed
+        encoded = any(name.lower() == b"content-encoding" for name, _ in headers)
+        return encode_entry(
+            value.get("status_code", 200),
+            headers,
+            value.get("content", b""),
+            compress_min_bytes=0 if encoded else self.compress_min_bytes,
+        )
+
+    @staticmethod
+    def _decode(data: bytes) -> Optional[Dict]:
+        """Deserialize an entry read from Redis."""
+        try:
+            status_code, headers, content = decode_entry(data)
+        except CacheEntryError as e:
+            # If we can't parse the cached data, ignore it
+            logger.debug(f"Ignoring unreadable cache entry: {str(e)}")
+            return None
+        return {"content": content, "status_code": status_code, "headers": headers}
+
+    def _l1_ttl(self, ttl: float) -> float:
+        """TTL for an L1 entry; bounded when L1 mirrors a shared tier."""
+        if self.redis is None:
+            # Purges cannot reach other processes, so keep local entries short-lived
+            return min(ttl, self.ttl)
+        return min(ttl, self.l1_max_ttl)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Look up an entry in L1, then Redis, promoting Redis hits into L1."""
+        value = self.l1.get(key)
+        if value is not None or self.redis is None:
+            return value
+
+        def lookup(pipe) -> None:
+            pipe.get(key)
+            pipe.pttl(key)
+
+        results = await self.redis.pipeline(lookup)
+        if results is None:
+            self.l2_errors += 1
+            return None
+
+        data, pttl = results
+        if not data:
+            self.l2_misses += 1
+            return None
+        value = self._decode(data)
+        if value is None:
+            self.l2_misses += 1
+            return None
+
+        self.l2_hits += 1
+        remaining = pttl / 1000 if pttl and pttl > 0 else self.ttl
+        self.l1.set(key, value, entry_size(value), ttl=self._l1_ttl(remaining))
+        return value
+
+    async def set(self, key: str, value: Dict, ttl: Optional[int] = None, tags: Sequence[str] = ()) -> None:
+        """Store an entry in both tiers, indexing it under the given tags."""
+        ttl = self.ttl if ttl is None else ttl
+        l1_value = {**value, "tags": tuple(tags)} if tags else value
+        self.l1.set(key, l1_value, entry_size(value), ttl=self._l1_ttl(ttl))
+        if self.redis is None:
+            return
+
+        try:
+            data = self._encode(value)
+        except CacheEntryError as e:
+            # Kept in L1 only; the response has already been sent
+            logger.debug(f"Not storing {key} in Redis: {str(e)}")
+            self.l2_errors += 1
+            return
+
+        def store(pipe) -> None:
+            pipe.setex(key, ttl, data)
+            for tag in tags:
+                tag_key = TAG_SET_PREFIX + tag
+                pipe.sadd(tag_key, key)
+                pipe.expire(tag_key, max(ttl, self.tag_ttl))
+
+        if await self.redis.pipeline(store) is None:
+            self.l2_errors += 1
+
+    async def delete(self, *keys: str) -> None:
+        """Delete entries from both tiers and tell other processes to drop them from L1."""
+        if not keys:
+            return
+        for key in keys:
+            self.l1.delete(key)
+        if self.redis is None:
+            return
+
+        def invalidate(pipe) -> None:
+            pipe.delete(*keys)
+            pipe.publish(self.channel, json.dumps({"origin": self._origin, "keys": list(keys)}))
+
+        if await self.redis.pipeline(invalidate) is None:
+            self.l2_errors += 1
+            logger.warning(f"Failed to invalidate {len(keys)} cached responses in Redis")
+
+    async def purge_tags(self, tags: Sequence[str]) -> int:
+        """
+        Delete every entry tagged with any of the given tags, in all processes.
+
+        Returns:
+            int: Number of entries purged (L1 entries plus Redis keys)
+        """
+        if not tags:
+            return 0
+        wanted = set(tags)
+        purged = self.l1.purge(lambda key, value: not wanted.isdisjoint(value.get("tags", ())))
+        if self.redis is None:
+            return purged
+        keys = await purge_redis_tags(self.redis, list(tags), self.channel, origin=self._origin)
+        if keys is None:
+            self.l2_errors += 1
+            logger.warning(f"Failed to purge cache tags {list(tags)} in Redis")
+            return purged
+        for key in keys:
+            self.l1.delete(key)
+        return purged + len(keys)
+
+    def _handle_invalidation(self, data: bytes) -> None:
+        """Apply an invalidation message published by another process."""
+        try:
+            message = json.loads(data)
+        except Exception:
+            logger.warning("Ignoring malformed cache invalidation message")
+            return
+        if message.get("origin") == self._origin:
+            return
+        self.invalidations_received += 1
+        for key in message.get("keys", []):
+            self.l1.delete(key)
+
+    def _listen_for_invalidations(self) -> None:
+        """Subscriber loop; reconnects with backoff if the Redis connection drops."""
+        backoff = 1.0
+        connected_before = False
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self._pubsub_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                if connected_before:
+                    # Invalidations may have been missed while disconnected
+                    self.l1.clear()
+                    logger.info("Resubscribed to cache invalidations, cleared L1 cache")
+                connected_before = True
+                backoff = 1.0
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._handle_invalidation(message["data"])
+            except Exception as e:
+                logger.warning(f"Cache invalidation subscriber error: {str(e)}, retrying in {backoff:.0f}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def close(self) -> None:
+        """Stop the invalidation subscriber."""
+        self._stop.set()
+        if self._subscriber is not None:
+            self._subscriber.join(timeout=2.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-tier statistics."""
+        return {
+            "l1": self.l1.stats(),
+            "l2": {
+                "enabled": self.redis is not None,
+                "connected": self.redis is not None and bool(self.redis.connected),
+                "hits": self.l2_hits,
+                "misses": self.l2_misses,
+                "errors": self.l2_errors,
+            },
+            "invalidations_received": self.invalidations_received,
+        }
+
+    def _collect_metrics(self) -> Iterable[Sample]:
+        """Expose L2 and invalidation counters as metrics (L1 reports its own)."""
+        labels = {"cache": "response_l2"}
+        return [
+            ("cache_hits_total", labels, self.l2_hits),
+            ("cache_misses_total", labels, self.l2_misses),
+            ("cache_errors_total", labels, self.l2_errors),
+            ("cache_invalidations_received_total", {"cache": "response_l1"}, self.invalidations_received),
+        ]
+
+
+_response_cache: Optional[TieredResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> TieredResponseCache:
+    """Get the process-wide response cache, creating it from settings on first use."""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = TieredResponseCache(
+                    ttl=settings.REDIS_TTL,
+                    redis_url=settings.REDIS_URL,
+                    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+                    sweep_interval=settings.RESPONSE_CACHE_SWEEP_INTERVAL,
+                    l1_max_ttl=settings.RESPONSE_CACHE_L1_MAX_TTL,
+                    compress_min_bytes=settings.RESPONSE_CACHE_COMPRESS_MIN_BYTES,
+                    tag_ttl=settings.RESPONSE_CACHE_PRODUCT_TTL,
+                )
+    return _response_cache
+
+
+async def purge_product_cache(codes: Iterable[str], meat_types: Iterable[Optional[str]] = ()) -> int:
+    """
+    Purge cached responses affected by writes to the given products.
+
+    Args:
+        codes: Codes of the inserted, updated or deleted products
+        meat_types: Their meat types (old and new, if it changed)
+
+    Returns:
+        int: Number of entries purged
+    """
+    tags = product_write_tags(codes, meat_types)
+    purged = await get_response_cache().purge_tags(tags)
+    logger.info(f"Purged {purged} cached responses for tags {tags}")
+    return purged
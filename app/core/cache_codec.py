@@ -0,0 +1,162 @@
+"""Binary encoding of cached HTTP responses.
+
+Layout (network byte order):
+
+    magic "MW" | version u8 | flags u8 | status u16 | media type len u16 | header count u16
+    media type bytes
+    header count x (name len u16 | value len u16 | name | value)
+    body (compressed when a compression flag is set)
+
+The Content-Type header is stored in the media type field rather than the
+header list. Bodies of at least ``compress_min_bytes`` are compressed with
+zstd when the ``zstandard`` package is installed and with zlib (deflate)
+otherwise; the compressed form is only kept when it is smaller.
+
+Lengths and the header count are 16-bit, so responses with a header name or
+value (or Content-Type) of 64 KiB or more, or 65536 headers or more, cannot be
+encoded.
+"""
+
+import struct
+import threading
+import zlib
+from typing import List, Tuple
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+MAGIC = b"MW"
+VERSION = 1
+
+FLAG_ZLIB = 0x01
+FLAG_ZSTD = 0x02
+
+_HEADER = struct.Struct("!2sBBHHH")
+_FIELD = struct.Struct("!HH")
+
+# Largest length or count a u16 field holds
+MAX_FIELD = 0xFFFF
+
+ZLIB_LEVEL = 1
+ZSTD_LEVEL = 3
+
+Headers = List[Tuple[bytes, bytes]]
+
+# zstandard compressor objects must not be shared between threads
+_local = threading.local()
+
+
+class CacheEntryError(ValueError):
+    """Raised when a cache entry cannot be encoded or decoded."""
+
+
+def _zstd_compressor():
+    compressor = getattr(_local, "compressor", None)
+    if compressor is None:
+        compressor = _local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return compressor
+
+
+def _zstd_decompressor():
+    decompressor = getattr(_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = _local.decompressor = zstandard.ZstdDecompressor()
+    return decompressor
+
+
+def _compress(body: bytes) -> Tuple[int, bytes]:
+    """Compress a body, returning the flag that identifies the algorithm."""
+    if ZSTD_AVAILABLE:
+        return FLAG_ZSTD, _zstd_compressor().compress(body)
+    return FLAG_ZLIB, zlib.compress(body, ZLIB_LEVEL)
+
+
+def encode_entry(status: int, headers: Headers, body: bytes, compress_min_bytes: int = 1024) -> bytes:
+    """
+    Encode a response into the binary entry format.
+
+    Args:
+        status: HTTP status code
+        headers: Raw ASGI header list
+        body: Response body
+        compress_min_bytes: Bodies at least this large are compressed (0 disables)
+
+    Returns:
+        bytes: The encoded entry
+
+    Raises:
+        CacheEntryError: If a header or the header count does not fit the format
+    """
+    media_type = b""
+    fields = []
+    for name, value in headers:
+        if not media_type and name.lower() == b"content-type":
+            media_type = value
+            continue
+        if len(name) > MAX_FIELD or len(value) > MAX_FIELD:
+            raise CacheEntryError(f"Header {name[:64]!r} too large for a cache entry")
+        fields.append(_FIELD.pack(len(name), len(value)))
+        fields.append(name)
+        fields.append(value)
+    if len(media_type) > MAX_FIELD or len(fields) // 3 > MAX_FIELD:
+        raise CacheEntryError("Too many or too large headers for a cache entry")
+
+    flags = 0
+    if compress_min_bytes and len(body) >= compress_min_bytes:
+        flag, compressed = _compress(body)
+        if len(compressed) < len(body):
+            flags, body = flag, compressed
+
+    head = _HEADER.pack(MAGIC, VERSION, flags, status, len(media_type), len(fields) // 3)
+    return b"".join([head, media_type, *fields, body])
+
+
+def decode_entry(data: bytes) -> Tuple[int, Headers, bytes]:
+    """
+    Decode an entry produced by encode_entry.
+
+    Returns:
+        Tuple of status code, raw header list (Content-Type first) and body
+
+    Raises:
+        CacheEntryError: If the data is not a valid entry
+    """
+    if len(data) < _HEADER.size:
+        raise CacheEntryError("Cache entry too short")
+    magic, version, flags, status, media_len, count = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise CacheEntryError("Unknown cache entry format")
+
+    view = memoryview(data)
+    offset = _HEADER.size
+    headers: Headers = []
+    try:
+        if media_len:
+            headers.append((b"content-type", bytes(view[offset:offset + media_len])))
+            offset += media_len
+        for _ in range(count):
+            name_len, value_len = _FIELD.unpack_from(data, offset)
+            offset += _FIELD.size
+            name = bytes(view[offset:offset + name_len])
+            offset += name_len
+            value = bytes(view[offset:offset + value_len])
+            offset += value_len
+            headers.append((name, value))
+    except struct.error as e:
+        raise CacheEntryError(f"Truncated cache entry: {e}") from e
+
+    body = bytes(view[offset:])
+    if flags & FLAG_ZSTD and not ZSTD_AVAILABLE:
+        raise CacheEntryError("Cache entry is zstd-compressed but zstandard is not installed")
+    try:
+        if flags & FLAG_ZSTD:
+            body = _zstd_decompressor().decompress(body)
+        elif flags & FLAG_ZLIB:
+            body = zlib.decompress(body)
+    except Exception as e:
+        raise CacheEntryError(f"Corrupt cache entry body: {e}") from e
+
+    return status, headers, body
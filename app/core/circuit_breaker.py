@@ -0,0 +1,205 @@
+"""Circuit breakers for upstream services (Gemini, Supabase Auth).
+
+A breaker opens after a run of consecutive failures and rejects calls
+immediately while open, so callers fall back without waiting for timeouts
+and retries. After the recovery timeout a limited number of probe calls are
+let through (half-open); a successful probe closes the breaker again.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+from app.core.metrics import Sample, register_collector
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric encoding of states for metrics
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        """
+        Initialize the breaker.
+
+        Args:
+            name: Name of the protected upstream
+            failure_threshold: Consecutive failures that open the breaker
+            recovery_timeout: Seconds to stay open before probing
+            half_open_max_calls: Concurrent probe calls allowed while half-open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._lock = threading.Lock()
+
+        # Counters for monitoring
+        self.total_failures = 0
+        self.total_rejected = 0
+        self.times_opened = 0
+
+    def is_open(self) -> bool:
+        """Check whether the breaker is open and still inside its recovery timeout."""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.recovery_timeout
+
+    def allow_request(self) -> bool:
+        """Check whether a call may proceed, reserving a probe slot if half-open."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    self.total_rejected += 1
+                    return False
+                logger.info(f"Circuit {self.name} half-open, probing upstream")
+                self.state = HALF_OPEN
+                self._half_open_in_flight = 0
+
+            if self.state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    self.total_rejected += 1
+                    return False
+                self._half_open_in_flight += 1
+
+            return True
+
+    def record_success(self) -> None:
+        """Record a successful call."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                logger.info(f"Circuit {self.name} closed after successful probe")
+                self._half_open_in_flight = 0
+            self.state = CLOSED
+            self.consecutive_failures = 0
+
+    def release(self) -> None:
+        """
+        Record a call whose outcome says nothing about upstream health, e.g. a
+        quota (429) error, freeing its probe slot without closing or opening
+        the breaker.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._half_open_in_flight > 0:
+                self._half_open_in_flight -= 1
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the breaker if the threshold is reached."""
+        with self._lock:
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(
+                        f"Circuit {self.name} opened after {self.consecutive_failures} consecutive failures"
+                    )
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._half_open_in_flight = 0
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call fn through the breaker.
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the call
+            Exception: Whatever fn raised (also recorded as a failure)
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the breaker state for health checks."""
+        with self._lock:
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "total_failures": self.total_failures,
+                "total_rejected": self.total_rejected,
+                "times_opened": self.times_opened,
+                "retry_in_seconds": round(retry_in, 1),
+            }
+
+
+# Shared breakers keyed by upstream name
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(
+    name: str,
+    failure_threshold: int = 5,
+    recovery_timeout: float = 30.0,
+    half_open_max_calls: int = 1,
+) -> CircuitBreaker:
+    """
+    Get the shared breaker for an upstream, creating it on first use.
+
+    The configuration arguments only apply when the breaker is created.
+    """
+    breaker = _breakers.get(name)
+    if breaker is not None:
+        return breaker
+
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=failure_threshold,
+                recovery_timeout=recovery_timeout,
+                half_open_max_calls=half_open_max_calls,
+            )
+        return _breakers[name]
+
+
+def get_breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Return snapshots of all breakers."""
+    return {name: breaker.snapshot() for name, breaker in list(_breakers.items())}
+
+
+def _collect_metrics() -> Iterable[Sample]:
+    """Expose breaker state and counters as metrics."""
+    samples: List[Sample] = []
+    for name, snapshot in get_breaker_states().items():
+        labels = {"upstream": name}
+        samples.append(("circuit_breaker_state", labels, _STATE_VALUES[snapshot["state"]]))
+        samples.append(("circuit_breaker_failures_total", labels, snapshot["total_failures"]))
+        samples.append(("circuit_breaker_rejected_total", labels, snapshot["total_rejected"]))
+        samples.append(("circuit_breaker_opened_total", labels, snapshot["times_opened"]))
+    return samples
+
+
+register_collector("circuit_breakers", _collect_metrics)
@@ -40,10 +40,52 @@ class Settings(BaseSettings):
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
     RATE_LIMIT_BY_IP: bool = os.getenv("RATE_LIMIT_BY_IP", "true").lower() == "true"
+    RATE_LIMIT_BY_USER: bool = os.getenv("RATE_LIMIT_BY_USER", "true").lower() == "true"  # Signed-in users by user id
+    # LLM-backed routes draw from their own bucket, in tokens per minute
+    RATE_LIMIT_LLM_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_LLM_PER_MINUTE", "30"))  # Per client
+    RATE_LIMIT_LLM_GLOBAL_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_LLM_GLOBAL_PER_MINUTE", "0"))  # All clients; 0 disables
+    RATE_LIMIT_HEALTH_ASSESSMENT_COST: int = int(os.getenv("RATE_LIMIT_HEALTH_ASSESSMENT_COST", "10"))
+    # Without Redis, workers on a host share counters through memory-mapped tables in this directory
+    RATE_LIMIT_SHARED_MEMORY: bool = os.getenv("RATE_LIMIT_SHARED_MEMORY", "true").lower() == "true"
+    RATE_LIMIT_SHM_DIR: str = os.getenv(
+        "RATE_LIMIT_SHM_DIR", "/dev/shm/meatwise-ratelimit" if os.path.isdir("/dev/shm") else "/tmp/meatwise-ratelimit"
+    )
+    RATE_LIMIT_SHM_SLOTS: int = int(os.getenv("RATE_LIMIT_SHM_SLOTS", "65536"))  # Clients per table (24 bytes each)
+    
+    # Middleware pipeline: per-stage timing in a Server-Timing header and /metrics
+    MIDDLEWARE_TIMING: bool = os.getenv("MIDDLEWARE_TIMING", "false").lower() == "true"
     
     # Redis Configuration
     REDIS_URL: Optional[str] = os.getenv("REDIS_URL")
     REDIS_TTL: int = int(os.getenv("REDIS_TTL", "3600"))  # Default TTL for cached items
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))  # Shared async pool, per process
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2.0"))
+
+    # In-process response cache (L1 in front of Redis when REDIS_URL is set)
+    RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    RESPONSE_CACHE_SWEEP_INTERVAL: float = float(os.getenv("RESPONSE_CACHE_SWEEP_INTERVAL", "60"))
+    RESPONSE_CACHE_L1_MAX_TTL: float = float(os.getenv("RESPONSE_CACHE_L1_MAX_TTL", "300"))  # L1 lifetime cap when Redis is used
+    RESPONSE_CACHE_COMPRESS_MIN_BYTES: int = int(os.getenv("RESPONSE_CACHE_COMPRESS_MIN_BYTES", "1024"))  # 0 disables
+    RESPONSE_CACHE_PRODUCT_TTL: int = int(os.getenv("RESPONSE_CACHE_PRODUCT_TTL", str(3 * 24 * 3600)))  # Product routes, purged by tag on writes
+
+    # Response compression (gzip, plus brotli when the brotli package is installed)
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_BYTES: int = int(os.getenv("COMPRESSION_MIN_BYTES", "500"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+    # Cache warming from scan popularity
+    CACHE_WARM_ON_STARTUP: bool = os.getenv("CACHE_WARM_ON_STARTUP", "false").lower() == "true"
+    CACHE_WARM_INTERVAL: int = int(os.getenv("CACHE_WARM_INTERVAL", "0"))  # Seconds between runs, 0 disables
+    CACHE_WARM_TOP_N: int = int(os.getenv("CACHE_WARM_TOP_N", "200"))
+    CACHE_WARM_WINDOW_DAYS: int = int(os.getenv("CACHE_WARM_WINDOW_DAYS", "30"))
+    CACHE_WARM_HALF_LIFE_DAYS: float = float(os.getenv("CACHE_WARM_HALF_LIFE_DAYS", "7"))
+    CACHE_WARM_RATE: float = float(os.getenv("CACHE_WARM_RATE", "20"))  # Requests per second
+    CACHE_WARM_CONCURRENCY: int = int(os.getenv("CACHE_WARM_CONCURRENCY", "4"))
+    CACHE_WARM_HEALTH_ASSESSMENTS: int = int(os.getenv("CACHE_WARM_HEALTH_ASSESSMENTS", "20"))  # 0 disables
+    CACHE_WARM_HEALTH_RATE: float = float(os.getenv("CACHE_WARM_HEALTH_RATE", "0.5"))  # Gemini calls per second
+    CACHE_WARMER_TOKEN: Optional[str] = os.getenv("CACHE_WARMER_TOKEN")  # Exempts --base-url warming from rate limits
+    PREFERENCE_FINGERPRINT_TTL: float = float(os.getenv("PREFERENCE_FINGERPRINT_TTL", "30"))  # Seconds a user's preference hash is reused
     
     # CORS
     # Read CORS origins as a raw string first to avoid auto JSON parsing from environment
@@ -98,6 +140,30 @@ class Settings(BaseSettings):
     # Get DATABASE_URL from env - use the one from .env file
     DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")
 
+    # Connection pools (app/db/engines.py). Each worker gets pool_size + max_overflow
+    # <= min(DB_THREADS_PER_WORKER, DB_MAX_CONNECTIONS / WEB_CONCURRENCY), half kept open
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))  # Worker processes (as read by uvicorn/gunicorn)
+    DB_THREADS_PER_WORKER: int = int(os.getenv("DB_THREADS_PER_WORKER", "40"))  # AnyIO's default threadpool size
+    DB_MAX_CONNECTIONS: int = int(os.getenv("DB_MAX_CONNECTIONS", "60"))  # Connection budget for all workers
+    DB_POOL_SIZE: Optional[int] = int(os.environ["DB_POOL_SIZE"]) if os.getenv("DB_POOL_SIZE") else None  # Overrides the derived size
+    DB_MAX_OVERFLOW: Optional[int] = int(os.environ["DB_MAX_OVERFLOW"]) if os.getenv("DB_MAX_OVERFLOW") else None
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "900"))
+    # Hot read routes on an AsyncSession (asyncpg) when SQLAlchemy[asyncio] and the driver are installed
+    ASYNC_DB_ENABLED: bool = os.getenv("ASYNC_DB_ENABLED", "true").lower() == "true"
+    # Read replicas (comma-separated URLs) for read-only catalog queries, used while within the lag limit
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    DB_REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "10"))
+    DB_REPLICA_CHECK_INTERVAL: float = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+    DB_ASYNC_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_ASYNC_STATEMENT_CACHE_SIZE", "100"))  # 0 behind PgBouncer transaction pooling
+    # Per-request SQL statistics: query budgets, N+1 detection and slow request logs (on in debug)
+    DB_QUERY_STATS: bool = os.getenv("DB_QUERY_STATS", str(DEBUG)).lower() == "true"
+    DB_SERVER_TIMING: bool = os.getenv("DB_SERVER_TIMING", str(DEBUG)).lower() == "true"  # Send the db Server-Timing entry to clients
+    DB_QUERY_BUDGET: int = int(os.getenv("DB_QUERY_BUDGET", "20"))  # Default per request; 0 disables
+    DB_REPEATED_QUERY_LIMIT: int = int(os.getenv("DB_REPEATED_QUERY_LIMIT", "5"))  # Runs of one statement shape; 0 disables
+    DB_QUERY_BUDGET_MODE: str = os.getenv("DB_QUERY_BUDGET_MODE", "warn")  # off, warn (log) or raise (fail the request, for tests)
+    DB_SLOW_REQUEST_MS: float = float(os.getenv("DB_SLOW_REQUEST_MS", "500"))  # Log the slowest statements above this DB time
+
     @field_validator("DATABASE_URL", mode="before")
     def validate_database_url(cls, v: Optional[str]) -> Optional[str]:
         """Ensure database URL uses postgresql:// instead of postgres://."""
@@ -127,6 +193,21 @@ class Settings(BaseSettings):
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY", "")
     SUPABASE_SERVICE_KEY: Optional[str] = os.getenv("SUPABASE_SERVICE_KEY")
     SUPABASE_JWT_SECRET: str = os.getenv("SUPABASE_JWT_SECRET", "")
+    # Tokens are verified locally; these cover projects using asymmetric signing keys
+    SUPABASE_JWKS_URL: str = os.getenv(
+        "SUPABASE_JWKS_URL",
+        f"{os.getenv('SUPABASE_URL', '').rstrip('/')}/auth/v1/.well-known/jwks.json" if os.getenv("SUPABASE_URL") else "",
+    )
+    SUPABASE_JWKS_REFRESH_INTERVAL: float = float(os.getenv("SUPABASE_JWKS_REFRESH_INTERVAL", "600"))
+    SUPABASE_JWT_ISSUER: str = os.getenv(
+        "SUPABASE_JWT_ISSUER", f"{os.getenv('SUPABASE_URL', '').rstrip('/')}/auth/v1" if os.getenv("SUPABASE_URL") else ""
+    )  # Empty disables the issuer check
+    # Also check every token with Supabase Auth (a network round trip) so revoked sessions are rejected at once
+    AUTH_REMOTE_VERIFY: bool = os.getenv("AUTH_REMOTE_VERIFY", "false").lower() == "true"
+    # Verified token claims are reused until the token expires; profiles for a short TTL
+    AUTH_CLAIMS_CACHE_MAX_BYTES: int = int(os.getenv("AUTH_CLAIMS_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+    USER_PROFILE_CACHE_TTL: float = float(os.getenv("USER_PROFILE_CACHE_TTL", "60"))
+    USER_PROFILE_CACHE_MAX_BYTES: int = int(os.getenv("USER_PROFILE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
 
     @field_validator("SUPABASE_URL", "SUPABASE_KEY", mode="before")
     def warn_if_supabase_missing(cls, v: str, info: FieldValidationInfo) -> str:
@@ -137,6 +218,17 @@ class Settings(BaseSettings):
             print(f"WARNING: Environment variable '{env_var_name}' is not set. Supabase features may not work.", file=sys.stderr)
         return v
 
+    @field_validator("SUPABASE_JWT_SECRET", mode="before")
+    def warn_if_jwt_secret_missing(cls, v: str) -> str:
+        """Warn if Supabase is configured but its HS256 tokens cannot be verified locally."""
+        if not v and os.getenv("SUPABASE_URL"):
+            print(
+                "WARNING: SUPABASE_URL is set but SUPABASE_JWT_SECRET is not. Supabase HS256 tokens will be "
+                "checked with Supabase Auth on every request; set SUPABASE_JWT_SECRET to verify them locally.",
+                file=sys.stderr,
+            )
+        return v
+
     # OpenFoodFacts
     OPENFOODFACTS_USER_AGENT: str = os.getenv(
         "OPENFOODFACTS_USER_AGENT", "MeatWise - https://github.com/PPSpiderman/meat-products-api"
@@ -153,6 +245,18 @@ class Settings(BaseSettings):
             print("WARNING: Environment variable 'GEMINI_API_KEY' is not set. Gemini features may not work.", file=sys.stderr)
         return v
 
+    # LLM deadlines (seconds, covering all retries) and request hedging
+    LLM_HEALTH_ASSESSMENT_DEADLINE: float = float(os.getenv("LLM_HEALTH_ASSESSMENT_DEADLINE", "30"))
+    LLM_RECOMMENDATIONS_DEADLINE: float = float(os.getenv("LLM_RECOMMENDATIONS_DEADLINE", "20"))
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))  # Hedge after this latency percentile
+    LLM_HEDGE_MAX_FRACTION: float = float(os.getenv("LLM_HEDGE_MAX_FRACTION", "0.1"))  # Max share of calls that may hedge
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # Samples needed before hedging starts
+    LLM_CALL_POOL_SIZE: int = int(os.getenv("LLM_CALL_POOL_SIZE", "16"))  # Threads for LLM calls, hedges included
+
+    # Circuit breakers for upstream services (Gemini, Supabase Auth)
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT: float = float(os.getenv("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", "30"))
+
     # Replace the Config inner class with model_config
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,63 @@
+"""In-process metrics for the MeatWise API.
+
+Components register a collector that returns their current samples; the
+/metrics endpoint renders everything in the Prometheus text format. Keeping
+collection pull-based means hot paths only update their own counters.
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A sample is (metric_name, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+_collectors: Dict[str, Callable[[], Iterable[Sample]]] = {}
+_lock = threading.Lock()
+
+
+def register_collector(name: str, collector: Callable[[], Iterable[Sample]]) -> None:
+    """
+    Register (or replace) a metrics collector.
+
+    Args:
+        name: Unique collector name
+        collector: Callable returning the current samples
+    """
+    with _lock:
+        _collectors[name] = collector
+
+
+def collect() -> List[Sample]:
+    """Return samples from every registered collector."""
+    with _lock:
+        collectors = list(_collectors.items())
+
+    samples: List[Sample] = []
+    for name, collector in collectors:
+        try:
+            samples.extend(collector())
+        except Exception as e:
+            logger.warning(f"Metrics collector {name} failed: {str(e)}")
+    return samples
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Format labels as a Prometheus label set."""
+    if not labels:
+        return ""
+    parts = []
+    for key, value in sorted(labels.items()):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_prometheus() -> str:
+    """Render all samples in the Prometheus text exposition format."""
+    lines = []
+    for name, labels, value in sorted(collect(), key=lambda s: s[0]):
+        lines.append(f"meatwise_{name}{_format_labels(labels)} {float(value)}")
+    return "\n".join(lines) + "\n"
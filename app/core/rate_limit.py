@@ -0,0 +1,462 @@
+"""Sliding-window-counter rate limiting for the MeatWise API.
+
+Each key keeps only the request counts of the current and the previous fixed
+window. The number of requests in the sliding window ending now is estimated as
+
+    previous * (1 - elapsed / window) + current
+
+which assumes the previous window's requests were evenly spread. State is O(1)
+per key instead of one timestamp per request, and the check is O(1).
+
+In Redis the state is a small hash updated by one Lua script, so a check is a
+single atomic round trip shared by all app instances. Without Redis the state
+can live in a memory-mapped table shared by all worker processes on the host.
+"""
+
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.core.redis_client import RedisManager
+
+# fcntl (file locks) - not available on Windows
+try:
+    import fcntl
+    SHARED_MEMORY_AVAILABLE = True
+except ImportError:
+    SHARED_MEMORY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]: state hash; ARGV: window (s), limit, cost.
+# Uses the server clock so every app instance agrees on window boundaries.
+SLIDING_WINDOW_SCRIPT = """
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local index = math.floor(now / window)
+
+local state = redis.call('HMGET', KEYS[1], 'w', 'p', 'c')
+local w = tonumber(state[1])
+local previous = tonumber(state[2]) or 0
+local current = tonumber(state[3]) or 0
+if w == nil or index > w + 1 then
+    previous, current = 0, 0
+elseif index == w + 1 then
+    previous, current = current, 0
+end
+
+local elapsed = now - index * window
+local allowed = 0
+if previous * (1 - elapsed / window) + current + cost <= limit then
+    allowed = 1
+    current = current + cost
+    redis.call('HSET', KEYS[1], 'w', index, 'p', previous, 'c', current)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(window * 2000))
+end
+return {allowed, previous, current, tostring(elapsed)}
+"""
+
+# KEYS[1]: state hash; ARGV: window (s), cost.
+# Takes back a request counted in the current window.
+REFUND_SCRIPT = """
+local window = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local index = math.floor(now / window)
+
+local state = redis.call('HMGET', KEYS[1], 'w', 'c')
+if tonumber(state[1]) == index then
+    redis.call('HSET', KEYS[1], 'c', math.max(0, (tonumber(state[2]) or 0) - cost))
+end
+return 1
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of one rate limit check."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: int  # Seconds until the current window ends
+    retry_after: int  # Seconds until a request of the same cost would be allowed (0 if allowed)
+
+
+def _result(limit: int, window: float, previous: int, current: int, elapsed: float, cost: int, allowed: bool) -> RateLimitResult:
+    """Build a result from the window counts after the check."""
+    weight = 1 - elapsed / window
+    used = previous * weight + current
+    retry_after = 0.0
+    if not allowed:
+        budget = limit - cost
+        if budget < 0:
+            # Never fits; ask the client to back off for a full window
+            retry_after = window
+        elif current > budget:
+            # Not before the next window, once the current count has decayed enough
+            retry_after = (window - elapsed) + window * (1 - budget / current)
+        else:
+            # Within this window, once the previous count has decayed enough
+            retry_after = window * (1 - (budget - current) / previous) - elapsed
+    return RateLimitResult(
+        allowed=allowed,
+        limit=limit,
+        remaining=max(0, int(limit - used)),
+        reset_after=max(1, math.ceil(window - elapsed)),
+        retry_after=max(1, math.ceil(retry_after)) if not allowed else 0,
+    )
+
+
+class SlidingWindowCounter:
+    """
+    In-process sliding-window-counter limiter.
+
+    Keys idle for two windows carry no state that can affect a check, so they
+    are evicted by a sweep run at most once per window.
+    """
+
+    def __init__(self, limit: int, window: float):
+        """
+        Initialize the limiter.
+
+        Args:
+            limit: Maximum request cost per window
+            window: Window length in seconds
+        """
+        self.limit = limit
+        self.window = window
+        # key -> [window index, previous count, current count]
+        self._state: Dict[str, List[int]] = {}
+        self._next_sweep = 0.0
+
+    def hit(self, key: str, cost: int = 1, now: Optional[float] = None) -> RateLimitResult:
+        """
+        Count a request against a key if it fits within the limit.
+
+        Args:
+            key: Client identifier
+            cost: Units the request consumes
+            now: Current time (defaults to time.time())
+
+        Returns:
+            RateLimitResult: Whether the request is allowed, and header values
+        """
+        now = time.time() if now is None else now
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+        index = int(now // self.window)
+        state = self._state.get(key)
+        if state is None:
+            state = self._state[key] = [index, 0, 0]
+        elif index == state[0] + 1:
+            state[0], state[1], state[2] = index, state[2], 0
+        elif index > state[0] + 1:
+            state[0], state[1], state[2] = index, 0, 0
+
+        elapsed = now - index * self.window
+        previous, current = state[1], state[2]
+        allowed = previous * (1 - elapsed / self.window) + current + cost <= self.limit
+        if allowed:
+            state[2] = current = current + cost
+        return _result(self.limit, self.window, previous, current, elapsed, cost, allowed)
+
+    def refund(self, key: str, cost: int = 1, now: Optional[float] = None) -> None:
+        """
+        Take back an allowed request. Only the current window is adjusted; a
+        request counted in a window that has since ended stays counted.
+
+        Args:
+            key: Client identifier
+            cost: Units the request consumed
+            now: Current time (defaults to time.time())
+        """
+        now = time.time() if now is None else now
+        state = self._state.get(key)
+        if state is not None and state[0] == int(now // self.window):
+            state[2] = max(0, state[2] - cost)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Evict keys whose counts have expired.
+
+        Returns:
+            int: Number of keys evicted
+        """
+        now = time.time() if now is None else now
+        index = int(now // self.window)
+        idle = [key for key, state in self._state.items() if state[0] < index - 1]
+        for key in idle:
+            del self._state[key]
+        self._next_sweep = now + self.window
+        return len(idle)
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+
+# Shared table layout: header, then fixed-size slots
+_SHM_MAGIC = b"MWRL0001"
+_SHM_HEADER = struct.Struct("<8s")
+_SHM_SLOT = struct.Struct("<QqII")  # key hash (0 = empty), window index, previous count, current count
+_SHM_SLOT_HEAD = struct.Struct("<Qq")
+_SHM_MAX_PROBE = 32
+
+
+class SharedMemorySlidingWindowCounter:
+    """
+    Sliding-window-counter limiter whose state is shared by all processes on a host.
+
+    The counters live in a fixed-size open-addressing hash table in a
+    memory-mapped file (under /dev/shm by default, so it stays in memory). Each
+    check holds an exclusive flock on the file for the few microseconds of its
+    read-modify-write, which makes it atomic across workers.
+
+    Keys are stored as 64-bit hashes. Slots of keys idle for two windows are
+    reused, so the table needs no sweeping; if a key's probe sequence has no free
+    slot, the slot with the oldest window is taken over.
+    """
+
+    def __init__(self, directory: str, name: str, limit: int, window: float, slots: int = 65536):
+        """
+        Initialize the limiter. The file is created on first use.
+
+        Args:
+            directory: Directory of the table files
+            name: Table name; workers using the same name share counters
+            limit: Maximum request cost per window
+            window: Window length in seconds
+            slots: Number of keys the table holds
+        """
+        self.limit = limit
+        self.window = window
+        self.slots = slots
+        # Layout parameters are part of the name, so workers with another
+        # configuration (e.g. during a rolling restart) never remap the same file
+        self.path = os.path.join(directory, f"{name}-{slots}-{window:g}.shm")
+        self._size = _SHM_HEADER.size + slots * _SHM_SLOT.size
+        self._fd: Optional[int] = None
+        self._table: Optional[mmap.mmap] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        """Map the table, creating it if needed."""
+        # flock does not exclude processes sharing a descriptor, so a forked
+        # worker must open the file itself
+        if self._table is not None and self._pid == os.getpid():
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.pread(fd, _SHM_HEADER.size, 0) != _SHM_MAGIC:
+                    # New (or foreign) file: start with an empty table
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, self._size)
+                    os.pwrite(fd, _SHM_HEADER.pack(_SHM_MAGIC), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            table = mmap.mmap(fd, self._size)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd, self._table, self._pid = fd, table, os.getpid()
+
+    def _find_slot(self, key_hash: int, index: int) -> Tuple[int, bool]:
+        """Return the offset of the key's slot and whether the slot already holds the key."""
+        table = self._table
+        start = key_hash % self.slots
+        free = None
+        oldest, oldest_window = None, None
+        for probe in range(min(_SHM_MAX_PROBE, self.slots)):
+            offset = _SHM_HEADER.size + (start + probe) % self.slots * _SHM_SLOT.size
+            slot_hash, slot_window = _SHM_SLOT_HEAD.unpack_from(table, offset)
+            if slot_hash == key_hash:
+                return offset, True
+            if slot_hash == 0:
+                # Keys are never removed, so the key is not further along
+                return (free if free is not None else offset), False
+            if free is None and slot_window < index - 1:
+                free = offset
+            if oldest is None or slot_window < oldest_window:
+                oldest, oldest_window = offset, slot_window
+        return (free if free is not None else oldest), False
+
+    def hit(self, key: str, cost: int = 1, now: Optional[float] = None) -> RateLimitResult:
+        """
+        Count a request against a key if it fits within the limit.
+
+        Args:
+            key: Client identifier
+            cost: Units the request consumes
+            now: Current time (defaults to time.time())
+
+        Returns:
+            RateLimitResult: Whether the request is allowed, and header values
+        """
+        now = time.time() if now is None else now
+        index = int(now // self.window)
+        elapsed = now - index * self.window
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset, found = self._find_slot(key_hash, index)
+                previous, current = 0, 0
+                if found:
+                    _, w, previous, current = _SHM_SLOT.unpack_from(self._table, offset)
+                    if index == w + 1:
+                        previous, current = current, 0
+                    elif index != w:
+                        previous, current = 0, 0
+                allowed = previous * (1 - elapsed / self.window) + current + cost <= self.limit
+                if allowed:
+                    current += cost
+                _SHM_SLOT.pack_into(self._table, offset, key_hash, index, previous, current)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return _result(self.limit, self.window, previous, current, elapsed, cost, allowed)
+
+    def refund(self, key: str, cost: int = 1, now: Optional[float] = None) -> None:
+        """
+        Take back an allowed request. Only the current window is adjusted; a
+        request counted in a window that has since ended stays counted.
+
+        Args:
+            key: Client identifier
+            cost: Units the request consumed
+            now: Current time (defaults to time.time())
+        """
+        now = time.time() if now is None else now
+        index = int(now // self.window)
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset, found = self._find_slot(key_hash, index)
+                if found:
+                    _, w, previous, current = _SHM_SLOT.unpack_from(self._table, offset)
+                    if w == index:
+                        _SHM_SLOT.pack_into(self._table, offset, key_hash, w, previous, max(0, current - cost))
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class RedisSlidingWindowCounter:
+    """Sliding-window-counter limiter shared through Redis, one atomic script call per check."""
+
+    def __init__(self, redis: RedisManager, limit: int, window: float, prefix: str = "ratelimit"):
+        """
+        Initialize the limiter.
+
+        Args:
+            redis: Shared Redis manager
+            limit: Maximum request cost per window
+            window: Window length in seconds
+            prefix: Key prefix of the state hashes
+        """
+        self.redis = redis
+        self.limit = limit
+        self.window = window
+        self.prefix = prefix
+
+    async def hit(self, key: str, cost: int = 1) -> Optional[RateLimitResult]:
+        """
+        Count a request against a key if it fits within the limit.
+
+        Returns:
+            Optional[RateLimitResult]: The result, or None if Redis is unavailable
+        """
+        reply = await self.redis.run_script(
+            SLIDING_WINDOW_SCRIPT, [f"{self.prefix}:{key}"], [self.window, self.limit, cost]
+        )
+        if reply is None:
+            return None
+        allowed, previous, current, elapsed = reply
+        return _result(self.limit, self.window, int(previous), int(current), float(elapsed), cost, bool(allowed))
+
+    async def refund(self, key: str, cost: int = 1) -> bool:
+        """
+        Take back an allowed request counted in the current window.
+
+        Returns:
+            bool: False if Redis is unavailable
+        """
+        reply = await self.redis.run_script(REFUND_SCRIPT, [f"{self.prefix}:{key}"], [self.window, cost])
+        return reply is not None
+
+
+class RateLimiter:
+    """
+    Sliding window counter in Redis when available, otherwise (and while Redis
+    is down) in a table shared by the workers on this host, or in process.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window: float,
+        redis: Optional[RedisManager] = None,
+        prefix: str = "ratelimit",
+        shared_dir: Optional[str] = None,
+        shared_slots: int = 65536,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            limit: Maximum request cost per window
+            window: Window length in seconds
+            redis: Shared Redis manager, if any
+            prefix: Key prefix of the Redis state hashes (and name of the shared table)
+            shared_dir: Directory of the shared-memory tables; None keeps counters per process
+            shared_slots: Number of keys a shared table holds
+        """
+        self.limit = limit
+        self.window = window
+        self.local = SlidingWindowCounter(limit, window)
+        if shared_dir and SHARED_MEMORY_AVAILABLE:
+            name = prefix.replace(":", "-")
+            self.local = SharedMemorySlidingWindowCounter(shared_dir, name, limit, window, slots=shared_slots)
+        self.redis = RedisSlidingWindowCounter(redis, limit, window, prefix=prefix) if redis else None
+
+    async def hit(self, key: str, cost: int = 1) -> RateLimitResult:
+        """Count a request against a key if it fits within the limit."""
+        if self.redis:
+            result = await self.redis.hit(key, cost)
+            if result is not None:
+                return result
+        try:
+            return self.local.hit(key, cost)
+        except OSError as e:
+            # The shared table cannot be created here; keep counting per process
+            logger.warning(f"Shared rate limit table unavailable, counting per process: {str(e)}")
+            self.local = SlidingWindowCounter(self.limit, self.window)
+            return self.local.hit(key, cost)
+
+    async def refund(self, key: str, cost: int = 1) -> None:
+        """Take back a request allowed by hit, e.g. when a later limit rejects it."""
+        if self.redis and await self.redis.refund(key, cost):
+            return
+        try:
+            self.local.refund(key, cost)
+        except OSError as e:
+            logger.warning(f"Shared rate limit table unavailable, refund dropped: {str(e)}")
@@ -0,0 +1,262 @@
+"""Shared async Redis connections for the MeatWise API."""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+# Redis imports - will be conditionally used
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class RedisManager:
+    """
+    Manages an async Redis client with fallback and reconnection support.
+
+    Commands are awaited on the event loop instead of blocking it, and all
+    callers share one connection pool per process. After max_errors consecutive
+    failures Redis is reported unavailable so callers fall back to local state
+    without waiting on socket timeouts; a reconnect is attempted every
+    retry_interval seconds until one succeeds.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        max_connections: int = 50,
+        socket_timeout: float = 2.0,
+        max_errors: int = 3,
+        retry_interval: float = 10.0,
+    ):
+        """
+        Initialize Redis manager with the given URL.
+
+        Args:
+            redis_url: Redis URL
+            max_connections: Size of the shared connection pool
+            socket_timeout: Connect and command timeout in seconds
+            max_errors: Consecutive failures before Redis is treated as down
+            retry_interval: Seconds between reconnect attempts while it is down
+        """
+        self.redis_url = redis_url
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.max_errors = max_errors
+        self.retry_interval = retry_interval
+        self.client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._scripts: Dict[str, Any] = {}
+        self.last_error_time = 0.0
+        self.error_count = 0
+        self.connected: Optional[bool] = None  # None until the first connection attempt
+
+    def _discard_client(self) -> None:
+        """
+        Disconnect the pool of the previous event loop (best effort).
+
+        A loop still running in another thread disconnects its pool itself. A
+        stopped or closed loop cannot run the disconnect any more, so the pool
+        is reset, dropping its connections; their sockets are closed when the
+        dropped connections are collected.
+        """
+        client, loop = self.client, self._loop
+        self.client = None
+        if client is None or loop is None:
+            return
+        pool = client.connection_pool
+        if loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(pool.disconnect(), loop)
+            return
+        pool.reset()
+        logger.debug("Discarded Redis connection pool of a finished event loop")
+
+    def _get_client(self):
+        """Get the client for the running event loop, creating its pool on first use."""
+        # Pooled connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if self.client is None or self._loop is not loop:
+            self._discard_client()
+            pool = aioredis.ConnectionPool.from_url(
+                self.redis_url,
+                max_connections=self.max_connections,
+                socket_timeout=self.socket_timeout,
+                socket_connect_timeout=self.socket_timeout,
+                health_check_interval=30,
+            )
+            self.client = aioredis.Redis(connection_pool=pool)
+            self._loop = loop
+            self._scripts = {}
+        return self.client
+
+    async def initialize(self) -> bool:
+        """Connect (or reconnect) to Redis and check the connection."""
+        if not REDIS_AVAILABLE or not self.redis_url:
+            logger.warning("Redis is not available or URL not provided. Using in-memory storage.")
+            self.connected = False
+            return False
+
+        try:
+            logger.info(f"Connecting to Redis at {self.redis_url}")
+            await self._get_client().ping()
+            self.connected = True
+            self.error_count = 0
+            logger.info("Successfully connected to Redis")
+        except Exception as e:
+            self.connected = False
+            self.error_count = max(self.error_count, self.max_errors)
+            self.last_error_time = time.time()
+            logger.error(f"Failed to connect to Redis: {str(e)}")
+        return self.connected
+
+    async def is_available(self) -> bool:
+        """Check if Redis is available for use, reconnecting when a retry is due."""
+        if self.connected:
+            return True
+        if not REDIS_AVAILABLE or not self.redis_url:
+            return False
+
+        now = time.time()
+        if self.connected is not None and now - self.last_error_time < self.retry_interval:
+            return False
+        # Claim this retry window so concurrent requests do not all reconnect
+        self.last_error_time = now
+        if self.connected is False:
+            logger.info("Attempting to reconnect to Redis after errors")
+        return await self.initialize()
+
+    def _record_error(self, operation: str, error: Exception) -> None:
+        """Count a failed command; too many in a row mark Redis as down."""
+        self.error_count += 1
+        self.last_error_time = time.time()
+        logger.warning(f"Redis operation {operation} failed: {str(error)}")
+        if self.connected and self.error_count >= self.max_errors:
+            self.connected = False
+            logger.error(f"Redis marked unavailable after {self.error_count} errors, retrying in {self.retry_interval:.0f}s")
+
+    async def execute(self, operation: str, *args, **kwargs) -> Any:
+        """Execute a Redis operation with error handling and fallback."""
+        if not await self.is_available():
+            return None
+
+        try:
+            # Get the operation method from the client
+            method = getattr(self._get_client(), operation)
+            result = await method(*args, **kwargs)
+        except Exception as e:
+            self._record_error(operation, e)
+            return None
+        self.error_count = 0
+        return result
+
+    async def pipeline(self, build: Callable[[Any], Any], transaction: bool = False) -> Optional[List[Any]]:
+        """
+        Run several commands in a single round trip.
+
+        Args:
+            build: Called with the pipeline to queue the commands
+            transaction: Wrap the commands in MULTI/EXEC
+
+        Returns:
+            Optional[List[Any]]: One result per queued command, or None if Redis
+            is unavailable or the pipeline failed
+        """
+        if not await self.is_available():
+            return None
+
+        try:
+            pipe = self._get_client().pipeline(transaction=transaction)
+            build(pipe)
+            results = await pipe.execute()
+        except Exception as e:
+            self._record_error("pipeline", e)
+            return None
+        self.error_count = 0
+        return results
+
+    async def run_script(self, source: str, keys: List[str], args: List[Any]) -> Any:
+        """
+        Run a Lua script atomically, by SHA after the first call.
+
+        Args:
+            source: Script source
+            keys: Keys the script touches (KEYS)
+            args: Script arguments (ARGV)
+
+        Returns:
+            Any: The script's reply, or None if Redis is unavailable or the script failed
+        """
+        if not await self.is_available():
+            return None
+
+        try:
+            client = self._get_client()
+            script = self._scripts.get(source)
+            if script is None:
+                # Falls back to EVAL (and caches the script) if the server does not know the SHA
+                script = self._scripts[source] = client.register_script(source)
+            result = await script(keys=keys, args=args)
+        except Exception as e:
+            self._record_error("script", e)
+            return None
+        self.error_count = 0
+        return result
+
+    async def close(self) -> None:
+        """Close the pooled connections."""
+        if self.client is not None:
+            try:
+                await self.client.aclose()
+            except AttributeError:
+                # redis-py < 5 names it close()
+                await self.client.close()
+            self.client = None
+            self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the connection state."""
+        return {
+            "connected": bool(self.connected),
+            "error_count": self.error_count,
+            "max_connections": self.max_connections,
+        }
+
+
+_managers: Dict[str, RedisManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_redis_manager(redis_url: Optional[str] = None) -> Optional[RedisManager]:
+    """
+    Get the process-wide manager for a Redis URL, so callers share one pool.
+
+    Args:
+        redis_url: Redis URL (defaults to REDIS_URL)
+
+    Returns:
+        Optional[RedisManager]: The manager, or None if no URL is configured or
+        the redis package is not installed
+    """
+    redis_url = redis_url or settings.REDIS_URL
+    if not redis_url or not REDIS_AVAILABLE:
+        return None
+    manager = _managers.get(redis_url)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(redis_url)
+            if manager is None:
+                manager = RedisManager(
+                    redis_url,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                )
+                _managers[redis_url] = manager
+    return manager
@@ -1,15 +1,29 @@
 """Security utilities for the MeatWise application."""
 
+import hashlib
+import logging
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Any, Optional, Union
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from jose import jwt
+import httpx
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
 from passlib.context import CryptContext
 
+from app.core.cache import BoundedTTLCache
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Algorithms of asymmetric Supabase signing keys, verified with keys from the JWKS endpoint
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+_DEFAULT_KEY_ALGORITHMS = {"RSA": "RS256", "EC": "ES256"}
+
 
 def create_access_token(
     subject: Union[str, Any], expires_delta: Optional[timedelta] = None
@@ -59,4 +73,219 @@ def get_password_hash(password: str) -> str:
     Returns:
         str: The hashed password
     """
-    return pwd_context.hash(password) 
\ No newline at end of file
+    return pwd_context.hash(password)
+
+
+def get_bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """
+    Extract the token from an Authorization header value.
+    
+    Args:
+        authorization: Raw header value, e.g. "Bearer <token>"
+        
+    Returns:
+        Optional[str]: The token, or None if the header is missing or not a bearer token
+    """
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+class SigningKeyCache:
+    """
+    Public JWT signing keys from a JWKS endpoint, cached by key id.
+
+    Keys older than refresh_interval are still used while a background thread
+    fetches the current set, so verification never waits on the network once
+    the keys are loaded. A token with an unknown key id (e.g. after a key
+    rotation) triggers a refresh, at most once per min_fetch_interval. Keys are
+    parsed once per fetch rather than on every verification.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        refresh_interval: float = 600.0,
+        min_fetch_interval: float = 30.0,
+        timeout: float = 5.0,
+    ):
+        """
+        Initialize the key cache.
+
+        Args:
+            url: JWKS endpoint
+            refresh_interval: Seconds after which keys are refreshed in the background
+            min_fetch_interval: Minimum seconds between fetches
+            timeout: Timeout of a fetch in seconds
+        """
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_fetch_interval = min_fetch_interval
+        self.timeout = timeout
+        self._keys: Dict[str, Tuple[Key, str]] = {}  # kid -> (parsed key, algorithm)
+        self._fetched_at = 0.0
+        self._last_attempt = float("-inf")
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self, kid: str, algorithm: str, wait: bool = False) -> Optional[Key]:
+        """
+        Look up a signing key.
+
+        Args:
+            kid: Key id from the token header
+            algorithm: Algorithm from the token header; a key only verifies
+                the algorithm it was published for
+            wait: Fetch synchronously if the key is unknown; only from threads
+                that may block (not the event loop)
+
+        Returns:
+            Optional[Key]: The parsed key, or None if it is not known (yet)
+        """
+        entry = self._keys.get(kid)
+        stale = time.monotonic() - self._fetched_at > self.refresh_interval
+        if entry is None and wait:
+            self.refresh()
+            entry = self._keys.get(kid)
+        elif entry is None or stale:
+            self.refresh_in_background()
+        if entry is None or entry[1] != algorithm:
+            return None
+        return entry[0]
+
+    def refresh(self) -> bool:
+        """Fetch the current keys unless a fetch was attempted within min_fetch_interval."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_attempt < self.min_fetch_interval:
+                return False
+            self._last_attempt = now
+        try:
+            response = httpx.get(self.url, timeout=self.timeout)
+            response.raise_for_status()
+            keys = {}
+            for key in response.json().get("keys", []):
+                algorithm = key.get("alg") or _DEFAULT_KEY_ALGORITHMS.get(key.get("kty"))
+                if "kid" in key and algorithm in ASYMMETRIC_ALGORITHMS:
+                    keys[key["kid"]] = (jwk.construct(key, algorithm), algorithm)
+        except Exception as e:
+            logger.warning(f"Could not fetch JWT signing keys from {self.url}: {str(e)}")
+            return False
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        logger.debug(f"Loaded {len(keys)} JWT signing keys from {self.url}")
+        return True
+
+    def refresh_in_background(self) -> None:
+        """Refresh the keys in a daemon thread, unless a refresh is already running."""
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._last_attempt < self.min_fetch_interval:
+                return
+            self._refreshing = True
+
+        def run() -> None:
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="jwks-refresh", daemon=True).start()
+
+
+_signing_keys: Optional[SigningKeyCache] = None
+
+
+# Claims of verified tokens by token digest, kept until the token expires, so a
+# client's repeated requests skip signature verification
+_verified_claims = BoundedTTLCache(
+    max_bytes=settings.AUTH_CLAIMS_CACHE_MAX_BYTES,
+    default_ttl=3600,
+    name="verified_token_claims",
+)
+
+
+@lru_cache(maxsize=8)
+def _hmac_key(secret: str, algorithm: str) -> Key:
+    """Parse an HMAC secret once."""
+    return jwk.construct(secret, algorithm)
+
+
+def get_signing_keys() -> Optional[SigningKeyCache]:
+    """Return the process-wide JWKS cache, or None when no JWKS URL is configured."""
+    global _signing_keys
+    if _signing_keys is None and settings.SUPABASE_JWKS_URL:
+        _signing_keys = SigningKeyCache(
+            settings.SUPABASE_JWKS_URL,
+            refresh_interval=settings.SUPABASE_JWKS_REFRESH_INTERVAL,
+        )
+    return _signing_keys
+
+
+def decode_access_token(token: str, wait_for_keys: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Verify a JWT locally and return its claims.
+    
+    HS256 tokens are checked with the Supabase JWT secret when configured,
+    otherwise SECRET_KEY (tokens from create_access_token). RS256/ES256 tokens
+    are checked with Supabase's public keys from SUPABASE_JWKS_URL. The
+    signature and expiry are checked, and for Supabase-signed tokens the issuer
+    (SUPABASE_JWT_ISSUER); the audience is not. No network call is made unless
+    wait_for_keys is set and the token's signing key is not cached.
+
+    Claims of tokens that verify are cached until the token expires, so the
+    same token is only verified once; callers must not modify them.
+    
+    Args:
+        token: Encoded JWT
+        wait_for_keys: Fetch unknown signing keys synchronously (blocks)
+        
+    Returns:
+        Optional[Dict[str, Any]]: Claims, or None if the token does not verify
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = _verified_claims.get(digest)
+    if claims is not None:
+        return claims
+
+    try:
+        header = jwt.get_unverified_header(token)
+    except JWTError:
+        return None
+
+    algorithm = header.get("alg")
+    issuer: Optional[str] = None
+    algorithms: List[str]
+    if algorithm in ASYMMETRIC_ALGORITHMS:
+        signing_keys = get_signing_keys()
+        key = signing_keys.get(header.get("kid", ""), algorithm, wait=wait_for_keys) if signing_keys else None
+        if key is None:
+            return None
+        algorithms = [algorithm]
+        issuer = settings.SUPABASE_JWT_ISSUER or None
+    else:
+        algorithms = [settings.ALGORITHM, "HS256"]
+        if algorithm not in algorithms:
+            return None
+        key = _hmac_key(settings.SUPABASE_JWT_SECRET if settings.SUPABASE_JWT_SECRET else settings.SECRET_KEY, algorithm)
+        if settings.SUPABASE_JWT_SECRET:
+            issuer = settings.SUPABASE_JWT_ISSUER or None
+
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=algorithms,
+            issuer=issuer,
+            options={"verify_signature": True, "verify_aud": False},
+        )
+    except JWTError:
+        return None
+
+    # Tokens without an expiry are verified every time
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)) and exp > time.time():
+        _verified_claims.set(digest, claims, len(token) + 64, ttl=exp - time.time())
+    return claims
@@ -0,0 +1,55 @@
+"""Async database session management for the MeatWise application.
+
+Used by the hot read routes (app/api/v1/endpoints/async_products.py and
+async_users.py), which are only mounted when async_db_enabled() is true, so
+this module may assume SQLAlchemy's asyncio extension is installed.
+"""
+
+import logging
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.engines import get_async_engine, registry
+from app.db.replicas import get_replica_router
+
+logger = logging.getLogger(__name__)
+
+# The primary database's async engine, from the registry
+async_engine = get_async_engine()
+
+# Objects stay usable after commit: routes return them once the session is closed
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Get an async database session.
+
+    Yields:
+        AsyncSession: A SQLAlchemy async session
+
+    Note:
+        This function is used as a dependency in async FastAPI endpoints
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db() -> AsyncIterator[AsyncSession]:
+    """
+    Get an async database session for read-only queries.
+
+    Bound to a healthy read replica when there is one, otherwise to the primary.
+
+    Yields:
+        AsyncSession: A SQLAlchemy async session
+    """
+    async with AsyncSessionLocal(bind=get_replica_router().async_read_engine()) as db:
+        yield db
+
+
+async def close_async_db_connections() -> None:
+    """Close async database connections on application shutdown."""
+    logger.info("Closing async database connections...")
+    await registry.dispose_all_async()
@@ -1,7 +1,7 @@
 """SQLAlchemy models for the MeatWise application."""
 
 from sqlalchemy import Column, String, Float, Boolean, DateTime, Text, ForeignKey, Integer, ARRAY
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from datetime import datetime
 
@@ -16,8 +16,11 @@ class Product(Base):
     code = Column(String, primary_key=True)
     name = Column(String, nullable=False)
     brand = Column(String)
-    description = Column(Text)
-    ingredients_text = Column(Text)
+    
+    # Heavy text columns are deferred: queries load them only when asked to
+    # (see app/db/projections.py)
+    description = deferred(Column(Text), group="heavy")
+    ingredients_text = deferred(Column(Text), group="heavy")
     
     # Nutritional information
     calories = Column(Float)
@@ -34,7 +37,7 @@ class Product(Base):
     
     # Image data
     image_url = Column(String)
-    image_data = Column(Text)
+    image_data = deferred(Column(Text), group="heavy")  # Base64 encoded image
     
     # Metadata
     last_updated = Column(DateTime(timezone=True), onupdate=func.now())
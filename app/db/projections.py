@@ -0,0 +1,90 @@
+"""Column projections for product queries.
+
+Product's description, ingredients_text and image_data (a base64 image, often
+tens of kilobytes) are deferred in the "heavy" group, so a plain
+query(Product) loads none of them. Each use case asks for the columns it needs
+with one of the loader options below:
+
+- PRODUCT_DETAIL: the whole row, for single-product responses.
+- PRODUCT_LISTING: everything but image_data, for list responses and catalog
+  scoring (which matches on description and ingredients_text).
+- PRODUCT_SIMILAR: the fields sent to Gemini as similar products.
+- PRODUCT_ALTERNATIVE: the fields of an alternative product response.
+
+An attribute left unloaded is fetched with its own query when it is read (and
+raises under an AsyncSession). Build responses from projected rows with
+loaded_columns, which leaves unloaded columns out. Group options only apply at
+the top of a query; for products loaded through a relationship, chain
+.undefer_group(HEAVY) on the relationship loader instead.
+"""
+
+from typing import Any, Dict
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, undefer_group
+
+from app.db.models import Product
+
+# Deferred column group of Product's heavy columns
+HEAVY = "heavy"
+
+PRODUCT_DETAIL = undefer_group(HEAVY)
+
+PRODUCT_LISTING = load_only(
+    Product.code,
+    Product.name,
+    Product.brand,
+    Product.description,
+    Product.ingredients_text,
+    Product.calories,
+    Product.protein,
+    Product.fat,
+    Product.carbohydrates,
+    Product.salt,
+    Product.meat_type,
+    Product.risk_rating,
+    Product.image_url,
+    Product.last_updated,
+    Product.created_at,
+)
+
+PRODUCT_SIMILAR = load_only(
+    Product.code,
+    Product.name,
+    Product.brand,
+    Product.ingredients_text,
+    Product.calories,
+    Product.protein,
+    Product.fat,
+    Product.carbohydrates,
+    Product.salt,
+    Product.meat_type,
+    Product.risk_rating,
+    Product.image_url,
+)
+
+PRODUCT_ALTERNATIVE = load_only(
+    Product.code,
+    Product.name,
+    Product.brand,
+    Product.risk_rating,
+)
+
+
+def loaded_columns(obj: Any) -> Dict[str, Any]:
+    """
+    Return the loaded column values of an ORM object, without loading the rest.
+
+    Args:
+        obj: ORM object, possibly loaded with a projection
+
+    Returns:
+        Dict[str, Any]: Column attribute names mapped to their values
+    """
+    state = inspect(obj)
+    unloaded = state.unloaded
+    return {
+        key: getattr(obj, key)
+        for key in state.mapper.column_attrs.keys()
+        if key not in unloaded
+    }
@@ -0,0 +1,213 @@
+"""Per-request SQL statistics for the MeatWise application.
+
+Every engine created by the registry (app/db/engines.py) reports each statement
+it runs to the QueryStats of the current request, held in a context variable
+set by QueryStatsMiddleware. Sync routes and dependencies run in threadpool
+threads with a copy of the request's context, so their statements land in the
+same QueryStats. Statements run outside a request (startup, background
+threads, scripts) are only counted in the process totals.
+
+A request has a query budget: DB_QUERY_BUDGET statements, or what its route
+declares with the query_budget dependency. Running the same statement shape
+(the SQL with its parameters left out) DB_REPEATED_QUERY_LIMIT times or more
+is reported as a likely N+1 query, such as a product lookup per scan history
+entry.
+"""
+
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.metrics import Sample, register_collector
+
+logger = logging.getLogger(__name__)
+
+# Statements kept per request for the slow request log
+SLOWEST_KEPT = 3
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+# Expanded IN lists and multi-row VALUES vary in length with their parameters
+_PARAMETER_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*\)")
+
+
+def statement_shape(statement: str) -> str:
+    """Return a statement with whitespace and parameter lists normalized, for grouping."""
+    return _PARAMETER_LIST.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryStats:
+    """The statements run for one request."""
+
+    __slots__ = ("count", "seconds", "shapes", "slowest", "budget")
+
+    def __init__(self, budget: Optional[int] = None):
+        self.count = 0
+        self.seconds = 0.0
+        # Statement shape -> times run
+        self.shapes: Dict[str, int] = {}
+        # (seconds, statement shape), slowest first
+        self.slowest: List[Tuple[float, str]] = []
+        self.budget = budget
+
+    def record(self, statement: str, seconds: float) -> None:
+        """Add one statement."""
+        self.count += 1
+        self.seconds += seconds
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+        if len(self.slowest) < SLOWEST_KEPT or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, shape))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[SLOWEST_KEPT:]
+
+    def repeated(self, limit: int) -> Dict[str, int]:
+        """Return the statement shapes run at least limit times (0 disables the check)."""
+        if limit <= 0:
+            return {}
+        return {shape: count for shape, count in self.shapes.items() if count >= limit}
+
+    def violations(self, repeat_limit: int) -> List[str]:
+        """
+        Describe how the request broke its query budget or repeated a statement.
+
+        Args:
+            repeat_limit: Runs of one statement shape that count as an N+1 query
+
+        Returns:
+            List[str]: One message per violation; empty when within budget
+        """
+        messages = []
+        if self.budget is not None and self.count > self.budget:
+            messages.append(f"{self.count} queries, budget {self.budget}")
+        for shape, count in self.repeated(repeat_limit).items():
+            messages.append(f"statement run {count} times: {shape[:200]}")
+        return messages
+
+
+class _Totals:
+    """Process-wide statement counts for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.seconds = 0.0
+        self.violations: Dict[str, int] = {"budget": 0, "repeated": 0}
+
+    def record(self, seconds: float) -> None:
+        """Add one statement."""
+        with self._lock:
+            self.queries += 1
+            self.seconds += seconds
+
+    def record_violations(self, stats: QueryStats, repeat_limit: int) -> None:
+        """Count a finished request's violations by kind."""
+        with self._lock:
+            if stats.budget is not None and stats.count > stats.budget:
+                self.violations["budget"] += 1
+            if stats.repeated(repeat_limit):
+                self.violations["repeated"] += 1
+
+    def collect(self) -> Iterable[Sample]:
+        """Expose statement totals and violations as metrics."""
+        with self._lock:
+            samples: List[Sample] = [
+                ("db_queries_total", {}, self.queries),
+                ("db_query_seconds_total", {}, self.seconds),
+            ]
+            for kind, count in self.violations.items():
+                samples.append(("db_query_budget_violations_total", {"kind": kind}, count))
+        return samples
+
+
+totals = _Totals()
+register_collector("db_queries", totals.collect)
+
+
+def current_stats() -> Optional[QueryStats]:
+    """Return the QueryStats of the current request, if any."""
+    return _current.get()
+
+
+def begin_request(budget: Optional[int] = None):
+    """
+    Start collecting statements for a request in the current context.
+
+    Args:
+        budget: Query budget; DB_QUERY_BUDGET (0 for none) if not given
+
+    Returns:
+        A token for end_request
+    """
+    if budget is None:
+        budget = settings.DB_QUERY_BUDGET or None
+    return _current.set(QueryStats(budget))
+
+
+def end_request(token) -> None:
+    """Stop collecting statements for the request begun with token."""
+    _current.reset(token)
+
+
+@contextmanager
+def track_queries(budget: Optional[int] = None) -> Iterator[QueryStats]:
+    """
+    Collect the statements run in a block, e.g. in a test or script.
+
+    Args:
+        budget: Query budget to check afterwards with QueryStats.violations
+
+    Yields:
+        QueryStats: The statements run so far
+    """
+    token = _current.set(QueryStats(budget))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def query_budget(max_queries: int) -> Callable[[], None]:
+    """
+    Build a route dependency setting the request's query budget.
+
+    Usage: @router.get("/history", dependencies=[Depends(query_budget(4))])
+
+    Args:
+        max_queries: Most statements the route may run, including its dependencies
+
+    Returns:
+        Callable[[], None]: The dependency
+    """
+
+    async def set_budget() -> None:
+        stats = _current.get()
+        if stats is not None:
+            stats.budget = max_queries
+
+    return set_budget
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Report an engine's statements to the current request's QueryStats."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info.pop("query_started_at", time.perf_counter())
+        totals.record(seconds)
+        stats = _current.get()
+        if stats is not None:
+            stats.record(statement, seconds)
@@ -0,0 +1,217 @@
+"""Read replica routing for the MeatWise application.
+
+Read-only catalog queries (product lookups, counts, recommendation catalog
+loads, cache warming) can be served by read replicas listed in
+DATABASE_REPLICA_URLS. A background thread checks each replica every
+DB_REPLICA_CHECK_INTERVAL seconds. A replica is used only while it answers and
+its replication lag is within DB_REPLICA_MAX_LAG_SECONDS. Healthy replicas
+share reads round-robin, and reads go to the primary when none is healthy.
+
+Writes and reads that must see the caller's own writes (profile, preferences,
+scan history, favorites) always use the primary through get_db.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.metrics import Sample, register_collector
+from app.db.engines import async_database_url, async_db_enabled, get_async_engine, get_engine, registry
+
+logger = logging.getLogger(__name__)
+
+# Seconds behind the primary; 0 when the replica has replayed everything it received
+_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+def replica_urls() -> List[str]:
+    """Return the configured replica URLs (none in test mode)."""
+    if os.getenv("TESTING", "false").lower() == "true":
+        return []
+    urls = []
+    for url in settings.DATABASE_REPLICA_URLS.split(","):
+        url = url.strip()
+        if url.startswith("postgres://"):
+            url = url.replace("postgres://", "postgresql://", 1)
+        if url:
+            urls.append(url)
+    return urls
+
+
+class Replica:
+    """A read replica and the result of its last health check."""
+
+    __slots__ = ("name", "engine", "async_engine", "healthy", "lag", "checked_at", "reads")
+
+    def __init__(self, name: str, engine: Engine, async_engine=None):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        # Unused until the first check passes
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.reads = 0
+
+
+class ReplicaRouter:
+    """
+    Picks the engine for read-only sessions.
+
+    Replicas are checked in a daemon thread. Between checks, a replica whose
+    connection drops during a query is marked unhealthy at once, so later reads
+    go elsewhere until a check succeeds again.
+    """
+
+    def __init__(self, replicas: List[Replica], max_lag: float, check_interval: float):
+        """
+        Initialize the router.
+
+        Args:
+            replicas: Read replicas
+            max_lag: Most replication lag, in seconds, a replica may have to serve reads
+            check_interval: Seconds between health checks
+        """
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.primary_reads = 0
+        self._next = 0
+        # Requests choose from many threads (and the event loop) at once
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        for replica in replicas:
+            self._mark_down_on_disconnect(replica)
+
+    def choose(self) -> Optional[Replica]:
+        """Return the next healthy replica, or None to read from the primary."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        with self._lock:
+            if not healthy:
+                self.primary_reads += 1
+                return None
+            self._next = (self._next + 1) % len(healthy)
+            replica = healthy[self._next]
+            replica.reads += 1
+        return replica
+
+    def read_engine(self) -> Engine:
+        """Return the engine for a read-only session."""
+        replica = self.choose()
+        return replica.engine if replica else get_engine()
+
+    def async_read_engine(self):
+        """Return the async engine for a read-only session."""
+        replica = self.choose()
+        if replica is not None and replica.async_engine is not None:
+            return replica.async_engine
+        return get_async_engine()
+
+    def check(self) -> None:
+        """Check every replica once, updating its health and lag."""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    if replica.engine.dialect.name == "postgresql":
+                        lag = float(connection.execute(_LAG_QUERY).scalar() or 0)
+                    else:
+                        connection.execute(text("SELECT 1"))
+                        lag = 0.0
+            except Exception as e:
+                if replica.healthy or replica.checked_at == 0.0:
+                    logger.warning(f"Read replica {replica.name} is unavailable: {str(e)}")
+                replica.healthy = False
+                replica.lag = None
+            else:
+                healthy = lag <= self.max_lag
+                if healthy != replica.healthy:
+                    logger.info(
+                        f"Read replica {replica.name} {'serving reads' if healthy else 'lagging, reads go elsewhere'}"
+                        f" (lag {lag:.1f}s)"
+                    )
+                replica.healthy = healthy
+                replica.lag = lag
+            replica.checked_at = time.time()
+
+    def start(self) -> None:
+        """Start checking replicas in a daemon thread (the first check runs at once)."""
+        if not self.replicas or self._thread is not None:
+            return
+
+        def run() -> None:
+            while not self._stop.is_set():
+                self.check()
+                self._stop.wait(self.check_interval)
+
+        self._thread = threading.Thread(target=run, name="replica-health", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the health checks."""
+        self._stop.set()
+
+    @staticmethod
+    def _mark_down_on_disconnect(replica: Replica) -> None:
+        """Take a replica out of rotation as soon as one of its connections drops."""
+
+        def on_error(context):
+            if context.is_disconnect and replica.healthy:
+                logger.warning(f"Lost connection to read replica {replica.name}; reading from others until it recovers")
+                replica.healthy = False
+
+        event.listen(replica.engine, "handle_error", on_error)
+        if replica.async_engine is not None:
+            event.listen(replica.async_engine.sync_engine, "handle_error", on_error)
+
+    def _collect_metrics(self) -> Iterable[Sample]:
+        """Expose replica health, lag and read routing as metrics."""
+        samples: List[Sample] = [("db_read_sessions_total", {"target": "primary"}, self.primary_reads)]
+        for replica in self.replicas:
+            labels = {"replica": replica.name}
+            samples.append(("db_replica_healthy", labels, 1 if replica.healthy else 0))
+            if replica.lag is not None:
+                samples.append(("db_replica_lag_seconds", labels, replica.lag))
+            samples.append(("db_read_sessions_total", {"target": replica.name}, replica.reads))
+        return samples
+
+
+_router: Optional[ReplicaRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_replica_router() -> ReplicaRouter:
+    """Return the process's replica router, registering the replica engines on first use."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                replicas = []
+                use_async = async_db_enabled()
+                for index, url in enumerate(replica_urls()):
+                    name = f"replica{index}"
+                    engine = registry.register(name, url)
+                    async_url = async_database_url(url) if use_async else None
+                    async_engine = registry.register_async(name, async_url) if async_url else None
+                    replicas.append(Replica(name, engine, async_engine))
+                if replicas:
+                    logger.info(f"Read replicas: {', '.join(replica.name for replica in replicas)}")
+                _router = ReplicaRouter(
+                    replicas,
+                    max_lag=settings.DB_REPLICA_MAX_LAG_SECONDS,
+                    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+                )
+                register_collector("db_replicas", _router._collect_metrics)
+    return _router
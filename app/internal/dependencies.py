@@ -11,34 +11,162 @@ from datetime import datetime
 from typing import Optional
 
 from app.core.config import settings
+from app.core.circuit_breaker import get_breaker
+from app.core.security import decode_access_token
 from app.core.supabase import supabase, admin_supabase
 from app.db.session import get_db
 from app.models import TokenPayload
 from app.db import models as db_models
+from app.services.user_profiles import UserProfile, cache_profile, get_cached_profile
 
 # OAuth2 password bearer scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
 logger = logging.getLogger(__name__)
 
 
-def get_current_user(
-    db: Session = Depends(get_db), 
-    token: str = Depends(oauth2_scheme)
-) -> db_models.User:
+def _is_upstream_failure(exc: Exception) -> bool:
+    """Check whether a Supabase Auth error means the service itself is degraded."""
+    status_code = getattr(exc, "status", None)
+    if isinstance(status_code, int):
+        return status_code >= 500 or status_code == 429
+    # No HTTP status means the request never got a proper answer (timeout, connection error)
+    return True
+
+
+def _user_from_claims(db: Session, claims: dict, credentials_exception: HTTPException) -> UserProfile:
     """
-    Get the current user from the token using Supabase verification.
-    If Supabase verification fails, falls back to manual JWT verification.
-    
-    Args:
-        db: Database session
-        token: OAuth2 token
-        
-    Returns:
-        User: User object
-        
-    Raises:
-        HTTPException: If token is invalid
+    Load the profile of the user named by verified token claims, from the
+    profile cache when possible. The profile row is created on first sign-in
+    when the token carries an email (Supabase tokens do).
+    """
+    user_id = claims.get("sub")
+    if user_id is None:
+        logger.warning("JWT missing 'sub' claim")
+        raise credentials_exception
+
+    profile = get_cached_profile(user_id)
+    if profile is not None:
+        return profile
+
+    user = db.query(db_models.User).filter(db_models.User.id == user_id).first()
+    if not user:
+        # Fallback - for some Supabase tokens the user id is in a nested claim
+        user_claim = claims.get("user")
+        if isinstance(user_claim, dict) and user_claim.get("id"):
+            user = db.query(db_models.User).filter(db_models.User.id == user_claim["id"]).first()
+    if user:
+        return cache_profile(user)
+
+    email = claims.get("email")
+    if not email:
+        logger.warning(f"User not found in database: {user_id}")
+        raise credentials_exception
+
+    # Signed up through Supabase but no profile row yet
+    logger.warning(f"User {user_id} not found in local DB profiles. Creating record.")
+    user_metadata = claims.get("user_metadata") or {}
+    new_user = db_models.User(id=str(user_id), email=email, full_name=user_metadata.get("full_name", ""))
+    try:
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+    except Exception as insert_exc:
+        logger.error(f"Failed to insert user {user_id} into local DB: {insert_exc}")
+        db.rollback()
+        raise credentials_exception
+    logger.info(f"Created new user record for Supabase user {user_id}")
+    return cache_profile(new_user)
+
+
+def _needs_remote_verification(token: str) -> bool:
+    """
+    Check whether a token may be a Supabase HS256 token that cannot be verified
+    locally, because SUPABASE_JWT_SECRET is not set.
+    """
+    if settings.SUPABASE_JWT_SECRET or not settings.SUPABASE_URL:
+        return False
+    try:
+        return jwt.get_unverified_header(token).get("alg") == "HS256"
+    except JWTError:
+        return False
+
+
+def _verify_locally(
+    db: Session,
+    token: str,
+    credentials_exception: HTTPException,
+    allow_remote: bool = True,
+) -> UserProfile:
+    """
+    Verify the token's signature, expiry and issuer locally and load its user.
+
+    HS256 tokens that fail while SUPABASE_URL is set without SUPABASE_JWT_SECRET
+    are checked with Supabase Auth instead (unless allow_remote is False), as
+    they were before tokens were verified locally.
+    """
+    # Dependencies run in the threadpool, so an unknown signing key may be fetched here
+    claims = decode_access_token(token, wait_for_keys=True)
+    if claims is None:
+        if allow_remote and _needs_remote_verification(token):
+            logger.debug("HS256 token failed local verification without SUPABASE_JWT_SECRET, checking with Supabase")
+            return _verify_remotely(db, token, credentials_exception)
+        logger.warning("JWT failed local verification")
+        raise credentials_exception
+    return _user_from_claims(db, claims, credentials_exception)
+
+
+def _verify_remotely(db: Session, token: str, credentials_exception: HTTPException) -> UserProfile:
     """
+    Verify the token with Supabase Auth, which also rejects revoked sessions.
+
+    Falls back to local verification when Supabase Auth is unavailable.
+    """
+    # Check if Supabase client is available
+    if not supabase or not hasattr(supabase, 'auth'):
+        logger.warning("Supabase client not available for token verification.")
+        return _verify_locally(db, token, credentials_exception, allow_remote=False)
+
+    # Skip the network round trip while Supabase Auth is known to be down
+    auth_breaker = get_breaker(
+        "supabase_auth",
+        failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout=settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+    )
+    if auth_breaker.is_open() or not auth_breaker.allow_request():
+        logger.debug("Supabase Auth circuit open, verifying token locally")
+        return _verify_locally(db, token, credentials_exception, allow_remote=False)
+
+    try:
+        logger.debug("Attempting to verify token with Supabase")
+        response = supabase.auth.get_user(token)
+    except Exception as auth_exc:
+        # Rejected tokens are not an upstream failure; outages and 5xx are
+        if _is_upstream_failure(auth_exc):
+            auth_breaker.record_failure()
+            logger.warning(f"Supabase Auth unavailable: {str(auth_exc)}. Verifying token locally.")
+            return _verify_locally(db, token, credentials_exception, allow_remote=False)
+        auth_breaker.record_success()
+        logger.warning(f"Supabase rejected token: {str(auth_exc)}")
+        raise credentials_exception
+    auth_breaker.record_success()
+
+    if not response or not hasattr(response, 'user') or not response.user:
+        logger.warning("Supabase token verification returned no user.")
+        raise credentials_exception
+
+    # Extract user data from the Supabase response
+    supabase_user = response.user
+    claims = {
+        "sub": str(supabase_user.id),
+        "email": getattr(supabase_user, 'email', None),
+        "user_metadata": getattr(supabase_user, 'user_metadata', {}) or {},
+    }
+    logger.debug(f"Successfully verified token for user {claims['sub']}")
+    return _user_from_claims(db, claims, credentials_exception)
+
+
+def _authenticate(db: Session, token: Optional[str], remote: bool) -> UserProfile:
+    """Resolve the user of a request, verifying the token locally or with Supabase Auth."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -76,144 +204,72 @@ def get_current_user(
         
     try:
         # Log token format for debugging (only first few chars for security)
-        logger.debug(f"Verifying token (length: {len(token)})")
-        
-        # Manual JWT verification method - used as a fallback if Supabase fails
-        def verify_manually():
-            logger.info("Using manual JWT verification")
-            try:
-                # Manually decode the JWT - use Supabase JWT secret for Supabase tokens
-                jwt_secret = settings.SUPABASE_JWT_SECRET if settings.SUPABASE_JWT_SECRET else settings.SECRET_KEY
-                payload = jwt.decode(
-                    token, 
-                    jwt_secret, 
-                    algorithms=[settings.ALGORITHM, "HS256"],
-                    options={"verify_signature": True, "verify_aud": False}  # Enable signature verification but disable audience verification for local dev
-                )
-                user_id = payload.get("sub")
-                if user_id is None:
-                    logger.warning("JWT missing 'sub' claim")
-                    raise credentials_exception
-                
-                logger.debug(f"JWT payload: {payload}")
-                
-                # Get user from database
-                user = db.query(db_models.User).filter(db_models.User.id == user_id).first()
-                if not user:
-                    # Fallback - try to extract userID from the token payload
-                    try:
-                        # For Supabase tokens, the subject might be in a different format
-                        if "user" in payload and isinstance(payload["user"], dict):
-                            user_id_alt = payload["user"].get("id")
-                            if user_id_alt:
-                                user = db.query(db_models.User).filter(db_models.User.id == user_id_alt).first()
-                    except Exception as e:
-                        logger.warning(f"Error during fallback user extraction: {e}")
-                            
-                    if not user:
-                        logger.warning(f"User not found in database: {user_id}")
-                        raise credentials_exception
-                
-                return user
-            except JWTError as e:
-                logger.error(f"JWT decode error: {e}")
-                raise credentials_exception
-
-        # Check if Supabase client is available
-        if not supabase or not hasattr(supabase, 'auth'):
-            logger.warning("Supabase client not available for token verification.")
-            return verify_manually()
-
-        # First, try to validate via Supabase
-        try:
-            # Verify token directly with Supabase
-            logger.debug("Attempting to verify token with Supabase")
-            response = supabase.auth.get_user(token)
-            
-            if not response or not hasattr(response, 'user') or not response.user:
-                logger.warning("Supabase token verification returned no user.")
-                return verify_manually()
-            
-            # Extract user data from the Supabase response
-            supabase_user = response.user
-            user_id = supabase_user.id
-            
-            # Ensure user_id is a string (convert UUID if needed)
-            user_id = str(user_id)
-                
-            user_email = getattr(supabase_user, 'email', None)
-            
-            # Log success for debugging
-            logger.debug(f"Successfully verified token for user {user_id}")
-            
-            # Try to fetch user from our database
-            user = db.query(db_models.User).filter(db_models.User.id == user_id).first()
-            
-            if user:
-                # User found in database - ensure ID is string
-                if hasattr(user.id, 'hex') or isinstance(user.id, uuid.UUID):
-                    user.id = str(user.id)
-                logger.debug(f"User {user_id} found in local DB.")
-                return user
-            else:
-                # User exists in Supabase but not in our database yet
-                # Create temporary user object with data from Supabase
-                logger.warning(f"User {user_id} not found in local DB profiles. Creating record.")
-                user_metadata = getattr(supabase_user, 'user_metadata', {}) or {}
-                full_name = user_metadata.get('full_name', '')
-                # role = user_metadata.get('role', 'basic') # Role field removed from model
-                
-                # --- Restoring INSERT logic --- 
-                # Create and save the user to our database
-                # Pass only fields that exist in the db_models.User model
-                new_user = db_models.User(
-                    id=user_id,
-                    email=user_email,
-                    full_name=full_name,
-                    # preferences=None # Initialize preferences if needed
-                )
-                
-                # Add the user to the database to avoid recreating it on every request
-                # This might fail if there are transaction/timing issues with auth.users
-                try:
-                    db.add(new_user)
-                    db.commit()
-                    db.refresh(new_user)
-                    logger.info(f"Created new user record for Supabase user {user_id}")
-                    return new_user
-                except Exception as insert_exc:
-                    logger.error(f"Failed to insert user {user_id} into local DB: {insert_exc}")
-                    db.rollback()
-                    # If insert fails, fall back to manual verification for this request
-                    logger.warning("Falling back to manual verification due to DB insert failure.")
-                    return verify_manually()
-
-                # --- Removed temporary object creation logic ---
-                # temp_user_obj = type('TempUser', (object,), {
-                #     'id': user_id,
-                #     'email': user_email,
-                #     'full_name': full_name,
-                #     'preferences': None, # No preferences known yet
-                #     'created_at': None, # Not available without DB record
-                #     'updated_at': None  # Not available without DB record
-                # })
-                # return temp_user_obj
-            
-        except Exception as e:
-            # Log the specific error from Supabase or DB interaction
-            logger.warning(f"Supabase/DB error during user lookup/creation: {str(e)}. Falling back to manual verification.")
-            # Rollback any potential transaction changes from failed insert attempt
-            try:
-                db.rollback()
-            except Exception as rb_exc:
-                 logger.error(f"Error during rollback: {rb_exc}")
-            return verify_manually()
-            
+        logger.debug(f"Verifying token (length: {len(token)}, remote: {remote})")
+        if remote:
+            return _verify_remotely(db, token, credentials_exception)
+        return _verify_locally(db, token, credentials_exception)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Unexpected error during authentication: {str(e)}")
+        try:
+            db.rollback()
+        except Exception as rb_exc:
+            logger.error(f"Error during rollback: {rb_exc}")
         raise credentials_exception
 
 
+def get_current_user(
+    db: Session = Depends(get_db), 
+    token: str = Depends(oauth2_scheme)
+) -> UserProfile:
+    """
+    Get the current user from the token.
+
+    The token is verified locally (signature, expiry and issuer; see
+    decode_access_token), without a network call. With AUTH_REMOTE_VERIFY it is
+    also checked with Supabase Auth, like get_current_user_verified_remotely.
+    Verified claims and profiles are cached, so repeated requests make no
+    database queries here.
+    
+    Args:
+        db: Database session
+        token: OAuth2 token
+        
+    Returns:
+        UserProfile: Read-only snapshot of the user's profile; routes that
+        modify the profile load the row themselves
+        
+    Raises:
+        HTTPException: If token is invalid
+    """
+    return _authenticate(db, token, remote=settings.AUTH_REMOTE_VERIFY)
+
+
+def get_current_user_verified_remotely(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+) -> UserProfile:
+    """
+    Get the current user, checking the token with Supabase Auth.
+
+    For revocation-sensitive routes: a token whose session was revoked (sign
+    out, password change) is rejected even though it has not expired. Falls
+    back to local verification while Supabase Auth is unavailable.
+    
+    Args:
+        db: Database session
+        token: OAuth2 token
+        
+    Returns:
+        UserProfile: Read-only snapshot of the user's profile
+        
+    Raises:
+        HTTPException: If token is invalid
+    """
+    return _authenticate(db, token, remote=True)
+
+
 def get_current_active_user(
     current_user: db_models.User = Depends(get_current_user),
 ) -> db_models.User:
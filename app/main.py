@@ -2,11 +2,12 @@
 Main application module for the MeatWise API.
 """
 
+import asyncio
 import sys
 import uvicorn
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import logging
 import time
 import os
@@ -38,10 +39,18 @@ except ValueError as e:
     sys.exit(1)
 
 from app.routers import api_router
-from app.middleware.security import add_security_middleware
-from app.middleware.validation import add_validation_middleware
+from app.middleware.pipeline import add_middleware_pipeline
 from app.middleware.caching import add_caching_middleware
+from app.middleware.compression import add_compression_middleware
+from app.middleware.query_stats import add_query_stats_middleware
 from app.db.connection import close_db_connections, is_using_local_db
+from app.db.engines import registry
+from app.db.replicas import get_replica_router
+from app.core.circuit_breaker import get_breaker_states
+from app.core.metrics import render_prometheus
+from app.core.security import get_signing_keys
+from app.services.cache_warming import run_cache_warmer
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -52,15 +61,18 @@ app = FastAPI(
     redoc_url=f"{settings.API_V1_STR}/redoc",
 )
 
-# Add security middleware
-add_security_middleware(app)
+# Add security and validation middleware (one pipeline: headers, path traversal, body validation, rate limit, JWT errors)
+add_middleware_pipeline(app)
 
-# Add validation middleware
-add_validation_middleware(app)
+# Add compression middleware (inside caching, so cached responses are stored compressed)
+add_compression_middleware(app)
 
 # Add caching middleware
 add_caching_middleware(app)
 
+# Add SQL statistics middleware (outside caching, so cache hits report no queries)
+add_query_stats_middleware(app)
+
 # Set all CORS enabled origins
 if settings.parsed_cors_origins:
     app.add_middleware(
@@ -69,6 +81,7 @@ if settings.parsed_cors_origins:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
     )
 else:
     # If no origins are defined, allow all for local development or specific cases
@@ -79,6 +92,7 @@ else:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
     )
 
 # Include API router
@@ -88,7 +102,17 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 @app.get("/health", tags=["Health"])
 async def health_check():
     """Health check endpoint for monitoring and load balancers."""
-    return {"status": "healthy", "timestamp": time.time(), "using_local_db": is_using_local_db()}
+    return {
+        "status": "healthy",
+        "timestamp": time.time(),
+        "using_local_db": is_using_local_db(),
+        "circuit_breakers": get_breaker_states(),
+    }
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus-format metrics (circuit breakers, LLM hedging, ...)."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health/db", tags=["Health"])
 async def db_health_check():
@@ -138,7 +162,8 @@ async def supabase_health_check():
             return {
                 "status": "healthy", 
                 "supabase": "connected",
-                "data": test_response.data if test_response.data else None
+                "data": test_response.data if test_response.data else None,
+                "auth_circuit": get_breaker_states().get("supabase_auth", {"state": "closed"})
             }
         except Exception as query_err:
             logger.error(f"Supabase query failed: {str(query_err)}")
@@ -177,12 +202,40 @@ def startup_event():
         logger.error(f"Failed to initialize Supabase client at startup: {str(e)}")
         # Don't fail startup, just log the error
 
+    # Load JWT signing keys so the first requests do not wait for them
+    signing_keys = get_signing_keys()
+    if signing_keys:
+        signing_keys.refresh_in_background()
+
+    # Check read replicas in the background; reads use the primary until one passes
+    get_replica_router().start()
+
+# Background cache warming (see app/services/cache_warming.py)
+_cache_warmer_task = None
+
+@app.on_event("startup")
+async def start_cache_warmer():
+    """Start warming caches for popular products, if enabled."""
+    global _cache_warmer_task
+    if settings.CACHE_WARM_ON_STARTUP or settings.CACHE_WARM_INTERVAL > 0:
+        _cache_warmer_task = asyncio.create_task(
+            run_cache_warmer(app, settings.CACHE_WARM_ON_STARTUP, settings.CACHE_WARM_INTERVAL)
+        )
+
 # Register shutdown event handler
 @app.on_event("shutdown")
 def shutdown_event():
     """Handle graceful shutdown."""
     logger.info("Application shutting down...")
+    if _cache_warmer_task is not None:
+        _cache_warmer_task.cancel()
+    get_replica_router().stop()
     close_db_connections()
 
+@app.on_event("shutdown")
+async def close_async_db_engines():
+    """Close the async engine's connections, which must be closed on the event loop."""
+    await registry.dispose_all_async()
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
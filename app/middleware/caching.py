@@ -1,182 +1,312 @@
 """Caching middleware for the MeatWise API."""
 
-import json
 import hashlib
-import time
-from fastapi import FastAPI, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Callable, Dict, List, Optional, Set
-from starlette.types import ASGIApp
+import re
+from fastapi import FastAPI
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.cache import NO_STORE_HEADER, SURROGATE_KEY_HEADER, TieredResponseCache, get_response_cache
 from app.core.config import settings
+from app.core.security import decode_access_token, get_bearer_token
+from app.middleware.compression import negotiate_encoding
+from app.services.preference_fingerprint import cached_preference_fingerprint, get_preference_fingerprint
+from app.utils import conditional
 
-# Redis imports - will be conditionally used
-try:
-    import redis
-    REDIS_AVAILABLE = True
-except ImportError:
-    REDIS_AVAILABLE = False
+_SURROGATE_KEY = SURROGATE_KEY_HEADER.lower().encode("latin-1")
+_NO_STORE = NO_STORE_HEADER.lower().encode("latin-1")
 
+# What a cached response varies on besides method, path and query
+VARY_NONE = "none"
+VARY_USER = "user"
+VARY_PREFERENCES = "preferences"
+
+
+class CachePolicy:
+    """Caching rules for the routes matching a path pattern."""
+
+    def __init__(
+        self,
+        pattern: str,
+        ttl: Optional[int] = None,
+        vary: str = VARY_NONE,
+        requires_auth: bool = False,
+    ):
+        """
+        Initialize a cache policy.
+
+        Args:
+            pattern: Regular expression matched against the request path
+            ttl: Time-to-live in seconds (defaults to the middleware TTL)
+            vary: VARY_NONE, VARY_USER (key includes the user id) or
+                VARY_PREFERENCES (key includes the preference fingerprint)
+            requires_auth: Only serve hits to requests with a valid bearer token;
+                implied by VARY_USER and VARY_PREFERENCES
+        """
+        if vary not in (VARY_NONE, VARY_USER, VARY_PREFERENCES):
+            raise ValueError(f"Unknown cache vary mode: {vary}")
+        self.pattern = re.compile(pattern)
+        self.ttl = ttl
+        self.vary = vary
+        self.requires_auth = requires_auth or vary != VARY_NONE
+
+    def matches(self, path: str) -> bool:
+        """Check whether the policy applies to a path."""
+        return self.pattern.match(path) is not None
+
+
+# First matching policy wins, so specific routes come before catch-alls
+DEFAULT_CACHE_POLICIES = [
+    # Personalized by preferences only, so users with identical preferences share entries
+    CachePolicy(r"^/api/v1/products/recommendations/?$", ttl=900, vary=VARY_PREFERENCES),
+    CachePolicy(r"^/api/v1/products/[^/]+/health-assessment/?$", ttl=86400, vary=VARY_PREFERENCES),
+    # Product data is purged by surrogate key on writes, so it can be cached for days
+    # The product list is the same for everyone but requires a signed-in user
+    CachePolicy(r"^/api/v1/products/?$", ttl=settings.RESPONSE_CACHE_PRODUCT_TTL, requires_auth=True),
+    CachePolicy(r"^/api/v1/products/", ttl=settings.RESPONSE_CACHE_PRODUCT_TTL),
+    CachePolicy(r"^/api/v1/ingredients/"),
+]
+
+
+class CachingMiddleware:
+    """
+    Pure ASGI middleware to cache response data to improve performance.
+
+    Cache hits are answered without calling the app. On a miss the response is
+    streamed to the client unchanged while its body chunks are collected, and
+    the entry is stored once the last chunk has been sent.
+
+    Responses may name the data they were built from in a Surrogate-Key header
+    (space-separated tags). The header is stripped before the response is sent
+    and the entry is indexed under those tags, so writes can purge it by tag.
+    Responses carrying the internal X-Cache-No-Store header (also stripped) are
+    passed through without being stored.
+
+    Each request is matched against a list of CachePolicy objects. Policies that
+    vary on the user or their preferences verify the bearer token locally and add
+    the user id or preference fingerprint to the key; if the token cannot be
+    verified the request bypasses the cache.
+
+    With vary_encoding, the content coding negotiated from Accept-Encoding is
+    part of the key. CompressionMiddleware runs inside this one, so each coding
+    is stored already compressed and hits cost no compression work.
+    """
 
-class CachingMiddleware(BaseHTTPMiddleware):
-    """Middleware to cache response data to improve performance."""
-    
     def __init__(
         self,
         app: ASGIApp,
-        cacheable_paths: Optional[List[str]] = None,
+        policies: Optional[List[CachePolicy]] = None,
         ttl: int = 3600,  # Default: 1 hour
         redis_url: Optional[str] = None,
+        max_bytes: int = 64 * 1024 * 1024,
+        sweep_interval: float = 60.0,
+        cache: Optional[TieredResponseCache] = None,
+        vary_encoding: bool = False,
     ):
         """
         Initialize caching middleware.
-        
+
         Args:
             app: The ASGI app
-            cacheable_paths: List of path prefixes that should be cached
+            policies: Cache policies, checked in order (defaults to DEFAULT_CACHE_POLICIES)
             ttl: Time-to-live for cached data in seconds
             redis_url: Optional Redis URL for distributed caching
+            max_bytes: Byte budget for the in-process cache
+            sweep_interval: Seconds between expiry sweeps of the in-process cache
+            cache: Shared cache to use instead of building one from the other arguments
+            vary_encoding: Key entries by negotiated content coding (set when
+                CompressionMiddleware is installed inside this middleware)
         """
-        super().__init__(app)
-        self.cacheable_paths = cacheable_paths or [
-            "/api/v1/products/", 
-            "/api/v1/ingredients/"
-        ]
+        self.app = app
+        self.policies = policies if policies is not None else DEFAULT_CACHE_POLICIES
         self.ttl = ttl
-        self.local_cache: Dict[str, Dict] = {}
-        
-        # Set up Redis connection if URL provided and Redis is available
-        self.redis_client = None
-        if redis_url and REDIS_AVAILABLE:
-            try:
-                self.redis_client = redis.from_url(redis_url)
-                # Test connection
-                self.redis_client.ping()
-                print("Connected to Redis for response caching")
-            except Exception as e:
-                print(f"Failed to connect to Redis for caching: {str(e)}")
-                self.redis_client = None
-    
-    def _generate_cache_key(self, request: Request) -> str:
-        """Generate a unique cache key based on path and query parameters."""
+        self.vary_encoding = vary_encoding
+        self.cache = cache or TieredResponseCache(
+            ttl=ttl,
+            redis_url=redis_url,
+            max_bytes=max_bytes,
+            sweep_interval=sweep_interval,
+        )
+
+    def _generate_cache_key(self, scope: Scope, vary_key: str = "") -> str:
+        """Generate a unique cache key based on path, query parameters, the policy's vary key and content coding."""
+        query_params = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+
         # Create a unique key based on path and query parameters
         key_parts = [
-            request.method,
-            request.url.path,
-            str(sorted([(k, v) for k, v in request.query_params.items()]))
+            scope["method"],
+            scope["path"],
+            str(sorted(dict(query_params).items())),
+            vary_key,
         ]
-        
+        if self.vary_encoding:
+            key_parts.append(negotiate_encoding(Headers(scope=scope).get("accept-encoding")))
+
         # Add a hash of the path to make the key safer for storage
         key = hashlib.md5(":".join(key_parts).encode()).hexdigest()
         return f"cache:{key}"
-    
-    def _is_cacheable(self, request: Request) -> bool:
-        """Determine if the request should be cached."""
+
+    def _match_policy(self, scope: Scope) -> Optional[CachePolicy]:
+        """Find the cache policy for the request, or None if it should not be cached."""
         # Only cache GET requests
-        if request.method != "GET":
-            return False
-        
-        # Check if the path should be cached
-        for path in self.cacheable_paths:
-            if request.url.path.startswith(path):
-                return True
-                
-        return False
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        if scope["method"] != "GET":
+            return None
+
+        path = scope["path"]
+        for policy in self.policies:
+            if policy.matches(path):
+                return policy
+
+        return None
+
+    async def _vary_key(self, policy: CachePolicy, scope: Scope) -> Optional[str]:
+        """
+        Build the user-dependent part of the cache key.
+
+        Returns:
+            Optional[str]: The vary key ("" for shared entries), or None if the
+            request must bypass the cache because its token does not verify
+        """
+        if not policy.requires_auth:
+            return ""
+
+        token = get_bearer_token(Headers(scope=scope).get("authorization"))
+        claims = decode_access_token(token) if token else None
+        user_id = claims.get("sub") if claims else None
+        if not user_id:
+            return None
+
+        if policy.vary == VARY_USER:
+            return f"user:{user_id}"
+        if policy.vary == VARY_PREFERENCES:
+            fingerprint = cached_preference_fingerprint(user_id)
+            if fingerprint is None:
+                fingerprint = await run_in_threadpool(get_preference_fingerprint, user_id)
+            return f"prefs:{fingerprint}" if fingerprint else None
+        return ""
+
+    async def _get_cached(self, cache_key: str) -> Optional[Dict]:
+        """Look up a cached response."""
+        return await self.cache.get(cache_key)
+
+    async def _store(
+        self,
+        cache_key: str,
+        response_data: Dict,
+        ttl: Optional[int] = None,
+        tags: Sequence[str] = (),
+    ) -> None:
+        """Store a response in the cache."""
+        await self.cache.set(cache_key, response_data, ttl=ttl or self.ttl, tags=tags)
+
+    async def _send_cached(self, cached_response: Dict, scope: Scope, send: Send) -> None:
+        """Replay a cached response, or a 304 if the client's copy is still current."""
+        validators = [
+            (name, value) for name, value in cached_response.get("headers", [])
+            if name.lower() in (b"etag", b"last-modified")
+        ]
+        if validators:
+            cached_headers = dict((name.lower(), value.decode("latin-1")) for name, value in validators)
+            etag = cached_headers.get(b"etag")
+            last_modified = conditional.parse_http_date(cached_headers.get(b"last-modified"))
+            if conditional.is_not_modified(Headers(scope=scope), etag, last_modified):
+                # Keep the client's copy fresh under the same Cache-Control
+                headers = validators + [
+                    (name, value) for name, value in cached_response.get("headers", [])
+                    if name.lower() == b"cache-control"
+                ]
+                await send({"type": "http.response.start", "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        await send({
+            "type": "http.response.start",
+            "status": cached_response.get("status_code", 200),
+            "headers": [tuple(header) for header in cached_response.get("headers", [])],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": cached_response.get("content", b""),
+        })
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Apply caching logic."""
         # Check if request should be cached
-        if not self._is_cacheable(request):
-            return await call_next(request)
-            
+        policy = self._match_policy(scope) if scope["type"] == "http" else None
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        vary_key = await self._vary_key(policy, scope)
+        if vary_key is None:
+            await self.app(scope, receive, send)
+            return
+
         # Generate cache key
-        cache_key = self._generate_cache_key(request)
-        
-        # Try to get from cache
-        cached_response = None
-        
-        # Try Redis first if available
-        if self.redis_client:
-            cached_data = self.redis_client.get(cache_key)
-            if cached_data:
-                try:
-                    cached_response = json.loads(cached_data)
-                except Exception:
-                    # If we can't parse the cached data, ignore it
-                    pass
-        # Try local cache otherwise
-        elif cache_key in self.local_cache:
-            cached_entry = self.local_cache[cache_key]
-            # Check if entry is still valid
-            if time.time() < cached_entry.get("expires_at", 0):
-                cached_response = cached_entry.get("data")
-            else:
-                # Remove expired entry
-                del self.local_cache[cache_key]
-                
+        cache_key = self._generate_cache_key(scope, vary_key)
+
+        cached_response = await self._get_cached(cache_key)
         if cached_response:
             # Return cached response
-            return Response(
-                content=cached_response.get("content"),
-                status_code=cached_response.get("status_code", 200),
-                headers=cached_response.get("headers", {}),
-                media_type=cached_response.get("media_type", "application/json")
-            )
-        
-        # Process the request
-        response = await call_next(request)
-        
-        # Cache successful responses
-        if 200 <= response.status_code < 300:
-            # Read response body
-            response_body = b""
-            async for chunk in response.body_iterator:
-                response_body += chunk
-                
-            # Create a new response with the same body
-            new_response = Response(
-                content=response_body,
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=response.media_type
-            )
-            
-            # Cache response data
-            response_data = {
-                "content": response_body,
-                "status_code": response.status_code,
-                "headers": dict(response.headers),
-                "media_type": response.media_type
-            }
-            
-            # Store in Redis if available
-            if self.redis_client:
-                try:
-                    self.redis_client.setex(
-                        cache_key,
-                        self.ttl,
-                        json.dumps(response_data)
-                    )
-                except Exception as e:
-                    print(f"Failed to cache response in Redis: {str(e)}")
-            # Store in local cache otherwise
-            else:
-                self.local_cache[cache_key] = {
-                    "data": response_data,
-                    "expires_at": time.time() + self.ttl
-                }
-                
-            return new_response
-        
-        return response
+            await self._send_cached(cached_response, scope, send)
+            return
+
+        # Collect body chunks of successful responses while streaming them through
+        status_code = 0
+        headers: List[Tuple[bytes, bytes]] = []
+        tags: List[str] = []
+        chunks: List[bytes] = []
+        capture = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, headers, capture
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = []
+                no_store = False
+                for name, value in message.get("headers", []):
+                    lowered = name.lower()
+                    if lowered == _SURROGATE_KEY:
+                        tags.extend(value.decode("latin-1").split())
+                    elif lowered == _NO_STORE:
+                        no_store = True
+                    else:
+                        headers.append((name, value))
+                if tags or no_store:
+                    message = {**message, "headers": headers}
+                # Never share responses that set cookies
+                capture = 200 <= status_code < 300 and not no_store and not any(
+                    name.lower() == b"set-cookie" for name, _ in headers
+                )
+                await send(message)
+                return
+
+            await send(message)
+
+            if capture and message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                if body:
+                    chunks.append(body)
+                if not message.get("more_body", False):
+                    capture = False
+                    # Cache response data
+                    await self._store(cache_key, {
+                        "content": b"".join(chunks),
+                        "status_code": status_code,
+                        "headers": headers,
+                    }, ttl=policy.ttl, tags=tags)
+
+        await self.app(scope, receive, send_wrapper)
 
 
 def add_caching_middleware(app: FastAPI) -> None:
     """Add caching middleware to the app."""
-    redis_url = getattr(settings, "REDIS_URL", None)
-    ttl = getattr(settings, "REDIS_TTL", 3600)
-    
     app.add_middleware(
         CachingMiddleware,
-        ttl=ttl,
-        redis_url=redis_url
-    ) 
\ No newline at end of file
+        ttl=settings.REDIS_TTL,
+        cache=get_response_cache(),
+        vary_encoding=settings.COMPRESSION_ENABLED,
+    )
@@ -0,0 +1,234 @@
+"""Response compression middleware for the MeatWise API."""
+
+import gzip
+import logging
+import zlib
+from fastapi import FastAPI
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Brotli imports - will be conditionally used
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+IDENTITY = "identity"
+GZIP = "gzip"
+BROTLI = "br"
+
+# Preferred first when the client accepts both with equal weight
+SUPPORTED_ENCODINGS = [BROTLI, GZIP] if BROTLI_AVAILABLE else [GZIP]
+
+# Bodies that are already compressed (images, archives) are left alone
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """
+    Pick the content coding for a response from an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Raw header value, e.g. "gzip, deflate, br;q=0.9"
+
+    Returns:
+        str: "br", "gzip" or "identity"
+    """
+    if not accept_encoding:
+        return IDENTITY
+
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    best, best_weight = IDENTITY, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def _is_compressible(content_type: str) -> bool:
+    """Check whether a media type is worth compressing."""
+    content_type = content_type.lower()
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+class _Compressor:
+    """Incremental gzip or brotli compressor for one response."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == BROTLI:
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk; output may be buffered until flush() or finish()."""
+        if self.encoding == BROTLI:
+            return self._brotli.process(data)
+        return self._gzip.compress(data)
+
+    def flush(self) -> bytes:
+        """Emit everything compressed so far, so a streamed chunk reaches the client."""
+        if self.encoding == BROTLI:
+            return self._brotli.flush()
+        return self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        """Finish the stream."""
+        if self.encoding == BROTLI:
+            return self._brotli.finish()
+        return self._gzip.flush(zlib.Z_FINISH)
+
+
+def compress_body(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 5) -> bytes:
+    """Compress a complete body with the given content coding."""
+    if encoding == BROTLI:
+        return brotli.compress(body, quality=brotli_quality)
+    if encoding == GZIP:
+        return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    return body
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing responses with gzip or brotli.
+
+    The coding is negotiated from the request's Accept-Encoding header. Bodies
+    smaller than minimum_size, media types that are already compressed and
+    responses that already carry a Content-Encoding are passed through.
+    Compressed responses get a weak ETag, since the bytes no longer match the
+    identity representation, and every compressible response gets
+    "Vary: Accept-Encoding".
+
+    It runs inside CachingMiddleware, so the cache stores each response in the
+    coding it was sent with and hits are replayed without compressing again.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+    ):
+        """
+        Initialize compression middleware.
+
+        Args:
+            app: The ASGI app
+            minimum_size: Smallest body in bytes that is compressed
+            gzip_level: zlib compression level (1-9)
+            brotli_quality: Brotli quality (0-11); higher is smaller but slower
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Apply compression logic."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        start_message: Optional[Message] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                # Hold the start message until the first body chunk shows the size
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = MutableHeaders(raw=list(start_message.get("headers", [])))
+                compressible = (
+                    _is_compressible(headers.get("content-type", ""))
+                    and "content-encoding" not in headers
+                    and start_message["status"] not in (204, 304)
+                )
+                if compressible:
+                    headers.add_vary_header("Accept-Encoding")
+                size = int(headers["content-length"]) if "content-length" in headers else None
+                too_small = (size if size is not None else len(body)) < self.minimum_size and not (size is None and more_body)
+                if not compressible or encoding == IDENTITY or too_small:
+                    passthrough = True
+                    await send({**start_message, "headers": headers.raw})
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers["content-encoding"] = encoding
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["etag"] = f"W/{etag}"
+
+                if not more_body:
+                    # Single-chunk response: compress it whole and send the real length
+                    compressed = compress_body(body, encoding, self.gzip_level, self.brotli_quality)
+                    headers["content-length"] = str(len(compressed))
+                    await send({**start_message, "headers": headers.raw})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+                # Streamed response: the compressed length is not known up front
+                del headers["content-length"]
+                await send({**start_message, "headers": headers.raw})
+
+            if more_body:
+                chunk = compressor.compress(body) + compressor.flush()
+            else:
+                chunk = compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def add_compression_middleware(app: FastAPI) -> None:
+    """Add compression middleware to the app (before caching, so it runs inside it)."""
+    if not settings.COMPRESSION_ENABLED:
+        return
+    logger.info(f"Compressing responses with {', '.join(SUPPORTED_ENCODINGS)} from {settings.COMPRESSION_MIN_BYTES} bytes")
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_BYTES,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
@@ -0,0 +1,148 @@
+"""SQL statistics middleware for the MeatWise API."""
+
+import json
+import logging
+from typing import List
+
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.query_stats import QueryStats, begin_request, current_stats, end_request, totals
+
+logger = logging.getLogger(__name__)
+
+_SERVER_TIMING = b"server-timing"
+
+OFF = "off"
+WARN = "warn"
+RAISE = "raise"
+
+
+class QueryStatsMiddleware:
+    """
+    Pure ASGI middleware collecting the SQL statements each request runs.
+
+    With server_timing, every response gets a "db" Server-Timing entry with
+    the request's query count and total database time; it tells any client how
+    long its request spent in the database, so it is off unless enabled.
+    Requests that exceed their query budget or
+    repeat a statement shape are logged in "warn" mode; in "raise" mode, meant
+    for tests, their response is replaced with a 500 listing the violations.
+    Requests whose database time reaches slow_request_ms have their slowest
+    statements logged.
+
+    It runs outside CachingMiddleware, so cached responses never replay the
+    header of the request that filled the cache.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        mode: str = WARN,
+        repeat_limit: int = 5,
+        slow_request_ms: float = 500,
+        server_timing: bool = False,
+    ):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The ASGI app
+            mode: "off", "warn" or "raise" for budget and repeated statement violations
+            repeat_limit: Runs of one statement shape that count as an N+1 query
+            slow_request_ms: Database time from which a request's slowest statements are logged
+            server_timing: Whether responses carry the "db" Server-Timing entry
+        """
+        self.app = app
+        self.mode = mode
+        self.repeat_limit = repeat_limit
+        self.slow_request_seconds = slow_request_ms / 1000
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Collect statements while the app handles the request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = begin_request()
+        stats = current_stats()
+        replaced = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal replaced
+            if replaced:
+                return
+            if message["type"] == "http.response.start":
+                violations = self._check(scope, stats)
+                if violations and self.mode == RAISE:
+                    replaced = True
+                    await self._send_violations(send, stats, violations)
+                    return
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((_SERVER_TIMING, self._server_timing(stats)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request(token)
+
+    def _check(self, scope: Scope, stats: QueryStats) -> List[str]:
+        """Log slow requests and return the request's budget violations."""
+        path = scope.get("path", "")
+        if stats.seconds >= self.slow_request_seconds:
+            slowest = "; ".join(f"{seconds * 1000:.1f} ms: {shape[:200]}" for seconds, shape in stats.slowest)
+            logger.warning(
+                f"{scope.get('method')} {path} spent {stats.seconds * 1000:.1f} ms in {stats.count} queries."
+                f" Slowest: {slowest}"
+            )
+        if self.mode == OFF:
+            return []
+        violations = stats.violations(self.repeat_limit)
+        if violations:
+            totals.record_violations(stats, self.repeat_limit)
+            logger.warning(f"Query budget exceeded by {scope.get('method')} {path}: {'; '.join(violations)}")
+        return violations
+
+    @staticmethod
+    def _server_timing(stats: QueryStats) -> bytes:
+        """Format the request's database time as a Server-Timing entry."""
+        queries = "1 query" if stats.count == 1 else f"{stats.count} queries"
+        return f'db;dur={stats.seconds * 1000:.3f};desc="{queries}"'.encode("latin-1")
+
+    async def _send_violations(self, send: Send, stats: QueryStats, violations: List[str]) -> None:
+        """Answer with a 500 listing the violations instead of the app's response."""
+        body = json.dumps({"detail": "Query budget exceeded", "violations": violations}).encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ]
+        if self.server_timing:
+            headers.append((_SERVER_TIMING, self._server_timing(stats)))
+        await send({"type": "http.response.start", "status": 500, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def add_query_stats_middleware(app: FastAPI) -> None:
+    """Add SQL statistics middleware to the app (after caching, so it runs outside it)."""
+    if not settings.DB_QUERY_STATS:
+        return
+    mode = settings.DB_QUERY_BUDGET_MODE.lower()
+    if mode not in (OFF, WARN, RAISE):
+        logger.warning(f"Unknown DB_QUERY_BUDGET_MODE {settings.DB_QUERY_BUDGET_MODE!r}; using {WARN!r}")
+        mode = WARN
+    logger.info(
+        f"SQL statistics: budget {settings.DB_QUERY_BUDGET or 'none'}, repeat limit "
+        f"{settings.DB_REPEATED_QUERY_LIMIT or 'none'}, mode {mode}, Server-Timing {settings.DB_SERVER_TIMING}"
+    )
+    app.add_middleware(
+        QueryStatsMiddleware,
+        mode=mode,
+        repeat_limit=settings.DB_REPEATED_QUERY_LIMIT,
+        slow_request_ms=settings.DB_SLOW_REQUEST_MS,
+        server_timing=settings.DB_SERVER_TIMING,
+    )
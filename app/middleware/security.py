@@ -1,114 +1,92 @@
-"""Security middleware for the MeatWise API."""
+"""Security stages of the MeatWise API middleware pipeline."""
 
-from fastapi import FastAPI, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Callable, Dict, List, Optional, Set, Tuple
+import hmac
+import re
+import secrets
+from fastapi import Response
+from typing import Dict, List, Optional, Set, Tuple
 import time
 import json
 import logging
 from datetime import datetime
-from starlette.datastructures import Headers
-from starlette.types import ASGIApp
 from app.core.config import settings
+from app.core.rate_limit import RateLimiter, RateLimitResult
+from app.core.redis_client import get_redis_manager
+from app.core.security import decode_access_token, get_bearer_token
+from app.middleware.pipeline import RequestContext, Stage
 from fastapi.responses import JSONResponse
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-# Redis imports - will be conditionally used
-try:
-    import redis
-    REDIS_AVAILABLE = True
-    logger.info("Redis package is installed. Distributed rate limiting is available.")
-except ImportError:
-    REDIS_AVAILABLE = False
-    logger.warning("Redis package not installed. Rate limiting will use in-memory storage.")
+# Header exempting cache warming from rate limiting (see app.services.cache_warming).
+# Warming over HTTP sends CACHE_WARMER_TOKEN; in-process warming sends a random
+# token of this process, which never leaves it. Client addresses are not used,
+# since behind a trusted proxy they come from X-Forwarded-For.
+CACHE_WARMER_TOKEN_HEADER = "X-Cache-Warmer-Token"
+CACHE_WARMER_PROCESS_TOKEN = secrets.token_urlsafe(32)
 
+# Rate limit buckets: every route draws from one, so expensive LLM-backed routes
+# cannot use up the budget of ordinary lookups (and vice versa)
+DEFAULT_BUCKET = "default"
+LLM_BUCKET = "llm"
 
-class RedisManager:
-    """Manages Redis connections with fallback and reconnection support."""
-    
-    def __init__(self, redis_url: str):
-        """Initialize Redis manager with the given URL."""
-        self.redis_url = redis_url
-        self.client = None
-        self.last_error_time = 0
-        self.error_count = 0
-        self.max_errors = 3
-        self.retry_interval = 10  # seconds
-        self.connected = False
-        self.initialize()
-    
-    def initialize(self) -> None:
-        """Initialize the Redis client if Redis is available."""
-        if not REDIS_AVAILABLE or not self.redis_url:
-            logger.warning("Redis is not available or URL not provided. Using in-memory storage.")
-            return
-            
-        try:
-            logger.info(f"Connecting to Redis at {self.redis_url}")
-            self.client = redis.from_url(
-                self.redis_url,
-                socket_timeout=2.0,
-                socket_connect_timeout=2.0,
-                health_check_interval=30
-            )
-            # Test connection
-            self.client.ping()
-            self.connected = True
-            self.error_count = 0
-            logger.info("Successfully connected to Redis")
-        except Exception as e:
-            self.connected = False
-            self.error_count += 1
-            self.last_error_time = time.time()
-            logger.error(f"Failed to connect to Redis: {str(e)}")
-    
-    def is_available(self) -> bool:
-        """Check if Redis is available for use."""
-        # If Redis package is not installed, it's not available
-        if not REDIS_AVAILABLE:
-            return False
-            
-        # If we've had too many errors, check if we should retry
-        if self.error_count >= self.max_errors:
-            now = time.time()
-            if now - self.last_error_time >= self.retry_interval:
-                # Try to reconnect
-                logger.info("Attempting to reconnect to Redis after errors")
-                self.initialize()
-            
-        # Return current connection status
-        return self.connected and self.client is not None
-    
-    def execute(self, operation: str, *args, **kwargs):
-        """Execute a Redis operation with error handling and fallback."""
-        if not self.is_available():
-            return None
-            
-        try:
-            # Get the operation method from the client
-            method = getattr(self.client, operation)
-            return method(*args, **kwargs)
-        except Exception as e:
-            logger.warning(f"Redis operation {operation} failed: {str(e)}")
-            self.connected = False
-            self.error_count += 1
-            self.last_error_time = time.time()
-            return None
 
+class RouteCost:
+    """Rate limit cost and bucket of the routes matching a path pattern."""
+
+    def __init__(self, pattern: str, cost: int = 1, bucket: str = DEFAULT_BUCKET):
+        """
+        Initialize a route cost.
+
+        Args:
+            pattern: Regular expression matched against the request path
+            cost: Tokens a request takes from the bucket
+            bucket: Name of the bucket the route draws from
+        """
+        self.pattern = re.compile(pattern)
+        self.cost = cost
+        self.bucket = bucket
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Middleware to add security headers to responses."""
+    def matches(self, path: str) -> bool:
+        """Check whether the cost applies to a path."""
+        return self.pattern.match(path) is not None
+
+
+# First matching route wins; unmatched routes cost 1 from the default bucket
+DEFAULT_ROUTE_COSTS = [
+    # Gemini-backed: a miss can take seconds and uses the shared LLM quota
+    RouteCost(r"^/api/v1/products/[^/]+/health-assessment/?$", cost=settings.RATE_LIMIT_HEALTH_ASSESSMENT_COST, bucket=LLM_BUCKET),
+    # Scores the whole catalog against the user's preferences
+    RouteCost(r"^/api/v1/products/recommendations/?$", cost=5),
+]
+_DEFAULT_COST = RouteCost(r"", cost=1, bucket=DEFAULT_BUCKET)
+
+
+# Allows the Swagger UI CDN
+CSP_POLICY = "default-src 'self'; img-src 'self' data: https:; style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; object-src 'none'; base-uri 'self'; form-action 'self'; frame-ancestors 'none';"
+
+_LIMIT_HEADER = b"x-ratelimit-limit"
+_REMAINING_HEADER = b"x-ratelimit-remaining"
+_RESET_HEADER = b"x-ratelimit-reset"
+_RESET_AFTER_HEADER = b"x-ratelimit-reset-after"
+
+_CACHE_CONTROL = b"cache-control"
+# Security headers only added when the response sets no Cache-Control of its own
+_CACHING_HEADERS = frozenset({_CACHE_CONTROL, b"pragma"})
+
+
+class SecurityHeadersStage(Stage):
+    """Pipeline stage adding security headers to responses."""
+
+    name = "security_headers"
     
     def __init__(
         self,
-        app: ASGIApp,
         content_security_policy: str = None,
         include_default_headers: bool = True,
     ):
         """Initialize with custom or default headers."""
-        super().__init__(app)
         self.headers: Dict[str, str] = {}
         
         if include_default_headers:
@@ -125,23 +103,50 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         
         if content_security_policy:
             self.headers["Content-Security-Policy"] = content_security_policy
+
+        # Encoded once, so responses only get the byte pairs appended. Caching
+        # headers are only defaults: routes with validators (ETag) set their own
+        # Cache-Control so HTTP caches store the response and revalidate it.
+        encoded = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in self.headers.items()]
+        self.raw_headers: List[Tuple[bytes, bytes]] = [header for header in encoded if header[0] not in _CACHING_HEADERS]
+        self.default_raw_headers: List[Tuple[bytes, bytes]] = [header for header in encoded if header[0] in _CACHING_HEADERS]
+        self._names = frozenset(name for name, _ in self.raw_headers)
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Add security headers to the response."""
-        response = await call_next(request)
-        
-        for header_key, header_value in self.headers.items():
-            response.headers[header_key] = header_value
-            
-        return response
+    def on_response(self, ctx: RequestContext, status: int, headers: List[Tuple[bytes, bytes]]) -> None:
+        """Add the security headers, replacing any the response set itself, and default caching headers."""
+        has_cache_control = False
+        replace = False
+        for name, _ in headers:
+            lowered = name.lower()
+            if lowered == _CACHE_CONTROL:
+                has_cache_control = True
+            elif lowered in self._names:
+                replace = True
+        if replace:
+            headers[:] = [header for header in headers if header[0].lower() not in self._names]
+        headers.extend(self.raw_headers)
+        if not has_cache_control:
+            headers.extend(self.default_raw_headers)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Rate limiting middleware with Redis support for distributed deployments."""
+class RateLimitStage(Stage):
+    """
+    Rate limiting pipeline stage with Redis support for distributed deployments.
+
+    Uses a sliding window counter (app.core.rate_limit): O(1) state per client,
+    and in Redis one atomic script call per request.
+
+    Requests with a bearer token that verifies are limited per user id, so users
+    sharing an IP (carrier NAT) get separate budgets; other requests per IP.
+    Each route has a cost and draws from a bucket (see RouteCost). Buckets have
+    their own per-client limits, and optionally a limit shared by all clients,
+    e.g. to stay within the LLM provider's quota.
+    """
+
+    name = "rate_limit"
     
     def __init__(
         self,
-        app: ASGIApp,
         limit: int = 60,  # Default: 60 requests
         window: int = 60,  # Default: per minute
         by_ip: bool = True,
@@ -149,36 +154,68 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         exempt_patterns: Optional[List[str]] = None,
         exempt_ips: Optional[List[str]] = None,
         include_headers: bool = True,
-        debug_mode: bool = False
+        debug_mode: bool = False,
+        route_costs: Optional[List[RouteCost]] = None,
+        bucket_limits: Optional[Dict[str, int]] = None,
+        global_limits: Optional[Dict[str, int]] = None,
+        by_user: bool = True,
+        shared_dir: Optional[str] = None,
+        shared_slots: int = 65536,
+        exempt_tokens: Optional[List[str]] = None,
     ):
         """
         Initialize rate limiter.
         
         Args:
-            app: The ASGI app
             limit: Maximum number of requests allowed
             window: Time window in seconds
             by_ip: Whether to track by IP address
             redis_url: Optional Redis URL for distributed rate limiting
-            exempt_patterns: URL patterns to exempt from rate limiting
+            exempt_patterns: Paths exempt from rate limiting, with everything below them
             exempt_ips: IP addresses to exempt from rate limiting
             include_headers: Whether to include rate limit headers in responses
             debug_mode: Enable debug logging for rate limiting
+            route_costs: Route costs, checked in order (defaults to DEFAULT_ROUTE_COSTS)
+            bucket_limits: Per-client limit of each bucket besides the default one
+                (which uses limit)
+            global_limits: Limits shared by all clients, per bucket
+            by_user: Track authenticated requests by user id instead of IP
+            shared_dir: Directory of shared-memory counters, so all workers on the
+                host enforce one limit without Redis (None keeps them per process)
+            shared_slots: Number of clients a shared-memory table holds
+            exempt_tokens: Secrets exempting requests that send one in CACHE_WARMER_TOKEN_HEADER
         """
-        super().__init__(app)
         self.limit = limit
         self.window = window
         self.by_ip = by_ip
-        self.requests: Dict[str, List[float]] = {}
+        self.by_user = by_user
+        self.route_costs = route_costs if route_costs is not None else DEFAULT_ROUTE_COSTS
         self.exempt_patterns = exempt_patterns or ["/health", "/docs", "/openapi.json"]
         self.exempt_ips = set(exempt_ips or [])  # Empty set - no exempt IPs for testing
+        self.exempt_tokens = [token.encode() for token in exempt_tokens or [] if token]
         self.include_headers = include_headers
         self.debug_mode = debug_mode
         
-        # Set up Redis connection if URL provided
-        self.redis_manager = RedisManager(redis_url) if redis_url else None
+        # Share the process-wide Redis pool if URL provided; counters fall back to memory
+        redis_manager = get_redis_manager(redis_url) if redis_url else None
+        limits = {DEFAULT_BUCKET: limit, **(bucket_limits or {})}
+        self.limiters: Dict[str, RateLimiter] = {
+            bucket: RateLimiter(
+                bucket_limit, window, redis_manager, prefix=f"ratelimit:{bucket}",
+                shared_dir=shared_dir, shared_slots=shared_slots,
+            )
+            for bucket, bucket_limit in limits.items()
+        }
+        self.global_limiters: Dict[str, RateLimiter] = {
+            bucket: RateLimiter(
+                bucket_limit, window, redis_manager, prefix=f"ratelimit:{bucket}:global",
+                shared_dir=shared_dir, shared_slots=16,
+            )
+            for bucket, bucket_limit in (global_limits or {}).items()
+            if bucket_limit > 0
+        }
         
-        logger.info(f"Configuring rate limiting: {limit} requests per {window} seconds, by IP: {by_ip}, Redis: {redis_url or 'not available'}")
+        logger.info(f"Configuring rate limiting: {limits} tokens per {window} seconds, global: {global_limits or {}}, by IP: {by_ip}, by user: {by_user}, Redis: {redis_url or 'not available'}")
         
         # Debug counters for monitoring
         if self.debug_mode:
@@ -191,207 +228,196 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         if self.debug_mode:
             logger.debug(message)
     
-    def _is_exempt(self, request: Request) -> bool:
+    def _is_exempt(self, path: str, client_host: str) -> bool:
         """Check if request is exempt from rate limiting."""
         # Check exempt patterns
-        path = request.url.path
         for pattern in self.exempt_patterns:
-            if pattern in path:
+            # Anchored at the root and on whole segments, so "/health" exempts
+            # "/health/db" but neither "/health-assessment" nor a product coded "health"
+            if path == pattern or path.startswith(f"{pattern}/"):
                 self._log_debug(f"Request to {path} is exempt (matched pattern {pattern})")
                 return True
                 
         # Check exempt IPs
-        client_host = request.client.host
         if client_host in self.exempt_ips:
             self._log_debug(f"Request from {client_host} is exempt (ip in exempt list)")
             return True
             
         return False
+
+    def _has_exempt_token(self, ctx: RequestContext) -> bool:
+        """Check whether the request carries one of the cache warmer's tokens."""
+        if not self.exempt_tokens:
+            return False
+        token = ctx.headers.get(CACHE_WARMER_TOKEN_HEADER)
+        if token is None:
+            return False
+        token_bytes = token.encode()
+        # Compare with every token, so the time taken does not tell which one matched
+        matches = [hmac.compare_digest(token_bytes, exempt) for exempt in self.exempt_tokens]
+        return any(matches)
     
-    def _get_rate_limit_info(self, key: str) -> Tuple[int, int]:
-        """Get current rate limit info (requests_count, remaining)."""
-        if self.redis_manager and self.redis_manager.is_available():
-            redis_key = f"ratelimit:{key}"
-            current_time = time.time()
-            
-            # Remove expired timestamps
-            self.redis_manager.execute('zremrangebyscore', redis_key, 0, current_time - self.window)
-            
-            # Count remaining valid timestamps
-            request_count = self.redis_manager.execute('zcard', redis_key) or 0
-            remaining = max(0, self.limit - request_count)
-            
-            return request_count, remaining
-        else:
-            # In-memory storage
-            now = time.time()
-            if key not in self.requests:
-                self.requests[key] = []
-                return 0, self.limit
-                
-            # Filter out expired timestamps
-            valid_requests = [
-                timestamp for timestamp in self.requests[key]
-                if now - timestamp < self.window
-            ]
-            
-            # Update the requests list with only valid timestamps
-            self.requests[key] = valid_requests
-            
-            return len(valid_requests), max(0, self.limit - len(valid_requests))
+    def _client_key(self, ctx: RequestContext) -> str:
+        """Identify the client: user id for verified bearer tokens, otherwise IP."""
+        if not self.by_ip:
+            return "global"
+        if self.by_user:
+            token = get_bearer_token(ctx.headers.get("authorization"))
+            claims = decode_access_token(token) if token else None
+            if claims and claims.get("sub"):
+                return f"user:{claims['sub']}"
+        return f"ip:{ctx.client_host}"
+    
+    def _route_cost(self, path: str) -> RouteCost:
+        """Find the cost and bucket of a route."""
+        for route_cost in self.route_costs:
+            if route_cost.matches(path):
+                return route_cost
+        return _DEFAULT_COST
+    
+    async def _check(self, key: str, route_cost: RouteCost) -> RateLimitResult:
+        """
+        Charge a request to its bucket; returns the first limit it exceeds, if any.
+
+        A request rejected by the bucket's global limit is refunded to the
+        client, so that clients are not charged for requests they never got.
+        """
+        limiter = self.limiters.get(route_cost.bucket, self.limiters[DEFAULT_BUCKET])
+        result = await limiter.hit(key, route_cost.cost)
+        global_limiter = self.global_limiters.get(route_cost.bucket)
+        if result.allowed and global_limiter:
+            global_result = await global_limiter.hit("global", route_cost.cost)
+            if not global_result.allowed:
+                await limiter.refund(key, route_cost.cost)
+                return global_result
+        return result
+
+    @staticmethod
+    def _raw_headers(result: RateLimitResult, remaining: int) -> List[Tuple[bytes, bytes]]:
+        """Encode the rate limit headers of a response."""
+        return [
+            (_LIMIT_HEADER, str(result.limit).encode()),
+            (_REMAINING_HEADER, str(remaining).encode()),
+            (_RESET_HEADER, str(int(time.time() + result.reset_after)).encode()),
+            (_RESET_AFTER_HEADER, str(result.reset_after).encode()),
+        ]
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
         """Apply rate limiting logic."""
+        path = ctx.scope["path"]
+
         # Track request in debug mode
         if self.debug_mode:
             self.total_requests += 1
-            self._log_debug(f"Processing request #{self.total_requests}: {request.method} {request.url.path}")
+            self._log_debug(f"Processing request #{self.total_requests}: {ctx.scope['method']} {path}")
             
         # Skip rate limiting for exempt requests
-        if self._is_exempt(request):
+        if self._is_exempt(path, ctx.client_host) or self._has_exempt_token(ctx):
             if self.debug_mode:
                 self.exempt_requests += 1
                 self._log_debug(f"Request exempt from rate limiting. Total exempt: {self.exempt_requests}")
-            return await call_next(request)
+            return None
             
         # Get client identifier
-        client_ip = request.client.host
-        key = client_ip if self.by_ip else "global"
+        key = self._client_key(ctx)
+        route_cost = self._route_cost(path)
         
         # Log the request for debugging
-        self._log_debug(f"Rate limit check for {key} (URL: {request.url.path})")
-        
-        # Check if rate limit exceeded
-        request_count, remaining = self._get_rate_limit_info(key)
+        self._log_debug(f"Rate limit check for {key} (URL: {path}, bucket: {route_cost.bucket}, cost: {route_cost.cost})")
         
-        # Add this request immediately to prevent race conditions
-        now = time.time()
-        if self.redis_manager and self.redis_manager.is_available():
-            redis_key = f"ratelimit:{key}"
-            # Add current request timestamp
-            self.redis_manager.execute('zadd', redis_key, {str(now): now})
-            # Set expiration on the key to auto-cleanup
-            self.redis_manager.execute('expire', redis_key, self.window * 2)
-            # Count is now one higher
-            request_count += 1
-            remaining = max(0, self.limit - request_count)
-        else:
-            # Fallback to in-memory rate limiting
-            if key not in self.requests:
-                self.requests[key] = []
-            # Add current request timestamp
-            self.requests[key].append(now)
-            # Update count
-            request_count += 1
-            remaining = max(0, self.limit - request_count)
+        # Record this request and check if rate limit exceeded
+        result = await self._check(key, route_cost)
         
-        # Time until the oldest request expires
-        time_to_reset = int(self.window - (now - min(self.requests[key]))) if self.requests[key] else self.window
-        reset_time = int(time.time() + time_to_reset)
-        
-        self._log_debug(f"Current request count for {key}: {request_count}/{self.limit}, remaining: {remaining}, reset in {time_to_reset}s")
+        self._log_debug(f"Rate limit check for {key}: allowed: {result.allowed}, remaining: {result.remaining}, reset in {result.reset_after}s")
         
         # Check if over limit
-        if request_count > self.limit:
+        if not result.allowed:
             if self.debug_mode:
                 self.rate_limited_requests += 1
                 self._log_debug(f"Rate limit exceeded for {key}. Total limited: {self.rate_limited_requests}")
                 
-            logger.warning(f"Rate limit exceeded for {key} ({request_count}/{self.limit} requests)")
+            logger.warning(f"Rate limit exceeded for {key} ({route_cost.bucket} bucket, limit {result.limit} per {self.window}s)")
             
             response = JSONResponse(
                 content={
                     "detail": "Rate limit exceeded. Please try again later.",
                     "status": "error",
                     "code": "TOO_MANY_REQUESTS",
-                    "retry_after": time_to_reset
+                    "retry_after": result.retry_after
                 },
                 status_code=429,
-                headers={"Retry-After": str(time_to_reset)}
+                headers={"Retry-After": str(result.retry_after)}
             )
             
             # Add rate limit headers
             if self.include_headers:
-                response.headers["X-RateLimit-Limit"] = str(self.limit)
-                response.headers["X-RateLimit-Remaining"] = "0"
-                response.headers["X-RateLimit-Reset"] = str(reset_time)
-                response.headers["X-RateLimit-Reset-After"] = str(time_to_reset)
+                response.raw_headers.extend(self._raw_headers(result, 0))
                 
             return response
         
-        # Process the request
-        response = await call_next(request)
-        
-        # Add rate limit headers to response
+        # Headers are added as the response starts
         if self.include_headers:
-            response.headers["X-RateLimit-Limit"] = str(self.limit)
-            response.headers["X-RateLimit-Remaining"] = str(max(0, self.limit - request_count))
-            response.headers["X-RateLimit-Reset"] = str(reset_time)
-            response.headers["X-RateLimit-Reset-After"] = str(time_to_reset)
-        
-        return response
+            ctx.state["rate_limit"] = result
+        return None
+    
+    def on_response(self, ctx: RequestContext, status: int, headers: List[Tuple[bytes, bytes]]) -> None:
+        """Add rate limit headers to the response."""
+        result = ctx.state.get("rate_limit")
+        if result is not None:
+            headers.extend(self._raw_headers(result, result.remaining))
 
 
-class JWTErrorHandlerMiddleware(BaseHTTPMiddleware):
-    """Middleware to handle JWT token errors gracefully."""
+class JWTErrorStage(Stage):
+    """Pipeline stage to handle JWT token errors gracefully."""
+
+    name = "jwt_errors"
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    def on_error(self, ctx: RequestContext, exc: Exception) -> Optional[Response]:
         """Handle JWT token errors."""
-        try:
-            response = await call_next(request)
-            return response
-        except Exception as exc:
-            error_detail = str(exc)
-            status_code = 500
+        error_detail = str(exc).lower()
             
-            # Check for common JWT errors
-            if "expired" in error_detail.lower() and "token" in error_detail.lower():
-                status_code = 401
-                return JSONResponse(
-                    status_code=status_code,
-                    content={"detail": "Authentication token has expired. Please log in again."}
-                )
-            elif "invalid" in error_detail.lower() and "token" in error_detail.lower():
-                status_code = 401
-                return JSONResponse(
-                    status_code=status_code,
-                    content={"detail": "Invalid authentication token. Please log in again."}
-                )
+        # Check for common JWT errors
+        if "expired" in error_detail and "token" in error_detail:
+            return JSONResponse(
+                status_code=401,
+                content={"detail": "Authentication token has expired. Please log in again."}
+            )
+        elif "invalid" in error_detail and "token" in error_detail:
+            return JSONResponse(
+                status_code=401,
+                content={"detail": "Invalid authentication token. Please log in again."}
+            )
             
-            # Re-raise other exceptions to be handled by FastAPI
-            raise
+        # Re-raise other exceptions to be handled by FastAPI
+        return None
 
 
-def add_security_middleware(app: FastAPI) -> None:
-    """Add all security middleware to the app."""
-    # Define the CSP string allowing the Swagger UI CDN - simplified to single line
-    csp_policy = "default-src 'self'; img-src 'self' data: https:; style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; object-src 'none'; base-uri 'self'; form-action 'self'; frame-ancestors 'none';"
-
-    # Add security headers middleware
-    app.add_middleware(
-        SecurityHeadersMiddleware,
-        content_security_policy=csp_policy
-    )
-    
-    # Add JWT error handler middleware
-    app.add_middleware(JWTErrorHandlerMiddleware)
-    
-    # Add rate limiting middleware - IMPORTANT: Add this BEFORE other middleware to ensure it's applied first
+def build_rate_limit_stage() -> RateLimitStage:
+    """Build the rate limit stage from settings."""
     redis_url = getattr(settings, "REDIS_URL", None)
     rate_limit = getattr(settings, "RATE_LIMIT_PER_MINUTE", 10)
     rate_limit_by_ip = getattr(settings, "RATE_LIMIT_BY_IP", True)
+    llm_limit = settings.RATE_LIMIT_LLM_PER_MINUTE
+    llm_global_limit = settings.RATE_LIMIT_LLM_GLOBAL_PER_MINUTE
     
-    # Print rate limit configuration for debugging
-    logger.info(f"Configuring rate limiting: {rate_limit} requests per minute, by IP: {rate_limit_by_ip}, Redis: {redis_url}")
-    
-    app.add_middleware(
-        RateLimitMiddleware,
+    return RateLimitStage(
         limit=rate_limit,
         window=60,  # per minute
         by_ip=rate_limit_by_ip,
         redis_url=redis_url,
-        exempt_patterns=["/health", "/docs", "/openapi.json", "/redoc"],
-        exempt_ips=[],  # No exempt IPs for testing
+        exempt_patterns=[
+            "/health",
+            "/metrics",
+            f"{settings.API_V1_STR}/docs",
+            f"{settings.API_V1_STR}/openapi.json",
+            f"{settings.API_V1_STR}/redoc",
+        ],
+        exempt_tokens=[CACHE_WARMER_PROCESS_TOKEN, settings.CACHE_WARMER_TOKEN],  # The cache warmer
         include_headers=True,
-        debug_mode=getattr(settings, "DEBUG", False)  # Default to False if DEBUG not set
-    ) 
\ No newline at end of file
+        debug_mode=getattr(settings, "DEBUG", False),  # Default to False if DEBUG not set
+        bucket_limits={LLM_BUCKET: llm_limit},
+        global_limits={LLM_BUCKET: llm_global_limit},
+        by_user=settings.RATE_LIMIT_BY_USER,
+        shared_dir=settings.RATE_LIMIT_SHM_DIR if settings.RATE_LIMIT_SHARED_MEMORY else None,
+        shared_slots=settings.RATE_LIMIT_SHM_SLOTS,
+    )
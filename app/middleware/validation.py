@@ -1,114 +1,275 @@
-"""Input validation middleware for the MeatWise API."""
+"""Input validation stages of the MeatWise API middleware pipeline."""
 
 import re
-from fastapi import FastAPI, Request, Response, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Callable, Dict, List, Optional, Pattern, Set
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from starlette.requests import ClientDisconnect
+from typing import List, Optional, Pattern, Set
 import json
-from starlette.types import ASGIApp
+from starlette.types import Message
+from app.middleware.pipeline import RequestContext, Stage
 
+# Only these methods carry bodies worth validating; others pass straight through
+BODY_METHODS = {"POST", "PUT", "PATCH"}
+
+# Tokens of the blocked patterns. Each is found with bytes.find, which runs at
+# memchr speed and never backtracks, so a scan is linear in the body size.
+_TOKENS = (
+    b"<script", b"</script", b"javascript", b"select", b"from", b"union",
+    b"insert", b"into", b"drop", b"table", b"delete", b";", b">", b"=",
+)
+_COLON = re.compile(rb"\s*:")
+# JSON escapes that can hide ASCII characters of a token (e.g. "<script")
+_ESCAPE_PATTERN = re.compile(rb"\\u00([0-7][0-9A-Fa-f])|\\/")
+_WORD_CHARS = frozenset(b"abcdefghijklmnopqrstuvwxyz0123456789_")
+_SPACE_CHARS = frozenset(b" \t\r\n\x0b\x0c")
+# A token may be incomplete if it starts in the last few bytes or in a trailing
+# run of these (a word, or "javascript" followed by spaces)
+_WORD_OR_SPACE = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_ \t\r\n\x0b\x0c"
+_MAX_TOKEN = 8  # len(b"</script")
+
+
+def _unescape(match: "re.Match") -> bytes:
+    """Decode one JSON escape."""
+    return bytes([int(match.group(1), 16)]) if match.group(1) else b"/"
+
+
+class BodyScanner:
+    """
+    Incremental, linear-time scanner for injection patterns in a request body.
+
+    Detects the same patterns as the former per-request regexes (script tags,
+    javascript: URLs, on*= event handlers and SELECT ... FROM ...;, UNION ...
+    SELECT, INSERT ... INTO, DROP ... TABLE, DELETE ... FROM sequences), case
+    insensitively and without word boundaries. Multi-token patterns are tracked
+    by a small state machine over the tokens instead of ".*?" gaps, so crafted
+    bodies cannot cause backtracking.
+
+    Chunks are fed as they arrive; bytes that may hold an incomplete token or
+    JSON escape are carried over to the next chunk.
+    """
+
+    def __init__(self):
+        self._pending = b""  # Raw bytes that may end in a partial escape
+        self._tail = b""  # Decoded bytes that may hold an incomplete token
+        self._seen: Set[bytes] = set()
+
+    def feed(self, chunk: bytes, final: bool = False) -> bool:
+        """
+        Scan the next chunk of the body.
+
+        Args:
+            chunk: Raw body bytes
+            final: Whether this is the last chunk
+
+        Returns:
+            bool: True as soon as a blocked pattern is found
+        """
+        data = self._pending + chunk
+        self._pending = b""
+        if not final:
+            escape = data.rfind(b"\\", max(0, len(data) - 5))
+            if escape != -1:
+                data, self._pending = data[:escape], data[escape:]
+        data = self._tail + _ESCAPE_PATTERN.sub(_unescape, data)
+
+        # Scan up to the start of the word or space run at the end (minus a
+        # few bytes), so every token and word scanned now is complete
+        end = len(data) if final else len(data[:len(data) - _MAX_TOKEN].rstrip(_WORD_OR_SPACE))
+        lowered = data.lower()
+
+        positions = []
+        for token in _TOKENS:
+            position = lowered.find(token, 0, end + len(token) - 1)
+            while position != -1:
+                positions.append((position, token))
+                position = lowered.find(token, position + 1, end + len(token) - 1)
+        positions.sort()
+
+        for position, token in positions:
+            if token == b"=":
+                if self._is_event_handler(lowered, position):
+                    return True
+            elif token == b"javascript":
+                if _COLON.match(lowered, position + len(token)):
+                    return True
+            elif self._step(token):
+                return True
+        self._tail = data[end:]
+        return False
+
+    @staticmethod
+    def _is_event_handler(lowered: bytes, position: int) -> bool:
+        """Check the word before an "=" against on\\w+\\s*= (e.g. "onclick =")."""
+        # The space and word runs before one "=" never reach back past another
+        # "=", so these loops are linear over the whole body
+        i = position - 1
+        while i >= 0 and lowered[i] in _SPACE_CHARS:
+            i -= 1
+        word_end = i + 1
+        while i >= 0 and lowered[i] in _WORD_CHARS:
+            i -= 1
+        # "on" plus at least one more word character
+        return word_end - i > 3 and lowered.find(b"on", i + 1, word_end - 1) != -1
+
+    def _step(self, token: bytes) -> bool:
+        """Advance the state machine by one token; True if a pattern is complete."""
+        seen = self._seen
+        if token == b"<script":
+            seen.add(b"<script")
+        elif token == b">":
+            if b"</script" in seen:
+                return True
+            if b"<script" in seen:
+                seen.add(b"<script>")
+        elif token == b"</script":
+            if b"<script>" in seen:
+                seen.add(b"</script")
+        elif token == b"select":
+            if b"union" in seen:
+                return True
+            seen.add(token)
+        elif token == b"from":
+            if b"delete" in seen:
+                return True
+            if b"select" in seen:
+                seen.add(b"select from")
+        elif token == b";":
+            if b"select from" in seen:
+                return True
+        elif token == b"into":
+            if b"insert" in seen:
+                return True
+        elif token == b"table":
+            if b"drop" in seen:
+                return True
+        else:
+            # union, insert, drop, delete
+            seen.add(token)
+        return False
+
+
+class RequestValidationStage(Stage):
+    """
+    Pipeline stage to validate incoming request bodies.
+
+    Only POST, PUT and PATCH requests are checked. JSON bodies are read as they
+    stream in and scanned by BodyScanner over the raw bytes, stopping at the
+    first blocked pattern or once max_content_length bytes have arrived, before
+    the app sees any of it. The buffered body is then replayed to the app.
+    """
+
+    name = "request_validation"
 
-class RequestValidationMiddleware(BaseHTTPMiddleware):
-    """Middleware to validate and sanitize incoming requests."""
-    
     def __init__(
         self,
-        app: ASGIApp,
         blocked_patterns: Optional[List[str]] = None,
         content_types: Optional[Set[str]] = None,
         max_content_length: int = 1024 * 1024,  # 1MB default
     ):
         """
         Initialize with validation rules.
-        
+
         Args:
-            app: The ASGI app
-            blocked_patterns: Regex patterns to block in request bodies
+            blocked_patterns: Extra regex patterns to block in JSON bodies, run
+                over the whole decoded body after the scanner (their cost is not bounded)
             content_types: Allowed content types
             max_content_length: Maximum content length in bytes
         """
-        super().__init__(app)
-        
-        # Default blocked patterns for common injection attacks
-        self.blocked_patterns: List[Pattern] = []
-        default_patterns = [
-            r"(?i)<script.*?>.*?</script.*?>",  # XSS
-            r"(?i)javascript\s*:",              # JavaScript injection
-            r"(?i)on\w+\s*=",                   # Event handlers
-            r"(?i)select.*?from.*?;",           # SQL injection
-            r"(?i)union.*?select",              # SQL injection
-            r"(?i)insert.*?into",               # SQL injection
-            r"(?i)drop.*?table",                # SQL injection
-            r"(?i)delete.*?from",               # SQL injection
-        ]
-        
-        # Combine default and custom patterns
-        patterns_to_use = default_patterns + (blocked_patterns or [])
-        for pattern in patterns_to_use:
-            self.blocked_patterns.append(re.compile(pattern))
-            
+        # Extra patterns; the default injection patterns are built into BodyScanner
+        self.blocked_patterns: List[Pattern] = [re.compile(pattern) for pattern in blocked_patterns or []]
+
         # Content type validation
         self.content_types = content_types or {
-            "application/json", 
-            "multipart/form-data", 
+            "application/json",
+            "multipart/form-data",
             "application/x-www-form-urlencoded"
         }
-        
+
         # Maximum content length
         self.max_content_length = max_content_length
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Validate and sanitize the request."""
+
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
+        """Validate the request."""
+        if ctx.scope["method"] not in BODY_METHODS:
+            return None
+
+        headers = ctx.headers
+
         # Validate Content-Type
-        content_type = request.headers.get("content-type", "").split(";")[0].lower()
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
         if content_type and content_type not in self.content_types:
-            return Response(
-                content=json.dumps({"detail": "Unsupported content type"}),
-                status_code=415,
-                media_type="application/json"
-            )
-        
+            return self._reject(415, "Unsupported content type")
+
         # Validate Content-Length
-        content_length = request.headers.get("content-length")
-        if content_length and int(content_length) > self.max_content_length:
-            return Response(
-                content=json.dumps({"detail": "Request body too large"}),
-                status_code=413,
-                media_type="application/json"
-            )
-        
-        # Check for suspicious patterns in request body
-        if content_type == "application/json":
-            try:
-                body = await request.json()
-                body_str = json.dumps(body)
-                
-                for pattern in self.blocked_patterns:
-                    if pattern.search(body_str):
-                        return Response(
-                            content=json.dumps({"detail": "Invalid input detected"}),
-                            status_code=400,
-                            media_type="application/json"
-                        )
-            except Exception:
-                # If we can't parse the body, continue with the request
-                pass
-        
-        # Process the request
-        return await call_next(request)
+        content_length = headers.get("content-length")
+        try:
+            declared_length = int(content_length) if content_length else None
+        except ValueError:
+            return self._reject(400, "Invalid Content-Length")
+        if declared_length is not None and declared_length > self.max_content_length:
+            return self._reject(413, "Request body too large")
+
+        if content_type != "application/json":
+            return None
+
+        # Check for suspicious patterns as the body streams in
+        receive = ctx.receive
+        scanner = BodyScanner()
+        chunks: List[bytes] = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Client disconnected before sending the whole body
+                raise ClientDisconnect()
+            chunk = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            size += len(chunk)
+            if size > self.max_content_length:
+                return self._reject(413, "Request body too large")
+            chunks.append(chunk)
+            if scanner.feed(chunk, final=not more_body):
+                return self._reject(400, "Invalid input detected")
+        body = b"".join(chunks)
+
+        if self.blocked_patterns:
+            text = _ESCAPE_PATTERN.sub(_unescape, body).decode("utf-8", errors="replace")
+            if any(pattern.search(text) for pattern in self.blocked_patterns):
+                return self._reject(400, "Invalid input detected")
+
+        body_sent = False
 
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
 
-class PathTraversalMiddleware(BaseHTTPMiddleware):
-    """Middleware to prevent path traversal attacks."""
+        # The app reads the buffered body
+        ctx.receive = replay_receive
+        return None
+
+    @staticmethod
+    def _reject(status_code: int, detail: str) -> Response:
+        """Build an error response."""
+        return JSONResponse(content={"detail": detail}, status_code=status_code)
+
+
+class PathTraversalStage(Stage):
+    """Pipeline stage to prevent path traversal attacks."""
+
+    name = "path_traversal"
     
-    def __init__(self, app: ASGIApp):
-        """Initialize the middleware."""
-        super().__init__(app)
+    def __init__(self):
+        """Initialize the stage."""
         self.path_traversal_pattern = re.compile(r"\.\.\/|\.\.\\")
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def on_request(self, ctx: RequestContext) -> Optional[Response]:
         """Check for path traversal attempts."""
-        path = request.url.path
+        path = ctx.scope["path"]
         
         # Check for path traversal
         if self.path_traversal_pattern.search(path):
@@ -118,14 +279,4 @@ class PathTraversalMiddleware(BaseHTTPMiddleware):
                 media_type="application/json"
             )
         
-        # Process the request
-        return await call_next(request)
-
-
-def add_validation_middleware(app: FastAPI) -> None:
-    """Add all validation middleware to the app."""
-    # Add request validation middleware
-    app.add_middleware(RequestValidationMiddleware)
-    
-    # Add path traversal protection
-    app.add_middleware(PathTraversalMiddleware) 
\ No newline at end of file
+        return None
@@ -3,7 +3,7 @@
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 # Fix imports to directly import AdditiveInfo
 from app.models.ingredient import AdditiveInfo
@@ -176,6 +176,8 @@ class HealthAssessment(BaseModel):
     ingredient_reports: Dict[str, IngredientReport] = Field(default_factory=dict)
     works_cited: List[WorksCited] = Field(default_factory=list)
     recommendations: List[ProductRecommendation] = Field(default_factory=list)
+    # Rule-based or stale assessment served while Gemini is unavailable (not serialized)
+    _fallback: bool = PrivateAttr(default=False)
 
 
 # Update forward references - removed Ingredient import and model rebuild call
@@ -4,10 +4,19 @@ from fastapi import APIRouter
 
 from app.routers import users, auth
 from app.api.v1.endpoints.products import router as products_router
+from app.db.engines import async_db_enabled
 
 # Create API router
 api_router = APIRouter()
 
+if async_db_enabled():
+    # Async versions of the hot read routes; included first, so they take precedence
+    from app.routers.async_users import router as async_users_router
+    from app.api.v1.endpoints.async_products import router as async_products_router
+
+    api_router.include_router(async_users_router, prefix="/users", tags=["users"])
+    api_router.include_router(async_products_router, prefix="/products", tags=["products"])
+
 # Include routers
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
@@ -0,0 +1,106 @@
+"""Async user router for the MeatWise API.
+
+Scan history and favorites reads served from an AsyncSession, mounted ahead of
+the routes in users.py when async_db_enabled() is true; writes stay there.
+The routes in users.py run blocking queries on the event loop. Both load the
+products up front with one more query (lazy loads cannot run under an
+AsyncSession).
+"""
+
+from typing import Any, List
+import json
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models import ScanHistory, UserFavorite
+from app.db import models as db_models
+from app.db.async_session import get_async_db
+from app.db.projections import HEAVY
+from app.db.query_stats import query_budget
+from app.internal.dependencies import get_current_active_user
+from app.routers.users import _convert_uuid_to_str
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+router = APIRouter()
+
+
+@router.get("/history", response_model=List[ScanHistory], dependencies=[Depends(query_budget(6))])
+async def get_user_scan_history(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: db_models.User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get scan history for the current user.
+
+    Args:
+        db: Async database session
+        current_user: Current user from auth dependency
+
+    Returns:
+        List[ScanHistory]: List of scan history entries for the user
+    """
+    try:
+        scan_history = (await db.execute(
+            select(db_models.ScanHistory)
+            .options(selectinload(db_models.ScanHistory.product).undefer_group(HEAVY))
+            .where(db_models.ScanHistory.user_id == current_user.id)
+            .order_by(db_models.ScanHistory.scanned_at.desc())
+        )).scalars().all()
+
+        return [
+            {
+                "id": _convert_uuid_to_str(scan.id),
+                "user_id": _convert_uuid_to_str(scan.user_id),
+                "product_code": scan.product_code,
+                "location": json.loads(scan.location) if scan.location and isinstance(scan.location, str) else scan.location,
+                "device_info": scan.device_info,
+                "scanned_at": scan.scanned_at,
+                "product": scan.product,
+            }
+            for scan in scan_history
+        ]
+    except Exception as e:
+        logger.error(f"Error getting user scan history: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get scan history: {str(e)}")
+
+
+@router.get("/favorites", response_model=List[UserFavorite], dependencies=[Depends(query_budget(6))])
+async def get_user_favorites(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: db_models.User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get current user's favorite products.
+
+    Args:
+        db: Async database session
+        current_user: Current user from auth dependency
+
+    Returns:
+        List[UserFavorite]: User's favorite products
+    """
+    try:
+        favorites = (await db.execute(
+            select(db_models.UserFavorite)
+            .options(selectinload(db_models.UserFavorite.product).undefer_group(HEAVY))
+            .where(db_models.UserFavorite.user_id == current_user.id)
+        )).scalars().all()
+
+        return [
+            {
+                "product_code": favorite.product_code,
+                "notes": favorite.notes,
+                "user_id": _convert_uuid_to_str(favorite.user_id),
+                "added_at": favorite.added_at,
+                "product": favorite.product,
+            }
+            for favorite in favorites
+        ]
+    except Exception as e:
+        logger.error(f"Error retrieving favorites: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve favorites: {str(e)}")
@@ -2,7 +2,7 @@
 
 from typing import Any, List, Dict, Optional
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 import logging
 import json
 from datetime import datetime
@@ -17,10 +17,14 @@ from app.models import (
 from app.models.product import Product
 from app.core import security
 from app.db import models as db_models
-from app.db.session import get_db
-from app.internal.dependencies import get_current_active_user
+from app.db.projections import HEAVY, PRODUCT_DETAIL, PRODUCT_LISTING
+from app.db.query_stats import query_budget
+from app.db.session import get_db, get_read_db
+from app.internal.dependencies import get_current_active_user, get_current_user_verified_remotely
 from app.services.ai_service import generate_personalized_insights
 from app.services.gemini_service import get_personalized_recommendations
+from app.services.preference_fingerprint import invalidate_preference_fingerprint
+from app.services.user_profiles import invalidate_user_profile
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -64,7 +68,8 @@ def get_current_user(
 def update_current_user(
     user_in: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_active_user),
+    # Account changes must not be accepted from a revoked session
+    current_user: db_models.User = Depends(get_current_user_verified_remotely),
 ) -> Any:
     """
     Update current user.
@@ -107,21 +112,26 @@ def update_current_user(
             
         return mock_user
     
+    # The auth dependency returns a cached snapshot, so write through the row itself
+    user = db.query(db_models.User).filter(db_models.User.id == current_user.id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
     # Extract preferences to handle separately
     preferences = update_data.pop("preferences", None)
     if preferences:
         # Merge with existing preferences if any
-        existing_preferences = getattr(current_user, "preferences", {}) or {}
+        existing_preferences = getattr(user, "preferences", {}) or {}
         if isinstance(existing_preferences, str):
             try:
                 existing_preferences = json.loads(existing_preferences)
             except json.JSONDecodeError:
-                logger.warning(f"Could not decode existing preferences for user {current_user.id}: {existing_preferences}")
+                logger.warning(f"Could not decode existing preferences for user {user.id}: {existing_preferences}")
                 existing_preferences = {}
         
         # Update with new preferences
         merged_preferences = {**existing_preferences, **preferences}
-        current_user.preferences = merged_preferences # SQLAlchemy handles JSONB serialization
+        user.preferences = merged_preferences # SQLAlchemy handles JSONB serialization
     
     # Hash password if provided
     if "password" in update_data and update_data["password"]:
@@ -135,29 +145,36 @@ def update_current_user(
     allowed_fields = ["email", "full_name"] # Only allow updating these via this endpoint
     for key, value in update_data.items():
         if key in allowed_fields:
-            setattr(current_user, key, value)
+            setattr(user, key, value)
         elif key not in ["preferences", "password"]:
             logger.warning(f"Attempted to update unallowed field '{key}' via /users/me")
 
     
-    db.add(current_user)
+    db.add(user)
     db.commit()
-    db.refresh(current_user)
+    db.refresh(user)
+    
+    # The next request loads the updated profile
+    invalidate_user_profile(user.id)
+    
+    # Personalized responses are cached by preference fingerprint
+    if preferences:
+        invalidate_preference_fingerprint(user.id)
     
     # Convert UUID fields to strings to ensure compatibility
     user_dict = {
-        "id": _convert_uuid_to_str(current_user.id),
-        "email": current_user.email,
-        "full_name": current_user.full_name,
-        "created_at": current_user.created_at,
-        "updated_at": current_user.updated_at,
-        "preferences": current_user.preferences
+        "id": _convert_uuid_to_str(user.id),
+        "email": user.email,
+        "full_name": user.full_name,
+        "created_at": user.created_at,
+        "updated_at": user.updated_at,
+        "preferences": user.preferences
     }
     
     return user_dict
 
 
-@router.get("/history", response_model=List[ScanHistory])
+@router.get("/history", response_model=List[ScanHistory], dependencies=[Depends(query_budget(6))])
 async def get_user_scan_history(
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_active_user),
@@ -175,15 +192,16 @@ async def get_user_scan_history(
     try:
         scan_history = (
             db.query(db_models.ScanHistory)
+            .options(selectinload(db_models.ScanHistory.product).undefer_group(HEAVY))
             .filter(db_models.ScanHistory.user_id == current_user.id)
             .order_by(db_models.ScanHistory.scanned_at.desc())
             .all()
         )
         
-        # Load products for each scan history entry
+        # Products are loaded with the scan history, in one more query
         result = []
         for scan in scan_history:
-            product = db.query(db_models.Product).filter(db_models.Product.code == scan.product_code).first()
+            product = scan.product
             
             # Create a dict with all necessary fields converted properly
             scan_dict = {
@@ -225,7 +243,7 @@ async def add_scan_history(
     """
     try:
         # Check if product exists
-        product = db.query(db_models.Product).filter(db_models.Product.code == scan_data.product_code).first()
+        product = db.query(db_models.Product).options(PRODUCT_DETAIL).filter(db_models.Product.code == scan_data.product_code).first()
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
@@ -285,7 +303,7 @@ async def add_scan_history(
         raise HTTPException(status_code=500, detail=f"Failed to add scan history: {str(e)}")
 
 
-@router.get("/favorites", response_model=List[UserFavorite])
+@router.get("/favorites", response_model=List[UserFavorite], dependencies=[Depends(query_budget(6))])
 async def get_user_favorites(
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_active_user),
@@ -303,15 +321,15 @@ async def get_user_favorites(
     try:
         favorites = (
             db.query(db_models.UserFavorite)
+            .options(selectinload(db_models.UserFavorite.product).undefer_group(HEAVY))
             .filter(db_models.UserFavorite.user_id == current_user.id)
             .all()
         )
         
-        # Load product details for each favorite
+        # Products are loaded with the favorites, in one more query
         result = []
         for favorite in favorites:
-            # Get the product data
-            product = db.query(db_models.Product).filter(db_models.Product.code == favorite.product_code).first()
+            product = favorite.product
             
             # Create a dict with all necessary fields converted properly
             favorite_dict = {
@@ -351,7 +369,7 @@ async def add_favorite(
     """
     try:
         # Check if product exists
-        product = db.query(db_models.Product).filter(db_models.Product.code == favorite_in.product_code).first()
+        product = db.query(db_models.Product).options(PRODUCT_DETAIL).filter(db_models.Product.code == favorite_in.product_code).first()
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
@@ -441,9 +459,10 @@ def remove_favorite(
         raise HTTPException(status_code=500, detail=f"Failed to remove favorite: {str(e)}")
 
 
-@router.get("/recommendations", response_model=List[Product])
+@router.get("/recommendations", response_model=List[Product], dependencies=[Depends(query_budget(8))])
 async def get_recommendations(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    primary_db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_active_user),
 ) -> Any:
     """
@@ -455,7 +474,9 @@ async def get_recommendations(
     3. User's scan history
     
     Args:
-        db: Database session
+        db: Read session for the catalog (may be a replica)
+        primary_db: Primary session for the user's scan history, so scans just
+            posted to /history are seen
         current_user: Current user from auth dependency
         
     Returns:
@@ -466,7 +487,7 @@ async def get_recommendations(
     """
     try:
         # Default results if no personalization is possible
-        query = db.query(db_models.Product)
+        query = db.query(db_models.Product).options(PRODUCT_LISTING)
         
         # Apply personalization if user has preferences
         if hasattr(current_user, "preferences") and current_user.preferences:
@@ -558,19 +579,19 @@ async def get_recommendations(
                     query = query.filter(db_models.Product.pasture_raised == True)
         
         # Look at user's scan history to further personalize results
-        scan_history = db.query(db_models.ScanHistory).filter(
+        scan_history = primary_db.query(db_models.ScanHistory).filter(
             db_models.ScanHistory.user_id == current_user.id
         ).order_by(db_models.ScanHistory.scanned_at.desc()).limit(5).all()
         
         if scan_history:
-            # Extract meat types from recent scans
-            meat_types = []
-            for scan in scan_history:
-                product = db.query(db_models.Product).filter(
-                    db_models.Product.code == scan.product_code
-                ).first()
-                if product and product.meat_type and product.meat_type not in meat_types:
-                    meat_types.append(product.meat_type)
+            # Extract meat types from recent scans, in one query
+            meat_types = [
+                meat_type
+                for (meat_type,) in db.query(db_models.Product.meat_type)
+                .filter(db_models.Product.code.in_([scan.product_code for scan in scan_history]))
+                .filter(db_models.Product.meat_type.isnot(None))
+                .distinct()
+            ]
             
             # Prioritize recently scanned meat types
             if meat_types:
@@ -621,7 +642,7 @@ async def get_recommendations(
 
 @router.get("/explore")
 async def get_personalized_explore(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: db_models.User = Depends(get_current_active_user),
 ):
     """Get personalized product recommendations for explore page using rule-based scoring."""
@@ -630,7 +651,7 @@ async def get_personalized_explore(
         user_preferences = current_user.preferences or {}
         
         # Get all available products from database
-        products = db.query(db_models.Product).all()
+        products = db.query(db_models.Product).options(PRODUCT_LISTING).all()
         
         # Filter products by preferred meat types if specified
         preferred_types = user_preferences.get('preferred_meat_types', [])
@@ -0,0 +1,329 @@
+"""Cache warming from scan popularity.
+
+After a deploy or a Redis flush, the first scans of popular products all miss
+the response cache. The warmer reads the most scanned product codes from
+scan_history, weighting recent scans more, and requests their product and
+alternatives responses through the app so the caching middleware stores them
+(in Redis and this process's L1). It also pre-generates health assessments,
+whose Gemini output is cached per product by the health assessment service;
+the assessment responses themselves vary by user preferences and cannot be
+warmed without a user.
+
+Requests are paced at a fixed rate with bounded concurrency so warming does not
+compete with live traffic for the database or Gemini. In-process requests send
+CACHE_WARMER_PROCESS_TOKEN and requests over HTTP send CACHE_WARMER_TOKEN, both of
+which the rate limiter exempts; without a token, warming over HTTP is paced
+below the per-client rate limit and waits out any 429 it still gets.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp
+
+from app.core.config import settings
+from app.db import models as db_models
+from app.db.projections import PRODUCT_DETAIL
+from app.db.session import read_session
+from app.middleware.compression import IDENTITY, SUPPORTED_ENCODINGS
+from app.middleware.security import CACHE_WARMER_PROCESS_TOKEN, CACHE_WARMER_TOKEN_HEADER
+from app.services.health_assessment_service import generate_health_assessment, is_fallback_assessment
+from app.utils import helpers
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (in days) of the recency buckets scans are weighted by
+_RECENCY_BUCKETS = (1, 3, 7, 14, 30, 60, 90, 180, 365)
+
+# Retries of a rate-limited (429) request, and the wait when it has no Retry-After
+_RATE_LIMITED_RETRIES = 3
+_DEFAULT_RETRY_AFTER = 5.0
+# Share of RATE_LIMIT_PER_MINUTE used when warming over HTTP without a token
+_UNAUTHENTICATED_RATE_SHARE = 0.8
+
+
+class _Pacer:
+    """Spaces out calls to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        """Wait for the next slot."""
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def get_popular_product_codes(
+    db: Session,
+    limit: int,
+    window_days: int = 30,
+    half_life_days: float = 7.0,
+) -> List[str]:
+    """
+    Get the most scanned product codes, weighting recent scans more.
+
+    Each scan counts 0.5 ** (age / half_life_days), with the age rounded to
+    recency buckets so the score is a plain SQL aggregate.
+
+    Args:
+        db: Database session
+        limit: Number of codes to return
+        window_days: Only scans this recent are counted
+        half_life_days: Age at which a scan counts half as much as a new one
+
+    Returns:
+        List[str]: Product codes, most popular first
+    """
+    now = datetime.now(timezone.utc)
+    scanned_at = db_models.ScanHistory.scanned_at
+
+    # First matching bucket wins, so list them from most recent to oldest
+    whens = []
+    lower = 0
+    for upper in _RECENCY_BUCKETS:
+        if lower >= window_days:
+            break
+        upper = min(upper, window_days)
+        weight = 0.5 ** (((lower + upper) / 2) / half_life_days)
+        whens.append((scanned_at >= now - timedelta(days=upper), weight))
+        lower = upper
+    score = func.sum(case(*whens, else_=0.0)).label("score")
+
+    rows = (
+        db.query(db_models.ScanHistory.product_code, score)
+        .filter(scanned_at >= now - timedelta(days=window_days))
+        .filter(db_models.ScanHistory.product_code.isnot(None))
+        .group_by(db_models.ScanHistory.product_code)
+        .order_by(score.desc())
+        .limit(limit)
+        .all()
+    )
+    return [row.product_code for row in rows]
+
+
+def _load_popular_product_codes(limit: int) -> List[str]:
+    """Query popular codes with a session of its own (blocking)."""
+    with read_session() as db:
+        return get_popular_product_codes(
+            db,
+            limit,
+            window_days=settings.CACHE_WARM_WINDOW_DAYS,
+            half_life_days=settings.CACHE_WARM_HALF_LIFE_DAYS,
+        )
+
+
+def product_paths(codes: Sequence[str]) -> List[str]:
+    """Cached API paths to warm for each product."""
+    paths = []
+    for code in codes:
+        paths.append(f"{settings.API_V1_STR}/products/{code}")
+        paths.append(f"{settings.API_V1_STR}/products/{code}/alternatives")
+    return paths
+
+
+def warm_encodings() -> List[str]:
+    """Accept-Encoding values to warm; responses are cached per negotiated coding."""
+    return list(SUPPORTED_ENCODINGS) if settings.COMPRESSION_ENABLED else [IDENTITY]
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """Seconds to wait before retrying a rate-limited response."""
+    try:
+        return max(float(response.headers.get("Retry-After", "")), 0.0)
+    except ValueError:
+        return _DEFAULT_RETRY_AFTER
+
+
+def remote_warm_rate() -> float:
+    """Request rate for warming over HTTP, below the rate limit unless a token exempts it."""
+    if settings.CACHE_WARMER_TOKEN or settings.RATE_LIMIT_PER_MINUTE <= 0:
+        return settings.CACHE_WARM_RATE
+    return min(settings.CACHE_WARM_RATE, settings.RATE_LIMIT_PER_MINUTE / 60 * _UNAUTHENTICATED_RATE_SHARE)
+
+
+async def warm_paths(
+    client: httpx.AsyncClient,
+    paths: Sequence[str],
+    encodings: Sequence[str] = (IDENTITY,),
+    rate: float = 20.0,
+    concurrency: int = 4,
+) -> Dict[str, int]:
+    """
+    Request each path once per encoding so the responses get cached.
+
+    Rate-limited requests are retried after their Retry-After, up to
+    _RATE_LIMITED_RETRIES times.
+
+    Args:
+        client: Client for the API (in-process or over HTTP)
+        paths: Paths to request
+        encodings: Accept-Encoding values to request each path with
+        rate: Maximum requests per second
+        concurrency: Maximum requests in flight
+
+    Returns:
+        Dict[str, int]: Counts of "ok", "not_found" and "failed" requests
+    """
+    stats = {"ok": 0, "not_found": 0, "failed": 0}
+    pacer = _Pacer(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def warm(path: str, encoding: str) -> None:
+        for attempt in range(_RATE_LIMITED_RETRIES + 1):
+            async with semaphore:
+                await pacer.wait()
+                try:
+                    response = await client.get(path, headers={"Accept-Encoding": encoding})
+                except Exception as e:
+                    stats["failed"] += 1
+                    logger.warning(f"Cache warming request for {path} failed: {str(e)}")
+                    return
+            if response.status_code != 429 or attempt == _RATE_LIMITED_RETRIES:
+                break
+            await asyncio.sleep(_retry_after(response))
+        if response.status_code == 200:
+            stats["ok"] += 1
+        elif response.status_code == 404:
+            stats["not_found"] += 1
+        else:
+            stats["failed"] += 1
+            logger.debug(f"Cache warming got {response.status_code} for {path}")
+
+    await asyncio.gather(*(warm(path, encoding) for path in paths for encoding in encodings))
+    return stats
+
+
+def _warm_health_assessment(code: str) -> bool:
+    """Generate (and so cache) the health assessment of a product (blocking)."""
+    with read_session() as db:
+        product = db.query(db_models.Product).options(PRODUCT_DETAIL).filter(db_models.Product.code == code).first()
+        if not product:
+            return False
+        assessment = generate_health_assessment(helpers.build_health_assessment_input(product), db)
+        # A fallback means Gemini is down and nothing was cached
+        return assessment is not None and not is_fallback_assessment(assessment)
+
+
+async def warm_health_assessments(codes: Sequence[str], rate: float = 0.5) -> Dict[str, int]:
+    """
+    Pre-generate health assessments one at a time, at most `rate` per second.
+
+    Returns:
+        Dict[str, int]: Counts of "ok" and "failed" products
+    """
+    stats = {"ok": 0, "failed": 0}
+    if not settings.GEMINI_API_KEY:
+        return stats
+    pacer = _Pacer(rate)
+    for code in codes:
+        await pacer.wait()
+        try:
+            ok = await run_in_threadpool(_warm_health_assessment, code)
+        except Exception as e:
+            ok = False
+            logger.warning(f"Health assessment warming for product {code} failed: {str(e)}")
+        stats["ok" if ok else "failed"] += 1
+    return stats
+
+
+async def warm_response_cache(
+    app: Optional[ASGIApp] = None,
+    base_url: Optional[str] = None,
+    limit: Optional[int] = None,
+    health_limit: Optional[int] = None,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Warm the caches for the most popular products.
+
+    Args:
+        app: The ASGI app to call in-process (warms Redis and this process's L1)
+        base_url: URL of a running API to call instead (e.g. from a scheduled job)
+        limit: Number of products (defaults to CACHE_WARM_TOP_N)
+        health_limit: Number of health assessments (defaults to CACHE_WARM_HEALTH_ASSESSMENTS)
+
+    Returns:
+        Dict[str, Dict[str, int]]: Request counts for "responses" and "health_assessments"
+    """
+    if app is None and base_url is None:
+        raise ValueError("Either app or base_url is required")
+    limit = settings.CACHE_WARM_TOP_N if limit is None else limit
+    health_limit = settings.CACHE_WARM_HEALTH_ASSESSMENTS if health_limit is None else health_limit
+
+    started = time.monotonic()
+    codes = await run_in_threadpool(_load_popular_product_codes, max(limit, health_limit))
+    logger.info(f"Warming caches for {len(codes)} popular products")
+
+    if app is not None:
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(
+            transport=transport,
+            base_url="http://cache-warmer",
+            headers={CACHE_WARMER_TOKEN_HEADER: CACHE_WARMER_PROCESS_TOKEN},
+        )
+        rate = settings.CACHE_WARM_RATE
+    else:
+        headers = {CACHE_WARMER_TOKEN_HEADER: settings.CACHE_WARMER_TOKEN} if settings.CACHE_WARMER_TOKEN else None
+        client = httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30.0)
+        rate = remote_warm_rate()
+        if rate < settings.CACHE_WARM_RATE:
+            logger.warning(
+                f"CACHE_WARMER_TOKEN not set: warming at {rate:.2f} requests/s to stay within the rate limit"
+            )
+    async with client:
+        responses = await warm_paths(
+            client,
+            product_paths(codes[:limit]),
+            encodings=warm_encodings(),
+            rate=rate,
+            concurrency=settings.CACHE_WARM_CONCURRENCY,
+        )
+    health = await warm_health_assessments(codes[:health_limit], rate=settings.CACHE_WARM_HEALTH_RATE)
+
+    logger.info(
+        f"Cache warming finished in {time.monotonic() - started:.1f}s: "
+        f"responses {responses}, health assessments {health}"
+    )
+    return {"responses": responses, "health_assessments": health}
+
+
+async def run_cache_warmer(app: ASGIApp, on_startup: bool, interval: float, initial_delay: float = 5.0) -> None:
+    """
+    Warm the caches at startup and/or every `interval` seconds until cancelled.
+
+    Args:
+        app: The ASGI app
+        on_startup: Warm once shortly after startup
+        interval: Seconds between runs (0 disables periodic warming)
+        initial_delay: Seconds to wait before the startup run, so startup can finish
+    """
+    if on_startup:
+        await asyncio.sleep(initial_delay)
+    elif interval > 0:
+        await asyncio.sleep(interval)
+    else:
+        return
+
+    while True:
+        try:
+            await warm_response_cache(app)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Cache warming failed: {str(e)}")
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
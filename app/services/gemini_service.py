@@ -6,6 +6,8 @@ import logging
 import time
 import random
 from app.core.config import settings
+from app.core.circuit_breaker import get_breaker
+from app.services.llm_hedging import DeadlineExceeded, get_hedged_caller, is_quota_error
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +21,12 @@ except Exception as e:
 # Structure: {cache_key: {"data": response_data, "expires_at": timestamp}}
 _recommendations_cache = {}
 
+# Expired recommendations are kept this long so they can be served while Gemini is down
+_STALE_GRACE_SECONDS = 86400
+
+# Lower is better when ranking products for the rule-based fallback
+_RISK_ORDER = {"green": 0, "yellow": 1, "red": 2}
+
 def get_personalized_recommendations(user_preferences, available_products, recent_scans=None):
     """Generate personalized product recommendations using Gemini."""
     if not settings.GEMINI_API_KEY:
@@ -34,43 +42,117 @@ def get_personalized_recommendations(user_preferences, available_products, recen
         logger.info("Returning cached recommendations")
         return cached_result
     
+    # Skip the prompt and retries entirely while Gemini is known to be down
+    breaker = get_breaker(
+        "gemini",
+        failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout=settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+    )
+    if breaker.is_open():
+        logger.warning("Gemini circuit open, serving fallback recommendations")
+        return _fallback_recommendations(cache_key, available_products)
+    
     # Format prompt with user context and products
     prompt = _build_recommendation_prompt(user_preferences, available_products, recent_scans)
     
-    # Use exponential backoff for rate limit handling
+    # Use exponential backoff for rate limit handling, all within one deadline
     max_retries = 3
     base_delay = 2  # seconds
+    caller = get_hedged_caller("recommendations")
+    deadline_at = caller.deadline_at()
+    
+    # The whole retry loop is one call as far as the breaker is concerned
+    if not breaker.allow_request():
+        logger.warning("Gemini circuit open, serving fallback recommendations")
+        return _fallback_recommendations(cache_key, available_products)
     
+    failed = False
     for attempt in range(max_retries):
         try:
-            # Call Gemini API
+            # Call Gemini API (hedged if the first attempt is slow)
             model = genai.GenerativeModel(settings.GEMINI_MODEL)
-            response = model.generate_content(prompt)
-            
-            # Parse and validate response
-            recommendations = _parse_gemini_response(response.text)
-            
-            # Store in cache (1 hour expiration)
-            _store_in_cache(cache_key, recommendations, 3600)
-            
-            return recommendations
-        
+            response = caller.call(
+                lambda timeout: model.generate_content(prompt, request_options={"timeout": timeout}),
+                deadline_at,
+            )
+        except DeadlineExceeded as e:
+            logger.error(f"Recommendations deadline exceeded: {e}")
+            failed = True
+            break
         except Exception as e:
-            # Check if it's a rate limit error
-            if "429" in str(e) or "exceeded your current quota" in str(e):
+            # Rate limits are retried with backoff and do not count against the breaker
+            if is_quota_error(e):
                 if attempt < max_retries - 1:  # Don't sleep on the last attempt
                     # Calculate backoff delay with jitter
                     delay = (base_delay * (2 ** attempt)) + (random.random() * 0.5)
+                    if time.monotonic() + delay >= deadline_at:
+                        logger.error("Rate limit hit and no time left before deadline for another attempt")
+                        break
                     logger.warning(f"Rate limit hit. Retrying in {delay:.2f} seconds. Attempt {attempt+1}/{max_retries}")
                     time.sleep(delay)
                 else:
                     logger.error(f"Rate limit error after {max_retries} attempts: {e}")
             else:
                 logger.error(f"Error generating recommendations: {e}")
+                failed = True
                 break
+        else:
+            breaker.record_success()
+            
+            # Parse and validate response
+            recommendations = _parse_gemini_response(response.text)
+            
+            # Store in cache (1 hour expiration)
+            _store_in_cache(cache_key, recommendations, 3600)
+            
+            return recommendations
+    
+    # At most one breaker failure per request; a request that only hit rate limits records none
+    if failed:
+        breaker.record_failure()
+    else:
+        breaker.release()
     
     # If we reach here, all attempts failed
-    return {"sections": []}
+    return _fallback_recommendations(cache_key, available_products)
+
+def _fallback_recommendations(cache_key: str, available_products) -> Dict:
+    """
+    Build fallback recommendations when Gemini is unavailable.
+    
+    Prefers stale cached recommendations for the same inputs; otherwise picks
+    the lowest-risk available products with a generic reason.
+    """
+    cache_entry = _recommendations_cache.get(cache_key)
+    if cache_entry and time.time() <= cache_entry["expires_at"] + _STALE_GRACE_SECONDS:
+        logger.info("Serving stale cached recommendations")
+        return cache_entry["data"]
+    
+    if not available_products:
+        return {"sections": []}
+    
+    ranked = sorted(
+        available_products,
+        key=lambda p: _RISK_ORDER.get(str(p.get("risk_rating") or "").lower(), len(_RISK_ORDER))
+    )
+    products = [
+        {
+            "code": p.get("code"),
+            "name": p.get("name"),
+            "reason": "Lower-risk option from our catalog",
+            "highlight": f"{p.get('risk_rating')} Rated" if p.get("risk_rating") else "Top Pick",
+        }
+        for p in ranked[:6]
+    ]
+    return {
+        "sections": [
+            {
+                "title": "Top Picks",
+                "description": "Lower-risk products selected while personalized picks are unavailable",
+                "products": products,
+            }
+        ]
+    }
 
 def _generate_cache_key(user_preferences, available_products, recent_scans) -> str:
     """Generate a cache key based on input parameters."""
@@ -106,18 +188,17 @@ def _get_from_cache(key: str) -> Optional[Dict]:
         
     cache_entry = _recommendations_cache[key]
     if time.time() > cache_entry["expires_at"]:
-        # Expired
-        del _recommendations_cache[key]
+        # Expired - kept around for the stale fallback until the sweep removes it
         return None
         
     return cache_entry["data"]
 
 def _clean_expired_cache() -> None:
-    """Remove expired entries from cache."""
+    """Remove entries that are past their stale grace period from cache."""
     now = time.time()
     expired_keys = [
         k for k, v in _recommendations_cache.items() 
-        if now > v["expires_at"]
+        if now > v["expires_at"] + _STALE_GRACE_SECONDS
     ]
     for k in expired_keys:
         del _recommendations_cache[k]
@@ -11,8 +11,11 @@ from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.circuit_breaker import get_breaker
 from app.models.product import HealthAssessment, ProductStructured
 from app.db import models as db_models
+from app.db.projections import PRODUCT_SIMILAR
+from app.services.llm_hedging import DeadlineExceeded, get_hedged_caller, is_quota_error
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +23,16 @@ logger = logging.getLogger(__name__)
 # Structure: {product_code: {"data": assessment_data, "expires_at": timestamp}}
 _health_assessment_cache = {}
 
+# Expired assessments are kept this long so they can be served while Gemini is down
+_STALE_GRACE_SECONDS = 7 * 86400
+
+# Maps product risk ratings to the grade/color used by AI assessments
+_RISK_GRADES = {
+    "green": ("A", "Green"),
+    "yellow": ("C", "Yellow"),
+    "red": ("E", "Red"),
+}
+
 def generate_health_assessment(product: ProductStructured, db: Optional[Session] = None) -> Optional[HealthAssessment]:
     """
     Generate a detailed health assessment for a product using Gemini.
@@ -44,6 +57,16 @@ def generate_health_assessment(product: ProductStructured, db: Optional[Session]
         logger.info(f"Returning cached health assessment for product {cache_key}")
         return cached_result
     
+    # Skip the prompt and retries entirely while Gemini is known to be down
+    breaker = get_breaker(
+        "gemini",
+        failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout=settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+    )
+    if breaker.is_open():
+        logger.warning(f"Gemini circuit open, serving fallback health assessment for product {cache_key}")
+        return _fallback_assessment(product)
+    
     # Get similar products for recommendations if database is available
     similar_products = []
     if db and product.product.meat_type:
@@ -52,41 +75,136 @@ def generate_health_assessment(product: ProductStructured, db: Optional[Session]
     # Format prompt with product data and similar products
     prompt = _build_health_assessment_prompt(product, similar_products)
     
-    # Use exponential backoff for rate limit handling
+    # Use exponential backoff for rate limit handling, all within one deadline
     max_retries = 3
     base_delay = 2  # seconds
+    caller = get_hedged_caller("health_assessment")
+    deadline_at = caller.deadline_at()
     
+    # The whole retry loop is one call as far as the breaker is concerned
+    if not breaker.allow_request():
+        logger.warning(f"Gemini circuit open, serving fallback health assessment for product {cache_key}")
+        return _fallback_assessment(product)
+    
+    failed = False
     for attempt in range(max_retries):
         try:
-            # Call Gemini API
+            # Call Gemini API (hedged if the first attempt is slow)
             model = genai.GenerativeModel(settings.GEMINI_MODEL)
-            response = model.generate_content(prompt)
-            
-            # Parse and validate response
-            assessment = _parse_gemini_response(response.text)
-            
-            if assessment:
-                # Store in cache (24 hour expiration)
-                _store_in_cache(cache_key, assessment, 86400)  # 24 hours in seconds
-                
-            return assessment
-        
+            response = caller.call(
+                lambda timeout: model.generate_content(prompt, request_options={"timeout": timeout}),
+                deadline_at,
+            )
+        except DeadlineExceeded as e:
+            logger.error(f"Health assessment deadline exceeded: {e}")
+            failed = True
+            break
         except Exception as e:
-            # Check if it's a rate limit error
-            if "429" in str(e) or "exceeded your current quota" in str(e):
+            # Rate limits are retried with backoff and do not count against the breaker
+            if is_quota_error(e):
                 if attempt < max_retries - 1:  # Don't sleep on the last attempt
                     # Calculate backoff delay with jitter
                     delay = (base_delay * (2 ** attempt)) + (random.random() * 0.5)
+                    if time.monotonic() + delay >= deadline_at:
+                        logger.error("Rate limit hit and no time left before deadline for another attempt")
+                        break
                     logger.warning(f"Rate limit hit. Retrying in {delay:.2f} seconds. Attempt {attempt+1}/{max_retries}")
                     time.sleep(delay)
                 else:
                     logger.error(f"Rate limit error after {max_retries} attempts: {e}")
             else:
                 logger.error(f"Error generating health assessment: {e}")
+                failed = True
                 break
+        else:
+            breaker.record_success()
+            
+            # Parse and validate response
+            assessment = _parse_gemini_response(response.text)
+            
+            if assessment:
+                # Store in cache (24 hour expiration)
+                _store_in_cache(cache_key, assessment, 86400)  # 24 hours in seconds
+                
+            return assessment
+    
+    # At most one breaker failure per request; a request that only hit rate limits records none
+    if failed:
+        breaker.record_failure()
+    else:
+        breaker.release()
     
     # If we reach here, all attempts failed
-    return None
+    return _fallback_assessment(product)
+
+def is_fallback_assessment(assessment: HealthAssessment) -> bool:
+    """
+    Check whether an assessment is a fallback served while Gemini was unavailable.
+
+    Fallbacks should not be cached beyond the request, so that fresh
+    assessments are served once Gemini recovers.
+    """
+    return assessment._fallback
+
+def _fallback_assessment(product: ProductStructured) -> Optional[HealthAssessment]:
+    """
+    Build a fallback assessment when Gemini is unavailable.
+    
+    Prefers a stale cached assessment; otherwise derives a basic rule-based
+    assessment from the product's risk rating, nutrition and detected additives.
+    Either way the result is marked as a fallback (see is_fallback_assessment).
+    """
+    stale = _get_stale_from_cache(product.product.code)
+    if stale:
+        logger.info(f"Serving stale cached health assessment for product {product.product.code}")
+        # A copy, so the cached assessment itself stays unmarked
+        stale = stale.model_copy()
+        stale._fallback = True
+        return stale
+    
+    try:
+        risk_rating = (product.criteria.risk_rating or "") if product.criteria else ""
+        grade, color = _RISK_GRADES.get(risk_rating.lower(), ("C", "Yellow"))
+        
+        # Nutrition labels from simple per-100g thresholds
+        nutrition_labels = []
+        nutrition = product.health.nutrition if product.health else None
+        if nutrition:
+            if nutrition.protein is not None and nutrition.protein >= 20:
+                nutrition_labels.append("High Protein")
+            if nutrition.fat is not None and nutrition.fat <= 10:
+                nutrition_labels.append("Lean Cut")
+            if nutrition.salt is not None and nutrition.salt <= 0.3:
+                nutrition_labels.append("Low Sodium")
+            elif nutrition.salt is not None and nutrition.salt > 1.5:
+                nutrition_labels.append("High Sodium")
+        
+        # Group detected additives by their known risk level
+        ingredients_assessment = {"high_risk": [], "moderate_risk": [], "low_risk": []}
+        additives = (product.criteria.additives or []) if product.criteria else []
+        for additive in additives:
+            bucket = "high_risk" if additive.risk_level == "high" else "moderate_risk"
+            ingredients_assessment[bucket].append({
+                "name": additive.name,
+                "risk_level": "high" if bucket == "high_risk" else "moderate",
+                "category": additive.category,
+                "concerns": ", ".join(additive.concerns or []),
+            })
+        
+        assessment = HealthAssessment(
+            summary=(
+                "Detailed AI analysis is temporarily unavailable. This summary is based on "
+                "the product's risk rating, nutrition facts and detected additives."
+            ),
+            risk_summary={"grade": grade, "color": color},
+            nutrition_labels=nutrition_labels,
+            ingredients_assessment=ingredients_assessment,
+        )
+        assessment._fallback = True
+        return assessment
+    except Exception as e:
+        logger.error(f"Failed to build fallback health assessment: {e}")
+        return None
 
 def _store_in_cache(key: str, data: HealthAssessment, ttl: int) -> None:
     """Store health assessment in cache with expiration."""
@@ -107,18 +225,26 @@ def _get_from_cache(key: str) -> Optional[HealthAssessment]:
         
     cache_entry = _health_assessment_cache[key]
     if time.time() > cache_entry["expires_at"]:
-        # Expired
-        del _health_assessment_cache[key]
+        # Expired - kept around for the stale fallback until the sweep removes it
         return None
         
     return cache_entry["data"]
 
+def _get_stale_from_cache(key: str) -> Optional[HealthAssessment]:
+    """Get health assessment from cache even if expired, within the stale grace period."""
+    cache_entry = _health_assessment_cache.get(key)
+    if not cache_entry:
+        return None
+    if time.time() > cache_entry["expires_at"] + _STALE_GRACE_SECONDS:
+        return None
+    return cache_entry["data"]
+
 def _clean_expired_cache() -> None:
-    """Remove expired entries from cache."""
+    """Remove entries that are past their stale grace period from cache."""
     now = time.time()
     expired_keys = [
         k for k, v in _health_assessment_cache.items() 
-        if now > v["expires_at"]
+        if now > v["expires_at"] + _STALE_GRACE_SECONDS
     ]
     for k in expired_keys:
         del _health_assessment_cache[k]
@@ -132,6 +258,7 @@ def _get_similar_products(db: Session, target_product: ProductStructured) -> Lis
         # Query products with same meat type, excluding the current product
         similar_products = (
             db.query(db_models.Product)
+            .options(PRODUCT_SIMILAR)
             .filter(db_models.Product.meat_type == target_product.product.meat_type)
             .filter(db_models.Product.code != target_product.product.code)
             .filter(db_models.Product.ingredients_text.isnot(None))  # Must have ingredients
@@ -0,0 +1,291 @@
+"""Deadlines and hedged requests for upstream LLM calls.
+
+Each LLM-backed endpoint gets a HedgedCaller with its own deadline. When the
+primary call has not answered by a configurable percentile of the latencies
+observed so far, a second identical call is sent and whichever succeeds first
+wins. Hedging is capped to a fraction of recent calls so a slow upstream never
+doubles our quota usage.
+
+Calls run in a shared pool of LLM_CALL_POOL_SIZE threads. The hedge delay is
+measured from when the primary call starts running, so time spent queued
+behind a saturated pool does not send more hedges into the same queue.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import Sample, register_collector
+
+try:
+    from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+    _QUOTA_ERRORS: tuple = (ResourceExhausted, TooManyRequests)
+except ImportError:
+    _QUOTA_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+# Shared pool for upstream calls; two slots per in-flight request at most
+_executor = ThreadPoolExecutor(max_workers=settings.LLM_CALL_POOL_SIZE, thread_name_prefix="llm-call")
+
+
+class DeadlineExceeded(Exception):
+    """Raised when an LLM call does not complete before its deadline."""
+
+
+def is_quota_error(error: BaseException) -> bool:
+    """
+    Check whether an LLM error is a rate limit or quota error (429).
+
+    These are retried with backoff and are not upstream failures, so they do
+    not count against circuit breakers.
+    """
+    if _QUOTA_ERRORS and isinstance(error, _QUOTA_ERRORS):
+        return True
+    message = str(error)
+    return "429" in message or "exceeded your current quota" in message
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Initialize the tracker.
+
+        Args:
+            window: Number of most recent samples to keep
+            min_samples: Samples required before a percentile is reported
+        """
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Record the latency of a successful call."""
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Return the given latency percentile, or None if there is too little data."""
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+        return ordered[index]
+
+
+class HedgedCaller:
+    """Runs an upstream call under a deadline, hedging slow attempts."""
+
+    def __init__(
+        self,
+        name: str,
+        deadline: float,
+        hedge_percentile: float = 95.0,
+        max_hedge_fraction: float = 0.1,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        """
+        Initialize the caller.
+
+        Args:
+            name: Endpoint name used in logs
+            deadline: Total time budget in seconds for one logical request
+            hedge_percentile: Latency percentile after which a hedge is sent
+            max_hedge_fraction: Maximum fraction of recent calls allowed to hedge
+            min_samples: Latency samples required before hedging is enabled
+            window: Number of recent calls considered for latency and hedge share
+        """
+        self.name = name
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.max_hedge_fraction = max_hedge_fraction
+        self.latency = LatencyTracker(window=window, min_samples=min_samples)
+        # One slot per recent call, [1] once that call has hedged
+        self._hedged: Deque[List[int]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+        # Counters for monitoring
+        self.total_calls = 0
+        self.total_hedges = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+
+    def deadline_at(self) -> float:
+        """Return the monotonic timestamp by which a new logical request must finish."""
+        return time.monotonic() + self.deadline
+
+    def _reserve_hedge(self, slot: List[int]) -> bool:
+        """
+        Check the hedge budget and account for a hedge if one is allowed.
+
+        Args:
+            slot: The hedging call's own slot in the window, marked if allowed
+        """
+        with self._lock:
+            used = sum(hedged[0] for hedged in self._hedged)
+            if used + 1 > self.max_hedge_fraction * max(len(self._hedged), 1):
+                return False
+            slot[0] = 1
+            self.total_hedges += 1
+            return True
+
+    def _count(self, counter: str) -> None:
+        """Increment a monitoring counter."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _timed(self, fn: Callable[[float], Any], deadline_at: float, started: Optional[threading.Event] = None) -> Any:
+        """Run fn with the time left once a pool thread picks it up, and record its latency if it succeeds."""
+        if started is not None:
+            started.set()
+        start = time.monotonic()
+        if deadline_at <= start:
+            raise DeadlineExceeded(f"{self.name}: deadline passed while queued")
+        result = fn(deadline_at - start)
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    def call(self, fn: Callable[[float], Any], deadline_at: Optional[float] = None) -> Any:
+        """
+        Call fn, hedging it if it is slow, and return the first successful result.
+
+        Args:
+            fn: Callable taking the remaining time budget in seconds
+            deadline_at: Monotonic deadline shared across retries of one request
+
+        Returns:
+            The result of whichever attempt succeeded first
+
+        Raises:
+            DeadlineExceeded: If no attempt succeeded before the deadline
+            Exception: The error of the first failed attempt if all attempts failed
+        """
+        if deadline_at is None:
+            deadline_at = self.deadline_at()
+
+        if deadline_at <= time.monotonic():
+            self._count("deadline_exceeded")
+            raise DeadlineExceeded(f"{self.name}: deadline already exceeded")
+
+        slot = [0]
+        with self._lock:
+            self.total_calls += 1
+            self._hedged.append(slot)
+
+        started = threading.Event()
+        primary = _executor.submit(self._timed, fn, deadline_at, started)
+        pending: List[Future] = [primary]
+        first_error: Optional[BaseException] = None
+
+        hedge_after = self.latency.percentile(self.hedge_percentile)
+        # Only time spent running counts towards the hedge delay, not time queued for a thread
+        if hedge_after is not None and started.wait(timeout=max(deadline_at - time.monotonic(), 0)):
+            if hedge_after < deadline_at - time.monotonic():
+                done, _ = wait(pending, timeout=hedge_after)
+                if not done and self._reserve_hedge(slot):
+                    logger.info(f"{self.name}: no answer after {hedge_after:.2f}s, sending hedged request")
+                    pending.append(_executor.submit(self._timed, fn, deadline_at))
+
+        try:
+            while pending:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    pending.remove(future)
+                    error = future.exception()
+                    if error is None:
+                        if future is not primary:
+                            self._count("hedge_wins")
+                        return future.result()
+                    if first_error is None:
+                        first_error = error
+        finally:
+            # The loser either never started or is bounded by its own timeout
+            for future in pending:
+                future.cancel()
+
+        if first_error is not None and not pending:
+            if isinstance(first_error, DeadlineExceeded):
+                self._count("deadline_exceeded")
+            raise first_error
+        self._count("deadline_exceeded")
+        raise DeadlineExceeded(f"{self.name}: no response within {self.deadline:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters for monitoring."""
+        return {
+            "calls": self.total_calls,
+            "hedges": self.total_hedges,
+            "hedge_wins": self.hedge_wins,
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedge_after_seconds": self.latency.percentile(self.hedge_percentile),
+        }
+
+
+# One caller per LLM-backed endpoint, created on first use
+_callers: Dict[str, HedgedCaller] = {}
+_callers_lock = threading.Lock()
+
+_ENDPOINT_DEADLINES = {
+    "health_assessment": lambda: settings.LLM_HEALTH_ASSESSMENT_DEADLINE,
+    "recommendations": lambda: settings.LLM_RECOMMENDATIONS_DEADLINE,
+}
+
+
+def get_hedged_caller(endpoint: str) -> HedgedCaller:
+    """
+    Get the shared hedged caller for an LLM-backed endpoint.
+
+    Args:
+        endpoint: Endpoint name, e.g. "health_assessment" or "recommendations"
+
+    Returns:
+        HedgedCaller: Caller configured from settings
+    """
+    caller = _callers.get(endpoint)
+    if caller is not None:
+        return caller
+
+    with _callers_lock:
+        if endpoint not in _callers:
+            deadline = _ENDPOINT_DEADLINES.get(endpoint, lambda: settings.LLM_RECOMMENDATIONS_DEADLINE)()
+            _callers[endpoint] = HedgedCaller(
+                name=endpoint,
+                deadline=deadline,
+                hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+                max_hedge_fraction=settings.LLM_HEDGE_MAX_FRACTION,
+                min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+            )
+        return _callers[endpoint]
+
+
+def get_hedging_stats() -> Dict[str, Dict[str, Any]]:
+    """Return stats for every endpoint caller created so far."""
+    return {name: caller.stats() for name, caller in _callers.items()}
+
+
+def _collect_metrics() -> Iterable[Sample]:
+    """Expose hedging counters as metrics."""
+    samples: List[Sample] = []
+    for name, stats in get_hedging_stats().items():
+        labels = {"endpoint": name}
+        samples.append(("llm_calls_total", labels, stats["calls"]))
+        samples.append(("llm_hedges_total", labels, stats["hedges"]))
+        samples.append(("llm_hedge_wins_total", labels, stats["hedge_wins"]))
+        samples.append(("llm_deadline_exceeded_total", labels, stats["deadline_exceeded"]))
+    return samples
+
+
+register_collector("llm_hedging", _collect_metrics)
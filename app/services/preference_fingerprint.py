@@ -0,0 +1,97 @@
+"""Preference fingerprints for caching personalized responses.
+
+A fingerprint is a short hash of a user's stored preferences. Personalized
+routes whose output depends only on preferences (not on who the user is) are
+cached under the fingerprint, so users with identical preferences share
+entries. Lookups hit the database at most once per user per
+PREFERENCE_FINGERPRINT_TTL seconds.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Any, Optional
+
+from app.core.cache import BoundedTTLCache
+from app.core.config import settings
+from app.db import models as db_models
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Marker for users without stored preferences (they all get the defaults)
+NO_PREFERENCES = "none"
+
+_fingerprints = BoundedTTLCache(
+    max_bytes=1024 * 1024,
+    default_ttl=settings.PREFERENCE_FINGERPRINT_TTL,
+    name="preference_fingerprints",
+)
+
+
+def preference_fingerprint(preferences: Any) -> str:
+    """
+    Hash preferences into a stable fingerprint.
+
+    Args:
+        preferences: Preferences as stored (dict or JSON text) or None
+
+    Returns:
+        str: Fingerprint, equal for equal preferences regardless of key order
+    """
+    if not preferences:
+        return NO_PREFERENCES
+    if isinstance(preferences, str):
+        try:
+            preferences = json.loads(preferences)
+        except json.JSONDecodeError:
+            # Hash unparseable text as-is
+            return hashlib.sha1(preferences.encode()).hexdigest()[:16]
+        if not preferences:
+            return NO_PREFERENCES
+    canonical = json.dumps(preferences, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()[:16]
+
+
+def cached_preference_fingerprint(user_id: str) -> Optional[str]:
+    """Return a user's fingerprint if it is cached, without touching the database."""
+    return _fingerprints.get(user_id)
+
+
+def get_preference_fingerprint(user_id: str) -> Optional[str]:
+    """
+    Get the fingerprint of a user's stored preferences.
+
+    Blocking (queries the database on a miss); call from a thread pool in async code.
+
+    Args:
+        user_id: Profile id (JWT subject)
+
+    Returns:
+        Optional[str]: Fingerprint, or None if the user has no profile yet or the lookup failed
+    """
+    fingerprint = _fingerprints.get(user_id)
+    if fingerprint is not None:
+        return fingerprint
+
+    try:
+        with SessionLocal() as db:
+            row = (
+                db.query(db_models.User.preferences)
+                .filter(db_models.User.id == user_id)
+                .first()
+            )
+    except Exception as e:
+        logger.warning(f"Preference fingerprint lookup failed for user {user_id}: {str(e)}")
+        return None
+
+    if row is None:
+        return None
+    fingerprint = preference_fingerprint(row.preferences)
+    _fingerprints.set(user_id, fingerprint, len(user_id) + len(fingerprint))
+    return fingerprint
+
+
+def invalidate_preference_fingerprint(user_id: str) -> None:
+    """Forget a user's cached fingerprint after their preferences change."""
+    _fingerprints.delete(str(user_id))
@@ -14,6 +14,7 @@ from sqlalchemy.sql import text
 
 from app.db import models as db_models
 from app.db.connection import is_using_local_db
+from app.db.projections import PRODUCT_LISTING
 
 logger = logging.getLogger(__name__)
 
@@ -167,6 +168,9 @@ def _get_products_from_db(db: Session) -> List[db_models.Product]:
     """
     Get products from database with error handling and fallback strategies.
     
+    Loads the listing columns: scoring matches on the text fields, but the
+    catalog never needs image_data.
+    
     Args:
         db: Database session
         
@@ -175,7 +179,7 @@ def _get_products_from_db(db: Session) -> List[db_models.Product]:
     """
     try:
         # Primary query method
-        products = db.query(db_models.Product).all()
+        products = db.query(db_models.Product).options(PRODUCT_LISTING).all()
         logger.debug(f"Retrieved {len(products)} products from database")
         return products
     except Exception as e:
@@ -183,7 +187,7 @@ def _get_products_from_db(db: Session) -> List[db_models.Product]:
         
         try:
             # Fallback: Try simpler query
-            products = db.query(db_models.Product).limit(1000).all()
+            products = db.query(db_models.Product).options(PRODUCT_LISTING).limit(1000).all()
             logger.debug(f"Retrieved {len(products)} products using fallback query")
             return products
         except Exception as e2:
@@ -0,0 +1,122 @@
+"""Cached user profiles for the auth dependency.
+
+Authenticated requests need the caller's profile (name, email, preferences).
+Loading it from the profiles table on every request costs a query per request,
+so get_current_user returns a read-only UserProfile snapshot that is reused for
+USER_PROFILE_CACHE_TTL seconds. Routes that change a profile write through the
+database row and call invalidate_user_profile; other workers see the change
+once their copy expires.
+"""
+
+import copy
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.cache import BoundedTTLCache
+from app.core.config import settings
+from app.db import models as db_models
+
+logger = logging.getLogger(__name__)
+
+_profiles = BoundedTTLCache(
+    max_bytes=settings.USER_PROFILE_CACHE_MAX_BYTES,
+    default_ttl=settings.USER_PROFILE_CACHE_TTL,
+    name="user_profiles",
+)
+
+
+def parse_preferences(preferences: Any) -> Dict[str, Any]:
+    """
+    Parse stored preferences.
+
+    Args:
+        preferences: Preferences as stored (dict or JSON text) or None
+
+    Returns:
+        Dict[str, Any]: Preferences, empty if unset or unparseable
+    """
+    if not preferences:
+        return {}
+    if isinstance(preferences, str):
+        try:
+            preferences = json.loads(preferences)
+        except json.JSONDecodeError:
+            logger.warning("Could not decode stored preferences")
+            return {}
+    return preferences if isinstance(preferences, dict) else {}
+
+
+class UserProfile:
+    """
+    Read-only snapshot of a profile row, with preferences parsed.
+
+    The snapshot is shared by every request of the user until it expires, so
+    preferences are handed out as a copy that callers are free to change.
+    """
+
+    __slots__ = ("id", "email", "full_name", "_preferences", "created_at", "updated_at")
+
+    def __init__(
+        self,
+        id: str,
+        email: Optional[str],
+        full_name: Optional[str],
+        preferences: Dict[str, Any],
+        created_at: Optional[datetime],
+        updated_at: Optional[datetime],
+    ):
+        self.id = id
+        self.email = email
+        self.full_name = full_name
+        self._preferences = preferences
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    @property
+    def preferences(self) -> Dict[str, Any]:
+        """A copy of the parsed preferences."""
+        return copy.deepcopy(self._preferences)
+
+    @classmethod
+    def from_model(cls, user: db_models.User) -> "UserProfile":
+        """Snapshot a loaded profile row."""
+        return cls(
+            id=str(user.id),
+            email=user.email,
+            full_name=user.full_name,
+            preferences=parse_preferences(user.preferences),
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+    def size(self) -> int:
+        """Approximate memory use in bytes, for the cache budget."""
+        preferences = json.dumps(self._preferences, default=str) if self._preferences else ""
+        return 256 + len(self.id) + len(self.email or "") + len(self.full_name or "") + len(preferences)
+
+
+def get_cached_profile(user_id: str) -> Optional[UserProfile]:
+    """Return a user's cached profile, or None."""
+    return _profiles.get(str(user_id))
+
+
+def cache_profile(user: db_models.User) -> UserProfile:
+    """
+    Snapshot a loaded profile row and cache it.
+
+    Args:
+        user: Profile row
+
+    Returns:
+        UserProfile: The cached snapshot
+    """
+    profile = UserProfile.from_model(user)
+    _profiles.set(profile.id, profile, profile.size())
+    return profile
+
+
+def invalidate_user_profile(user_id: str) -> None:
+    """Forget a user's cached profile after it changes."""
+    _profiles.delete(str(user_id))
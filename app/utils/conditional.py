@@ -0,0 +1,126 @@
+"""HTTP conditional request helpers (ETag / Last-Modified) for the MeatWise API."""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+from typing import Any, Dict, Mapping, Optional
+
+from fastapi import Response
+
+# Sent with validators: clients may store the response but must revalidate it
+# (If-None-Match) before reuse; replaces the default Cache-Control: no-store
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a strong ETag from the values that determine a response.
+
+    Args:
+        parts: Values identifying the representation (e.g. code and last_updated)
+
+    Returns:
+        str: Quoted ETag
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, datetime):
+            part = part.isoformat()
+        digest.update(str(part).encode())
+        digest.update(b"\x00")
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def content_etag(body: bytes) -> str:
+    """Build a strong ETag from a response body."""
+    return f'"{hashlib.sha1(body).hexdigest()[:32]}"'
+
+
+def format_http_date(value: datetime) -> str:
+    """Format a datetime as an HTTP date; naive values are taken as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    """Parse an HTTP date header, returning None if it is missing or invalid."""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, RFC 9110)."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def is_not_modified(
+    headers: Mapping[str, str],
+    etag: Optional[str],
+    last_modified: Optional[datetime] = None,
+) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since against the current validators.
+
+    If-None-Match takes precedence; If-Modified-Since is only used when the
+    request has no If-None-Match header.
+
+    Args:
+        headers: Request headers (case-insensitive mapping)
+        etag: Current ETag of the resource
+        last_modified: Current modification time of the resource
+
+    Returns:
+        bool: True if a 304 Not Modified response should be sent
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag is not None and etag_matches(if_none_match, etag)
+
+    if last_modified is None:
+        return False
+    if_modified_since = parse_http_date(headers.get("if-modified-since"))
+    if if_modified_since is None:
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    return last_modified.replace(microsecond=0) <= if_modified_since
+
+
+def validator_headers(etag: Optional[str], last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    """Build ETag / Last-Modified response headers, with the Cache-Control that lets clients revalidate."""
+    headers = {}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified is not None:
+        headers["Last-Modified"] = format_http_date(last_modified)
+    if headers:
+        headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+    return headers
+
+
+def set_validators(response: Response, etag: Optional[str], last_modified: Optional[datetime] = None) -> None:
+    """Attach ETag / Last-Modified (and Cache-Control) headers to a response."""
+    response.headers.update(validator_headers(etag, last_modified))
+
+
+def not_modified(etag: Optional[str], last_modified: Optional[datetime] = None) -> Response:
+    """Build an empty 304 Not Modified response carrying the validators."""
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
@@ -246,4 +246,80 @@ def assess_environmental_impact(product: Union[models.ProductBase, Dict[str, Any
         "impact": impact,
         "details": details,
         "sustainability_practices": practices
-    } 
\ No newline at end of file
+    } 
+
+
+def build_health_assessment_input(product: db_models.Product) -> models.ProductStructured:
+    """
+    Build the structured product the health assessment service analyzes.
+    
+    Also the response of the sync and async product detail routes.
+    
+    Args:
+        product: Product row
+        
+    Returns:
+        models.ProductStructured: Product, criteria, health and environment data
+    """
+    # Extract additives from ingredients text
+    additives = extract_additives_from_text(product.ingredients_text or "")
+
+    # Assess health concerns based on data
+    health_concerns = []
+    if product.protein and product.protein < 10:
+        health_concerns.append("Low protein content")
+    if product.fat and product.fat > 25:
+        health_concerns.append("High fat content")
+    if product.salt and product.salt > 1.5:
+        health_concerns.append("High salt content")
+
+    # Create basic environmental impact assessment
+    env_impact = {
+        "impact": "Moderate",
+        "details": "Based on default meat product environmental impact assessment",
+        "sustainability_practices": ["Unknown"]
+    }
+
+    if product.meat_type == "beef":
+        env_impact["impact"] = "High"
+        env_impact["details"] = "Beef production typically has higher environmental impact"
+    elif product.meat_type in ["chicken", "turkey"]:
+        env_impact["impact"] = "Lower"
+        env_impact["details"] = "Poultry typically has lower environmental impact compared to red meat"
+
+    # Build structured response for the health assessment service
+    return models.ProductStructured(
+        product=models.ProductInfo(
+            code=product.code,
+            name=product.name,
+            brand=product.brand,
+            description=product.description,
+            ingredients_text=product.ingredients_text,
+            image_url=product.image_url,
+            image_data=product.image_data,
+            meat_type=product.meat_type
+        ),
+        criteria=models.ProductCriteria(
+            risk_rating=product.risk_rating,
+            additives=additives
+        ),
+        health=models.ProductHealth(
+            nutrition=models.ProductNutrition(
+                calories=product.calories,
+                protein=product.protein,
+                fat=product.fat,
+                carbohydrates=product.carbohydrates,
+                salt=product.salt
+            ),
+            health_concerns=health_concerns
+        ),
+        environment=models.ProductEnvironment(
+            impact=env_impact["impact"],
+            details=env_impact["details"],
+            sustainability_practices=env_impact["sustainability_practices"]
+        ),
+        metadata=models.ProductMetadata(
+            last_updated=product.last_updated,
+            created_at=product.created_at
+        )
+    )
@@ -0,0 +1,135 @@
+"""Keyset (cursor) pagination helpers for the MeatWise API.
+
+A page is fetched with `WHERE sort_key > last_key ORDER BY sort_key LIMIT n`
+rather than OFFSET, so every page costs one index range scan whatever its depth,
+and rows inserted before the current position do not shift later pages. The
+sort key always ends with a unique column, which makes the order total.
+
+Cursors are opaque to clients: URL-safe base64 of the sort name and the key of
+the last row on the page. Sort columns are text, so a key holds strings, with
+None for a NULL in the nullable column.
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded or belongs to another sort order."""
+
+
+def encode_cursor(sort: str, key: Sequence[Any]) -> str:
+    """
+    Encode the position after a row as an opaque cursor.
+
+    Args:
+        sort: Name of the sort order the cursor belongs to
+        key: The row's values for the sort columns
+
+    Returns:
+        str: Cursor for the next page
+    """
+    payload = json.dumps([sort, list(key)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, sort: str, columns: int) -> List[Any]:
+    """
+    Decode a cursor made by encode_cursor for the same sort order.
+
+    Args:
+        cursor: Cursor from a previous page
+        sort: Name of the sort order of this request
+        columns: Number of sort columns
+
+    Returns:
+        List[Any]: The key of the last row of the previous page
+
+    Raises:
+        InvalidCursor: If the cursor is malformed, holds values of the wrong type
+            or was made for another sort order
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if cursor_sort != sort:
+        raise InvalidCursor(f"Cursor belongs to sort order {cursor_sort!r}, not {sort!r}")
+    if not isinstance(key, list) or len(key) != columns:
+        raise InvalidCursor("Malformed cursor")
+    # Tampered values would otherwise reach the database in the key comparison;
+    # the last (unique) column is never NULL
+    if not all(isinstance(value, str) or value is None for value in key) or not isinstance(key[-1], str):
+        raise InvalidCursor("Malformed cursor")
+    return key
+
+
+def fetch_page(query: Query, columns: Sequence[Any], key: Optional[Sequence[Any]], limit: int) -> List[Any]:
+    """
+    Fetch the page of a query after key, in columns order.
+
+    The sort key is either a unique non-null column, or a nullable column
+    followed by one. NULLs of the nullable column sort last and are read with a
+    second query once the non-null rows run out, so that each query stays a
+    single index range scan ((column, unique) > key rather than an OR). One row
+    more than limit is fetched, so the caller can tell whether a next page
+    exists (see next_cursor).
+
+    Args:
+        query: Filtered query
+        columns: Sort columns
+        key: Key of the last row of the previous page, or None for the first page
+        limit: Page size
+
+    Returns:
+        List[Any]: Up to limit + 1 rows
+    """
+    if len(columns) == 1:
+        (unique,) = columns
+        if key is not None:
+            query = query.filter(unique > key[0])
+        return query.order_by(unique).limit(limit + 1).all()
+
+    column, unique = columns
+    rows: List[Any] = []
+    if key is None or key[0] is not None:
+        page = query.filter(column.isnot(None))
+        if key is not None:
+            page = page.filter(tuple_(column, unique) > tuple_(*key))
+        rows = page.order_by(column, unique).limit(limit + 1).all()
+        if len(rows) > limit:
+            return rows
+        key = None
+
+    nulls = query.filter(column.is_(None))
+    if key is not None:
+        nulls = nulls.filter(unique > key[1])
+    return rows + nulls.order_by(unique).limit(limit + 1 - len(rows)).all()
+
+
+def next_cursor(rows: List[Any], sort: str, keys: Sequence[str], limit: int) -> Optional[str]:
+    """
+    Trim the extra row fetched by fetch_page and return the next page's cursor.
+
+    Args:
+        rows: Rows from fetch_page; trimmed to limit in place
+        sort: Name of the sort order
+        keys: Attribute names of the sort columns
+        limit: Page size
+
+    Returns:
+        Optional[str]: Cursor for the next page, or None on the last page
+    """
+    if len(rows) <= limit:
+        return None
+    del rows[limit:]
+    return encode_cursor(sort, [getattr(rows[-1], name) for name in keys])
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Async Database Access Benchmark
+-------------------------------
+Compares the sync product routes (Session, run in the threadpool) with their
+async versions (AsyncSession on asyncpg) at growing concurrency. Both sets of
+routes are mounted in bare FastAPI apps without middleware and called in process
+through httpx's ASGI transport, so the numbers show how database access scales
+rather than network or middleware overhead.
+
+Routes: product by code, alternatives and count, cycling over product codes
+taken from the database. Needs a database with products (DATABASE_URL); the
+async side needs asyncpg and greenlet. A SQLite file works via aiosqlite, but
+SQLite serializes writes and aiosqlite runs a thread per connection, so only
+PostgreSQL numbers are meaningful.
+
+Usage: python scripts/benchmarks/benchmark_async_db.py [--concurrency 1,10,50,200] [--requests 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import select
+
+from app.db import models as db_models
+from app.db.engines import async_db_enabled, registry
+from app.db.session import SessionLocal
+
+
+def build_apps():
+    """Return (name, app) pairs mounting the sync and async product routes."""
+    from app.api.v1.endpoints.async_products import router as async_router
+    from app.api.v1.endpoints.products import router as sync_router
+
+    apps = []
+    for name, router in (("sync", sync_router), ("async", async_router)):
+        app = FastAPI()
+        app.include_router(router, prefix="/products")
+        apps.append((name, app))
+    return apps
+
+
+def product_codes(limit: int):
+    """Return up to limit product codes from the database."""
+    with SessionLocal() as db:
+        return list(db.execute(select(db_models.Product.code).limit(limit)).scalars())
+
+
+async def run(app, paths, concurrency: int, requests: int):
+    """Send requests across concurrency clients; return (seconds, latencies, errors)."""
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    errors = 0
+    next_request = 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def worker():
+            nonlocal next_request, errors
+            while next_request < requests:
+                path = paths[next_request % len(paths)]
+                next_request += 1
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 500:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies, errors
+
+
+async def main(concurrency_levels, requests: int, products: int):
+    if not async_db_enabled():
+        print("Async database access is unavailable (needs greenlet and asyncpg, or aiosqlite for a SQLite file)")
+        return
+    codes = product_codes(products)
+    if not codes:
+        print("No products in the database")
+        return
+    paths = []
+    for code in codes:
+        paths += [f"/products/{code}", f"/products/{code}/alternatives", "/products/count"]
+
+    apps = build_apps()
+    print(f"{len(codes)} products, {requests} requests per run")
+    print(f"{'routes':>7} {'clients':>8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for concurrency in concurrency_levels:
+        for name, app in apps:
+            await run(app, paths, concurrency, min(requests, 200))  # Warm up
+            elapsed, latencies, errors = await run(app, paths, concurrency, requests)
+            ordered = sorted(latencies)
+            p50 = statistics.median(ordered)
+            p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+            print(
+                f"{name:>7} {concurrency:>8} {len(latencies) / elapsed:>9.0f}"
+                f" {p50 * 1000:>8.2f} {p99 * 1000:>8.2f} {errors:>7}"
+            )
+    await registry.dispose_all_async()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sync versus async database access in the product routes")
+    parser.add_argument("--concurrency", default="1,10,50,200", help="Comma-separated numbers of concurrent clients")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per run")
+    parser.add_argument("--products", type=int, default=100, help="Product codes to cycle through")
+    args = parser.parse_args()
+    asyncio.run(main([int(c) for c in args.concurrency.split(",")], args.requests, args.products))
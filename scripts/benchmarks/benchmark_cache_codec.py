@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Cache Entry Codec Benchmark
+---------------------------
+Compares the binary cache entry format against storing the raw body, using
+product-list JSON payloads of increasing size.
+
+For each payload and storage mode it reports the stored size and the encode and
+decode time per entry. When REDIS_URL is set (or --redis-url is given) it also
+writes the entries to Redis and reports SET/GET round-trip throughput and the
+server-side MEMORY USAGE of each key.
+
+Modes:
+- raw:   the body bytes alone (no status or headers, nothing to decode)
+- plain: binary entry without compression
+- zlib:  binary entry, body compressed with zlib
+- zstd:  binary entry, body compressed with zstd (requires the zstandard package)
+
+Usage: python scripts/benchmarks/benchmark_cache_codec.py [--iterations N] [--products 1,20,100] [--redis-url URL]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core import cache_codec
+
+HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", b"0"),
+    (b"x-content-type-options", b"nosniff"),
+]
+
+
+def make_body(product_count: int) -> bytes:
+    """Build a product-list JSON body resembling the products endpoint."""
+    products = []
+    for i in range(product_count):
+        products.append({
+            "code": f"00{i:011d}",
+            "name": f"Smoked Uncured Bacon {i}",
+            "brand": "Example Farms",
+            "description": "Hardwood smoked bacon from pasture-raised pigs, thick cut and uncured.",
+            "ingredients_text": "Pork, water, sea salt, cane sugar, celery powder, cherry powder.",
+            "calories": 80.0 + i % 7,
+            "protein": 5.0,
+            "fat": 6.5,
+            "carbohydrates": 0.0,
+            "salt": 0.9,
+            "meat_type": "pork",
+            "contains_nitrites": False,
+            "contains_phosphates": False,
+            "contains_preservatives": True,
+            "antibiotic_free": True,
+            "hormone_free": True,
+            "pasture_raised": True,
+            "risk_rating": "Yellow",
+            "image_url": f"https://images.example.com/products/00{i:011d}.jpg",
+            "last_updated": "2025-05-25T22:43:09",
+        })
+    return json.dumps(products).encode()
+
+
+def modes():
+    """Return the storage modes to benchmark as (name, encode, decode) tuples."""
+    def raw_encode(body):
+        return body
+
+    def raw_decode(data):
+        return data
+
+    def entry_encode(compress_min_bytes, use_zstd):
+        def encode(body):
+            available = cache_codec.ZSTD_AVAILABLE
+            cache_codec.ZSTD_AVAILABLE = use_zstd
+            try:
+                return cache_codec.encode_entry(200, HEADERS, body, compress_min_bytes=compress_min_bytes)
+            finally:
+                cache_codec.ZSTD_AVAILABLE = available
+        return encode
+
+    result = [
+        ("raw", raw_encode, raw_decode),
+        ("plain", entry_encode(0, False), cache_codec.decode_entry),
+        ("zlib", entry_encode(1, False), cache_codec.decode_entry),
+    ]
+    if cache_codec.ZSTD_AVAILABLE:
+        result.append(("zstd", entry_encode(1, True), cache_codec.decode_entry))
+    return result
+
+
+def time_per_call(fn, arg, iterations: int) -> float:
+    """Return microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def redis_stats(client, key: str, data: bytes, iterations: int):
+    """Return (set us, get us, memory usage bytes) for one entry."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        client.set(key, data)
+    set_us = (time.perf_counter() - start) / iterations * 1e6
+    start = time.perf_counter()
+    for _ in range(iterations):
+        client.get(key)
+    get_us = (time.perf_counter() - start) / iterations * 1e6
+    memory = client.memory_usage(key) or 0
+    client.delete(key)
+    return set_us, get_us, memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cache entry codec")
+    parser.add_argument("--iterations", type=int, default=500, help="Iterations per measurement")
+    parser.add_argument("--products", default="1,20,100", help="Comma-separated product counts per payload")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL"), help="Redis URL for round-trip measurements")
+    args = parser.parse_args()
+
+    client = None
+    if args.redis_url:
+        import redis
+        client = redis.from_url(args.redis_url)
+        client.ping()
+
+    header = f"{'products':>8} {'mode':>6} {'stored':>9} {'ratio':>6} {'encode us':>10} {'decode us':>10}"
+    if client:
+        header += f" {'SET us':>8} {'GET us':>8} {'redis mem':>10}"
+    print(header)
+
+    for count in [int(n) for n in args.products.split(",")]:
+        body = make_body(count)
+        for name, encode, decode in modes():
+            data = encode(body)
+            encode_us = time_per_call(encode, body, args.iterations)
+            decode_us = time_per_call(decode, data, args.iterations)
+            line = (
+                f"{count:>8} {name:>6} {len(data):>9} {len(data) / len(body):>6.2f}"
+                f" {encode_us:>10.1f} {decode_us:>10.1f}"
+            )
+            if client:
+                set_us, get_us, memory = redis_stats(client, f"bench:codec:{name}:{count}", data, args.iterations)
+                line += f" {set_us:>8.1f} {get_us:>8.1f} {memory:>10}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Caching Middleware Benchmark
+----------------------------
+Measures the per-request overhead of CachingMiddleware against the bare app,
+calling the ASGI stack directly so no network or server noise is included.
+
+Three cases are timed for each payload size:
+- none: the app without any caching middleware
+- miss: every request uses a fresh query string, so the middleware streams and stores
+- hit:  the same request repeated, answered from the local cache
+
+Usage: python scripts/benchmarks/benchmark_caching_middleware.py [--requests N] [--sizes 1024,65536,1048576]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.middleware.caching import CachingMiddleware
+
+
+def make_app(body_size: int, chunk_size: int = 16384):
+    """Build a minimal ASGI app streaming a JSON-ish body in chunks."""
+    body = b"x" * body_size
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(body_size).encode())],
+        })
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+
+    return app
+
+
+async def run_requests(app, count: int, vary_query: bool) -> float:
+    """Send count requests through app and return seconds per request."""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for i in range(count):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/v1/products/0025317005104",
+            "query_string": f"n={i}".encode() if vary_query else b"",
+            "headers": [],
+        }
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / count
+
+
+async def main(requests: int, sizes):
+    print(f"{'size':>10} {'none (us)':>12} {'miss (us)':>12} {'hit (us)':>12} {'miss overhead':>14}")
+    for size in sizes:
+        inner = make_app(size)
+        bare = await run_requests(inner, requests, vary_query=True)
+        miss = await run_requests(CachingMiddleware(inner, ttl=60), requests, vary_query=True)
+        hit_app = CachingMiddleware(inner, ttl=60)
+        await run_requests(hit_app, 1, vary_query=False)
+        hit = await run_requests(hit_app, requests, vary_query=False)
+        print(f"{size:>10} {bare * 1e6:>12.1f} {miss * 1e6:>12.1f} {hit * 1e6:>12.1f} {(miss - bare) * 1e6:>12.1f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the response caching middleware")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per case")
+    parser.add_argument("--sizes", default="1024,65536,1048576", help="Comma-separated body sizes in bytes")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, [int(s) for s in args.sizes.split(",")]))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Response Compression Benchmark
+------------------------------
+Reports bandwidth and latency of CompressionMiddleware on representative
+product payloads, for each content coding (identity, gzip and, when the brotli
+package is installed, br).
+
+For every payload and coding it prints:
+- bytes on the wire and the ratio to the uncompressed body
+- server time per request on a cache miss (app + compression + cache store)
+  and on a cache hit (replayed from the in-process cache, no compression)
+- estimated transfer time at --mbps, to set against the added server time
+
+The ASGI stack is called directly, as in benchmark_caching_middleware.py, so no
+network or server noise is included.
+
+Usage: python scripts/benchmarks/benchmark_compression.py [--requests N] [--mbps 10]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import sys
+import time
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.cache import TieredResponseCache
+from app.middleware.caching import CachePolicy, CachingMiddleware
+from app.middleware.compression import BROTLI_AVAILABLE, CompressionMiddleware
+
+INGREDIENTS = (
+    "Pork, water, sea salt, cane sugar, celery powder, cherry powder, natural flavorings, "
+    "vinegar, spices (black pepper, paprika, garlic), sodium phosphate, sodium erythorbate."
+)
+
+
+def make_product(i: int, image_bytes: int = 0) -> dict:
+    """Build a product resembling the products endpoint output."""
+    product = {
+        "code": f"00{i:011d}",
+        "name": f"Smoked Uncured Bacon {i}",
+        "brand": "Example Farms",
+        "description": "Hardwood smoked bacon from pasture-raised pigs, thick cut and uncured.",
+        "ingredients_text": INGREDIENTS,
+        "calories": 80.0 + i % 7,
+        "protein": 5.0,
+        "fat": 6.5,
+        "carbohydrates": 0.0,
+        "salt": 0.9,
+        "meat_type": "pork",
+        "contains_nitrites": False,
+        "contains_phosphates": True,
+        "contains_preservatives": True,
+        "antibiotic_free": True,
+        "hormone_free": True,
+        "pasture_raised": True,
+        "risk_rating": "Yellow",
+        "image_url": f"https://images.example.com/products/00{i:011d}.jpg",
+        "last_updated": "2025-05-25T22:43:09",
+    }
+    if image_bytes:
+        # JPEG data is already compressed; random bytes model it closely
+        product["image_data"] = base64.b64encode(random.Random(i).randbytes(image_bytes)).decode()
+    return product
+
+
+def payloads():
+    """Return (name, body) pairs of representative responses."""
+    return [
+        ("product", json.dumps(make_product(1)).encode()),
+        ("product+image", json.dumps(make_product(1, image_bytes=40 * 1024)).encode()),
+        ("list 20", json.dumps([make_product(i) for i in range(20)]).encode()),
+        ("list 100", json.dumps([make_product(i) for i in range(100)]).encode()),
+        ("recommend", json.dumps({"recommendations": [make_product(i) for i in range(30)]}).encode()),
+    ]
+
+
+def make_app(body: bytes):
+    """Build a minimal ASGI app returning body as JSON."""
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+async def run_requests(app, count: int, accept_encoding: str, vary_query: bool):
+    """Send count requests through app; return (seconds per request, bytes sent per request)."""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    sent = 0
+
+    async def send(message):
+        nonlocal sent
+        if message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    start = time.perf_counter()
+    for i in range(count):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/v1/products/bench",
+            "query_string": f"n={i}".encode() if vary_query else b"",
+            "headers": [(b"accept-encoding", accept_encoding.encode())],
+        }
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / count, sent // count
+
+
+async def main(requests: int, mbps: float):
+    codings = ["identity", "gzip"] + (["br"] if BROTLI_AVAILABLE else [])
+    if not BROTLI_AVAILABLE:
+        print("brotli package not installed; measuring identity and gzip only")
+
+    print(
+        f"{'payload':>14} {'coding':>8} {'bytes':>9} {'ratio':>6} {'miss us':>9} {'hit us':>8}"
+        f" {'xfer ms':>8} {'miss+xfer ms':>13}"
+    )
+    for name, body in payloads():
+        for coding in codings:
+            def stack():
+                return CachingMiddleware(
+                    CompressionMiddleware(make_app(body)),
+                    policies=[CachePolicy(r"^/api/v1/products/")],
+                    cache=TieredResponseCache(ttl=60),
+                    vary_encoding=True,
+                )
+
+            miss, size = await run_requests(stack(), requests, coding, vary_query=True)
+            hit_app = stack()
+            await run_requests(hit_app, 1, coding, vary_query=False)
+            hit, _ = await run_requests(hit_app, requests, coding, vary_query=False)
+            transfer = size * 8 / (mbps * 1e6)
+            print(
+                f"{name:>14} {coding:>8} {size:>9} {size / len(body):>6.2f} {miss * 1e6:>9.1f} {hit * 1e6:>8.1f}"
+                f" {transfer * 1e3:>8.2f} {(miss + transfer) * 1e3:>13.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark response compression")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per case")
+    parser.add_argument("--mbps", type=float, default=10.0, help="Link speed for the transfer time estimate")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.mbps))
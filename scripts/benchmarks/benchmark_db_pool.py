@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Database Pool Sizing Benchmark
+------------------------------
+Shows how pool size affects the time requests wait for a connection, using the
+same instrumented pool as the app (app/db/engines.py).
+
+Threads stand in for a worker's threadpool: each repeatedly checks out a
+connection, holds it for --hold-ms (the query time) and returns it. Connections
+go to a throwaway SQLite file, so no database server is needed and the wait
+times reflect pool contention only. For each pool configuration the table shows
+checkouts per second, mean and max wait, connections opened beyond pool_size,
+and checkouts that timed out.
+
+Usage: python scripts/benchmarks/benchmark_db_pool.py [--threads 40] [--hold-ms 5] [--seconds 2]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import create_engine
+
+from app.db.engines import InstrumentedQueuePool, derive_pool_size, track_overflow_connections
+
+
+def run(url: str, threads: int, pool_size: int, max_overflow: int, hold: float, seconds: float, timeout: float):
+    """Load one pool from threads; return its stats."""
+    engine = create_engine(
+        url, poolclass=InstrumentedQueuePool, pool_size=pool_size, max_overflow=max_overflow, pool_timeout=timeout
+    )
+    track_overflow_connections(engine)
+    deadline = time.perf_counter() + seconds
+
+    def work():
+        while time.perf_counter() < deadline:
+            try:
+                connection = engine.connect()
+            except Exception:
+                continue
+            time.sleep(hold)
+            connection.close()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    stats = engine.pool.stats
+    engine.dispose()
+    return stats
+
+
+def main(threads: int, hold_ms: float, seconds: float, timeout: float):
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'pool.db')}"
+        configs = [
+            ("old, one of two", 5, 10),
+            ("derived, 1 worker", *derive_pool_size(1, threads, 60)),
+            ("derived, 4 workers", *derive_pool_size(4, threads, 60)),
+            ("threads", threads, 0),
+        ]
+        print(f"{threads} threads, {hold_ms} ms per checkout, {seconds} s per configuration")
+        print(f"{'pool':>20} {'size':>5} {'overflow':>9} {'checkouts/s':>12} {'mean wait ms':>13} {'max wait ms':>12} {'opened':>7} {'timeouts':>9}")
+        for name, pool_size, max_overflow in configs:
+            stats = run(url, threads, pool_size, max_overflow, hold_ms / 1000, seconds, timeout)
+            mean = stats.wait_seconds / stats.checkouts if stats.checkouts else 0.0
+            print(
+                f"{name:>20} {pool_size:>5} {max_overflow:>9} {stats.checkouts / seconds:>12.0f}"
+                f" {mean * 1000:>13.2f} {stats.max_wait_seconds * 1000:>12.2f}"
+                f" {stats.overflow_connections:>7} {stats.timeouts:>9}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark connection wait times at different pool sizes")
+    parser.add_argument("--threads", type=int, default=40, help="Threads checking out connections")
+    parser.add_argument("--hold-ms", type=float, default=5.0, help="Milliseconds each connection is held")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Duration per pool configuration")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Pool timeout in seconds")
+    args = parser.parse_args()
+    main(args.threads, args.hold_ms, args.seconds, args.timeout)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Product List Pagination Benchmark
+---------------------------------
+Compares OFFSET paging with the keyset (cursor) paging of GET /products
+(app/utils/pagination.py) at growing page depths.
+
+Products go into a throwaway SQLite file, indexed on code and on
+(meat_type, risk_rating, code) as in the keyset pagination migration, so no
+database server is needed. For each depth the table shows the time to fetch one
+page with OFFSET and with a cursor, for the unfiltered list ordered by code and
+for a meat_type filter sorted by risk_rating. OFFSET reads and discards every
+skipped row; a cursor page is one index range scan, so its time stays flat.
+
+Usage: python scripts/benchmarks/benchmark_pagination.py [--products 200000] [--depths 0,1000,10000,100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session
+
+from app.db import models as db_models
+from app.db.projections import PRODUCT_LISTING
+from app.utils.pagination import fetch_page
+
+MEAT_TYPES = ["beef", "chicken", "pork", "turkey", "lamb"]
+RISK_RATINGS = ["Green", "Yellow", "Red", None]
+
+
+def seed(engine, products: int):
+    """Insert synthetic products and the paging indexes."""
+    db_models.Product.__table__.create(engine)
+    random.seed(0)
+    rows = [
+        {
+            "code": f"{random.randrange(10**13):013d}-{i}",
+            "name": f"Product {i}",
+            "meat_type": MEAT_TYPES[i % len(MEAT_TYPES)],
+            "risk_rating": random.choice(RISK_RATINGS),
+            "protein": 10 + i % 20,
+        }
+        for i in range(products)
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(db_models.Product.__table__), rows)
+        connection.execute(text("CREATE INDEX idx_products_meat_risk_code ON products(meat_type, risk_rating, code)"))
+        connection.execute(text("ANALYZE"))
+
+
+def key_at(query, columns, depth: int):
+    """Return the sort key of the row just before depth (the cursor a client would hold)."""
+    order = [column.asc().nulls_last() for column in columns]
+    return list(query.with_entities(*columns).order_by(*order).offset(depth - 1).first())
+
+
+def timed(fn, rounds: int) -> float:
+    """Return the mean seconds per call."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+
+def main(products: int, depths, limit: int, rounds: int):
+    Product = db_models.Product
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'products.db')}")
+        seed(engine, products)
+        cases = [
+            ("by code", lambda db: db.query(Product).options(PRODUCT_LISTING), [Product.code]),
+            (
+                "beef by risk",
+                lambda db: db.query(Product).options(PRODUCT_LISTING).filter(Product.meat_type == "beef"),
+                [Product.risk_rating, Product.code],
+            ),
+        ]
+        print(f"{products} products, {limit} per page, {rounds} rounds")
+        print(f"{'list':>13} {'depth':>8} {'offset ms':>10} {'cursor ms':>10}")
+        with Session(engine) as db:
+            for name, build, columns in cases:
+                for depth in depths:
+                    query = build(db)
+                    if depth >= query.count():
+                        continue
+                    order = [column.asc().nulls_last() for column in columns]
+                    key = key_at(query, columns, depth) if depth else None
+                    offset = timed(lambda: query.order_by(*order).offset(depth).limit(limit + 1).all(), rounds)
+                    cursor = timed(lambda: fetch_page(query, columns, key, limit), rounds)
+                    db.expunge_all()
+                    print(f"{name:>13} {depth:>8} {offset * 1000:>10.2f} {cursor * 1000:>10.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark OFFSET versus keyset pagination of the product list")
+    parser.add_argument("--products", type=int, default=200000, help="Products in the catalog")
+    parser.add_argument("--depths", default="0,1000,10000,100000", help="Comma-separated page depths (rows skipped)")
+    parser.add_argument("--limit", type=int, default=100, help="Page size")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed fetches per depth")
+    args = parser.parse_args()
+    main(args.products, [int(d) for d in args.depths.split(",")], args.limit, args.rounds)
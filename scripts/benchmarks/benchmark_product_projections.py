@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Product Column Projection Benchmark
+-----------------------------------
+Compares loading whole product rows with the per-use-case projections in
+app/db/projections.py, for the queries that read many products: the
+recommendation catalog (every product), similar products for a health
+assessment and alternatives.
+
+Products go into a throwaway SQLite file with a base64 image of --image-kb
+kilobytes each, so no database server is needed. For each query the table shows
+the bytes of column data loaded, the peak Python memory while loading
+(tracemalloc) and the time per load. Against PostgreSQL the bytes loaded are
+also the bytes sent by the database.
+
+Usage: python scripts/benchmarks/benchmark_product_projections.py [--products 2000] [--image-kb 40]
+"""
+
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.db import models as db_models
+from app.db.projections import (
+    PRODUCT_ALTERNATIVE, PRODUCT_DETAIL, PRODUCT_LISTING, PRODUCT_SIMILAR, loaded_columns
+)
+
+MEAT_TYPES = ["beef", "chicken", "pork", "turkey", "lamb"]
+
+
+def seed(engine, products: int, image_kb: int):
+    """Insert synthetic products with images and ingredient lists."""
+    db_models.Product.__table__.create(engine)
+    image = base64.b64encode(os.urandom(image_kb * 768)).decode()
+    ingredients = "pork, water, salt, dextrose, sodium phosphate, sodium erythorbate, sodium nitrite, " * 4
+    with Session(engine) as db:
+        db.add_all(
+            db_models.Product(
+                code=f"{i:013d}",
+                name=f"Product {i}",
+                brand=f"Brand {i % 50}",
+                description=f"Description of product {i}. " * 5,
+                ingredients_text=ingredients,
+                calories=100 + i % 300,
+                protein=10 + i % 20,
+                fat=5 + i % 25,
+                carbohydrates=i % 10,
+                salt=(i % 30) / 10,
+                meat_type=MEAT_TYPES[i % len(MEAT_TYPES)],
+                risk_rating=("Green", "Yellow", "Red")[i % 3],
+                image_url=f"https://images.example.com/{i}.jpg",
+                image_data=image,
+            )
+            for i in range(products)
+        )
+        db.commit()
+
+
+def queries():
+    """Return (name, full query, projected query) builders taking a session."""
+    Product = db_models.Product
+
+    def similar(db, option):
+        return (
+            db.query(Product).options(option)
+            .filter(Product.meat_type == "pork")
+            .filter(Product.ingredients_text.isnot(None))
+            .limit(20)
+        )
+
+    def alternatives(db, option):
+        return (
+            db.query(Product).options(option)
+            .filter(Product.meat_type == "pork")
+            .filter(Product.risk_rating < "Red")
+            .limit(5)
+        )
+
+    return [
+        ("catalog", lambda db, option: db.query(Product).options(option), PRODUCT_LISTING),
+        ("similar", similar, PRODUCT_SIMILAR),
+        ("alternatives", alternatives, PRODUCT_ALTERNATIVE),
+    ]
+
+
+def measure(engine, build, option, rounds: int):
+    """Load a query's rows; return (bytes loaded, peak memory bytes, seconds per load)."""
+    with Session(engine) as db:
+        tracemalloc.start()
+        rows = build(db, option).all()
+        loaded = sum(
+            len(value) if isinstance(value, str) else 8
+            for row in rows
+            for value in loaded_columns(row).values()
+            if value is not None
+        )
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        with Session(engine) as db:
+            build(db, option).all()
+    return loaded, peak, (time.perf_counter() - start) / rounds
+
+
+def main(products: int, image_kb: int, rounds: int):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'products.db')}")
+        seed(engine, products, image_kb)
+        print(f"{products} products, {image_kb} KB image each, {rounds} rounds")
+        print(f"{'query':>13} {'columns':>10} {'loaded KB':>10} {'peak MB':>8} {'ms/load':>8}")
+        for name, build, projection in queries():
+            results = []
+            for label, option in (("all", PRODUCT_DETAIL), ("projected", projection)):
+                loaded, peak, seconds = measure(engine, build, option, rounds)
+                results.append(loaded)
+                print(f"{name:>13} {label:>10} {loaded / 1024:>10.1f} {peak / 2**20:>8.2f} {seconds * 1000:>8.2f}")
+            print(f"{'':>13} {'ratio':>10} {results[0] / max(results[1], 1):>9.1f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark whole product rows versus column projections")
+    parser.add_argument("--products", type=int, default=2000, help="Products in the catalog")
+    parser.add_argument("--image-kb", type=int, default=40, help="Size of each product's base64 image in KB")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed loads per query")
+    args = parser.parse_args()
+    main(args.products, args.image_kb, args.rounds)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+SQL Statistics Overhead Benchmark
+---------------------------------
+Measures what the per-request SQL statistics (app/db/query_stats.py) add to
+each statement: the same primary key lookup runs on a plain engine, on an
+instrumented engine outside a request (process totals only) and inside a
+request (totals plus the request's QueryStats).
+
+Statements go to an in-memory SQLite database, so the times are mostly
+SQLAlchemy and the hooks rather than the database; against PostgreSQL the
+relative overhead is far smaller.
+
+Usage: python scripts/benchmarks/benchmark_query_stats.py [--queries 20000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.db import models as db_models
+from app.db.query_stats import instrument_engine, track_queries
+
+
+def build_engine(instrumented: bool):
+    """Create an in-memory database with a few products."""
+    engine = create_engine("sqlite://")
+    db_models.Product.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(db_models.Product.__table__),
+            [{"code": f"{i:013d}", "name": f"Product {i}"} for i in range(100)],
+        )
+    if instrumented:
+        instrument_engine(engine)
+    return engine
+
+
+def run(engine, queries: int) -> float:
+    """Run primary key lookups; return microseconds per query."""
+    with Session(engine) as db:
+        start = time.perf_counter()
+        for i in range(queries):
+            db.query(db_models.Product.name).filter(db_models.Product.code == f"{i % 100:013d}").first()
+        return (time.perf_counter() - start) / queries * 1e6
+
+
+def main(queries: int):
+    plain = build_engine(instrumented=False)
+    instrumented = build_engine(instrumented=True)
+    run(plain, 1000)  # Warm up the statement caches
+    run(instrumented, 1000)
+
+    print(f"{queries} queries")
+    print(f"{'engine':>24} {'us/query':>9}")
+    print(f"{'plain':>24} {run(plain, queries):>9.1f}")
+    print(f"{'instrumented, no request':>24} {run(instrumented, queries):>9.1f}")
+    with track_queries() as stats:
+        per_query = run(instrumented, queries)
+    print(f"{'instrumented, request':>24} {per_query:>9.1f}")
+    print(f"request recorded {stats.count} queries, {len(stats.shapes)} statement shape(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the per-statement cost of the SQL statistics hooks")
+    parser.add_argument("--queries", type=int, default=20000, help="Lookups per run")
+    args = parser.parse_args()
+    main(args.queries)
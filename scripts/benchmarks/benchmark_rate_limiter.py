@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+Rate Limiter Benchmark
+----------------------
+Compares the sliding window counter used by RateLimitStage with the
+per-request timestamp log it replaced, for many distinct clients.
+
+In-process (always run):
+- log:     a list of request timestamps per client, rebuilt on every request
+- counter: SlidingWindowCounter (two counts per client, idle clients evicted)
+- shared:  SharedMemorySlidingWindowCounter (table in /dev/shm shared by workers)
+Reports time per check and memory held after a simulated minute of traffic
+(the shared table is a fixed-size mapping outside the Python heap).
+
+Redis (with --redis-url or REDIS_URL):
+- log:     sorted set per client, four separate round trips per request
+- counter: one Lua script call per request on a small hash
+Reports p50/p99 latency, checks per second and Redis memory per client.
+
+Usage: python scripts/benchmarks/benchmark_rate_limiter.py [--clients 10000] [--requests 20] [--redis-url URL]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.rate_limit import (
+    SHARED_MEMORY_AVAILABLE,
+    RedisSlidingWindowCounter,
+    SharedMemorySlidingWindowCounter,
+    SlidingWindowCounter,
+)
+from app.core.redis_client import RedisManager
+
+LIMIT = 60
+WINDOW = 60
+
+
+class TimestampLog:
+    """The previous in-memory limiter: every timestamp of the window, per client."""
+
+    def __init__(self, limit: int, window: int):
+        self.limit = limit
+        self.window = window
+        self.requests = {}
+
+    def hit(self, key: str, now: float) -> bool:
+        valid = [t for t in self.requests.get(key, []) if now - t < self.window]
+        valid.append(now)
+        self.requests[key] = valid
+        return len(valid) <= self.limit
+
+
+def traffic(clients: int, requests: int, seed: int = 1):
+    """Return (client, time) pairs: each client sends `requests` requests spread over one window."""
+    rng = random.Random(seed)
+    events = [(f"10.{c // 65536}.{c // 256 % 256}.{c % 256}", rng.uniform(0, WINDOW))
+              for c in range(clients) for _ in range(requests)]
+    events.sort(key=lambda event: event[1])
+    return events
+
+
+def bench_local(name: str, make_limiter, hit, events):
+    """Replay events; print time per check, then memory held afterwards (traced in a second run)."""
+    limiter = make_limiter()
+    start = time.perf_counter()
+    for key, offset in events:
+        hit(limiter, key, 1_000_000.0 + offset)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    limiter = make_limiter()
+    for key, offset in events:
+        hit(limiter, key, 1_000_000.0 + offset)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>8} {elapsed / len(events) * 1e6:>10.2f} {held / 1024:>12.0f}")
+
+
+async def used_memory(client):
+    """Return Redis used_memory, or None where INFO is restricted (some managed services)."""
+    try:
+        return (await client.info("memory"))["used_memory"]
+    except Exception:
+        return None
+
+
+def percentile(values, pct: float) -> float:
+    """Return the pct-th percentile of values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def log_check(manager: RedisManager, key: str) -> None:
+    """One check as the middleware used to do it in Redis."""
+    now = time.time()
+    redis_key = f"bench:log:{key}"
+    await manager.execute("zremrangebyscore", redis_key, 0, now - WINDOW)
+    await manager.execute("zcard", redis_key)
+    await manager.execute("zadd", redis_key, {str(now): now})
+    await manager.execute("expire", redis_key, WINDOW * 2)
+
+
+async def bench_redis(redis_url: str, events, concurrency: int) -> None:
+    """Run the events against Redis with both implementations."""
+    manager = RedisManager(redis_url, max_connections=concurrency)
+    if not await manager.is_available():
+        print(f"Could not connect to Redis at {redis_url}")
+        return
+    client = manager._get_client()
+    counter = RedisSlidingWindowCounter(manager, LIMIT, WINDOW, prefix="bench:counter")
+
+    async def counter_check(_, key: str) -> None:
+        await counter.hit(key)
+
+    print(f"\nRedis ({len(events)} checks, concurrency {concurrency})")
+    print(f"{'impl':>8} {'p50 ms':>8} {'p99 ms':>8} {'checks/s':>10} {'bytes/client':>13}")
+    clients = len({key for key, _ in events})
+    for name, check, pattern in (("log", log_check, "bench:log:*"), ("counter", counter_check, "bench:counter:*")):
+        latencies = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(key: str):
+            async with semaphore:
+                start = time.perf_counter()
+                await check(manager, key)
+                latencies.append(time.perf_counter() - start)
+
+        before = await used_memory(client)
+        start = time.perf_counter()
+        await asyncio.gather(*(one(key) for key, _ in events))
+        wall = time.perf_counter() - start
+        after = await used_memory(client)
+        per_client = f"{(after - before) / clients:.0f}" if before is not None and after is not None else "n/a"
+        print(
+            f"{name:>8} {statistics.median(latencies) * 1e3:>8.2f} {percentile(latencies, 99) * 1e3:>8.2f}"
+            f" {len(events) / wall:>10.0f} {per_client:>13}"
+        )
+        async for key in client.scan_iter(pattern, count=1000):
+            await client.delete(key)
+    await manager.close()
+
+
+def main(clients: int, requests: int, redis_url, concurrency: int):
+    events = traffic(clients, requests)
+    print(f"In-process ({clients} clients, {requests} requests each within one window)")
+    print(f"{'impl':>8} {'us/check':>10} {'held KiB':>12}")
+    bench_local("log", lambda: TimestampLog(LIMIT, WINDOW), lambda l, k, t: l.hit(k, t), events)
+    bench_local("counter", lambda: SlidingWindowCounter(LIMIT, WINDOW), lambda l, k, t: l.hit(k, now=t), events)
+    if SHARED_MEMORY_AVAILABLE:
+        with tempfile.TemporaryDirectory(dir="/dev/shm" if os.path.isdir("/dev/shm") else None) as directory:
+            slots = max(65536, clients * 2)
+            tables = iter(range(2))
+            bench_local(
+                "shared",
+                lambda: SharedMemorySlidingWindowCounter(directory, f"bench{next(tables)}", LIMIT, WINDOW, slots=slots),
+                lambda l, k, t: l.hit(k, now=t),
+                events,
+            )
+
+    if redis_url:
+        asyncio.run(bench_redis(redis_url, events, concurrency))
+    else:
+        print("\nSet REDIS_URL or pass --redis-url to benchmark the Redis implementations")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the rate limiter implementations")
+    parser.add_argument("--clients", type=int, default=10000, help="Distinct client IPs")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL"), help="Redis URL (defaults to REDIS_URL)")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent Redis checks")
+    args = parser.parse_args()
+    main(args.clients, args.requests, args.redis_url, args.concurrency)
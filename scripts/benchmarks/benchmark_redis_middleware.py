@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Redis Middleware Latency Benchmark
+----------------------------------
+Measures request latency under concurrent load for the Redis round trips made
+by the rate limit stage and CachingMiddleware, and how long the event loop is
+stalled while they run.
+
+Two cases are timed:
+- blocking: the same commands issued with the synchronous redis client from
+  inside the coroutine, as the middlewares used to do
+- async:    the shared RedisManager (redis.asyncio pool, one pipeline per request)
+
+Each simulated request does what the middlewares do on a cache miss: the
+rate-limit pipeline, a cache lookup and a cache store. A ticker task records
+the worst delay in waking up, i.e. how long other requests were blocked.
+
+Requires a Redis server.
+
+Usage: python scripts/benchmarks/benchmark_redis_middleware.py [--redis-url URL] [--requests N] [--concurrency 1,10,50]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.redis_client import RedisManager
+
+BODY = b"x" * 4096
+WINDOW = 60
+
+
+def rate_limit_commands(pipe, key: str, now: float) -> None:
+    """Queue the commands of one rate-limit check."""
+    pipe.zremrangebyscore(key, 0, now - WINDOW)
+    pipe.zadd(key, {str(now): now})
+    pipe.zcard(key)
+    pipe.zrange(key, 0, 0, withscores=True)
+    pipe.expire(key, WINDOW * 2)
+
+
+async def blocking_request(client, n: int) -> None:
+    """One request using the synchronous client (blocks the event loop)."""
+    now = time.time()
+    pipe = client.pipeline(transaction=False)
+    rate_limit_commands(pipe, f"bench:ratelimit:{n % 100}", now)
+    pipe.execute()
+    pipe = client.pipeline(transaction=False)
+    pipe.get(f"bench:cache:{n}")
+    pipe.pttl(f"bench:cache:{n}")
+    pipe.execute()
+    client.setex(f"bench:cache:{n}", WINDOW, BODY)
+
+
+async def async_request(manager: RedisManager, n: int) -> None:
+    """One request using the shared async manager."""
+    now = time.time()
+    await manager.pipeline(lambda pipe: rate_limit_commands(pipe, f"bench:ratelimit:{n % 100}", now))
+
+    def lookup(pipe) -> None:
+        pipe.get(f"bench:cache:{n}")
+        pipe.pttl(f"bench:cache:{n}")
+
+    await manager.pipeline(lookup)
+    await manager.execute("setex", f"bench:cache:{n}", WINDOW, BODY)
+
+
+async def run_case(handler, target, requests: int, concurrency: int):
+    """Run requests with the given concurrency; return latencies (s), wall time (s) and max loop lag (s)."""
+    latencies = []
+    max_lag = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal max_lag
+        interval = 0.001
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            max_lag = max(max_lag, time.perf_counter() - start - interval)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(n: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(target, n)
+            latencies.append(time.perf_counter() - start)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(requests)))
+    wall = time.perf_counter() - start
+    done.set()
+    await tick
+    return latencies, wall, max_lag
+
+
+def percentile(values, pct: float) -> float:
+    """Return the pct-th percentile of values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def main(redis_url: str, requests: int, levels):
+    import redis
+
+    sync_client = redis.from_url(redis_url)
+    sync_client.ping()
+    manager = RedisManager(redis_url, max_connections=max(levels))
+    if not await manager.is_available():
+        print(f"Could not connect to Redis at {redis_url}")
+        return
+
+    print(f"{'mode':>9} {'conc':>5} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>9} {'loop lag ms':>12}")
+    for concurrency in levels:
+        for name, handler, target in (
+            ("blocking", blocking_request, sync_client),
+            ("async", async_request, manager),
+        ):
+            latencies, wall, lag = await run_case(handler, target, requests, concurrency)
+            print(
+                f"{name:>9} {concurrency:>5} {statistics.median(latencies) * 1e3:>8.2f}"
+                f" {percentile(latencies, 99) * 1e3:>8.2f} {requests / wall:>9.0f} {lag * 1e3:>12.2f}"
+            )
+
+    for key in sync_client.scan_iter("bench:*"):
+        sync_client.delete(key)
+    await manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Redis round trips of the rate-limit and caching middleware")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL"), help="Redis URL (defaults to REDIS_URL)")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per case")
+    parser.add_argument("--concurrency", default="1,10,50", help="Comma-separated concurrency levels")
+    args = parser.parse_args()
+    if not args.redis_url:
+        parser.error("a Redis server is required: set REDIS_URL or pass --redis-url")
+    asyncio.run(main(args.redis_url, args.requests, [int(c) for c in args.concurrency.split(",")]))
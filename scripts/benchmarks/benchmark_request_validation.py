@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Request Body Validation Benchmark
+---------------------------------
+Compares the streaming BodyScanner used by RequestValidationStage with the
+previous check (json.loads, json.dumps, then eight regexes with ".*?" gaps).
+
+Cases:
+- typical bodies (preferences update, product create) and a large benign body
+- adversarial bodies that make the old regexes backtrack ("select " repeated
+  with no "from ... ;"), at growing sizes; the old check is quadratic or worse
+  on them, so keep --adversarial-kb small
+
+Usage: python scripts/benchmarks/benchmark_request_validation.py [--repeat N] [--adversarial-kb 4,16,64]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.middleware.validation import BodyScanner
+
+OLD_PATTERNS = [re.compile(pattern) for pattern in (
+    r"(?i)<script.*?>.*?</script.*?>",
+    r"(?i)javascript\s*:",
+    r"(?i)on\w+\s*=",
+    r"(?i)select.*?from.*?;",
+    r"(?i)union.*?select",
+    r"(?i)insert.*?into",
+    r"(?i)drop.*?table",
+    r"(?i)delete.*?from",
+)]
+
+CHUNK = 64 * 1024  # Typical ASGI server read size
+
+
+def old_check(body: bytes) -> bool:
+    """The previous middleware check."""
+    body_str = json.dumps(json.loads(body))
+    return any(pattern.search(body_str) for pattern in OLD_PATTERNS)
+
+
+def new_check(body: bytes) -> bool:
+    """Feed the body to BodyScanner in server-sized chunks."""
+    scanner = BodyScanner()
+    for start in range(0, len(body), CHUNK):
+        if scanner.feed(body[start:start + CHUNK], final=start + CHUNK >= len(body)):
+            return True
+    return False
+
+
+def time_check(check, body: bytes, repeat: int) -> float:
+    """Return seconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        check(body)
+    return (time.perf_counter() - start) / repeat
+
+
+def bodies(adversarial_kb):
+    """Return (name, body, repeat divisor) cases."""
+    preferences = {
+        "nutrition_focus": "protein",
+        "avoid_preservatives": True,
+        "meat_preferences": ["chicken", "beef", "pork"],
+        "prefer_antibiotic_free": True,
+        "prefer_grass_fed": False,
+        "cooking_style": "grilling",
+    }
+    product = {
+        "code": "0012345678905",
+        "name": "Applewood Smoked Uncured Bacon",
+        "brand": "Example Farms",
+        "description": "Thick cut bacon from pasture-raised pigs, smoked over applewood. " * 3,
+        "ingredients_text": "Pork, water, sea salt, cane sugar, celery powder, cherry powder, natural flavorings.",
+        "meat_type": "pork",
+        "calories": 80.0, "protein": 5.0, "fat": 6.5, "carbohydrates": 0.0, "salt": 0.9,
+        "contains_nitrites": False, "contains_phosphates": False, "contains_preservatives": True,
+        "image_url": "https://images.example.com/products/0012345678905.jpg",
+    }
+    cases = [
+        ("preferences", json.dumps(preferences).encode(), 1),
+        ("product", json.dumps(product).encode(), 1),
+        ("products 1MB", json.dumps([product] * 700).encode(), 1000),
+    ]
+    for kb in adversarial_kb:
+        cases.append((f"select x {kb}KB", json.dumps({"q": "select " * (kb * 1024 // 7)}).encode(), 1000))
+    return cases
+
+
+def main(repeat: int, adversarial_kb):
+    print(f"{'body':>18} {'bytes':>9} {'old us':>12} {'new us':>10} {'speedup':>8}")
+    for name, body, divisor in bodies(adversarial_kb):
+        runs = max(1, repeat // divisor)
+        old = time_check(old_check, body, runs)
+        new = time_check(new_check, body, runs)
+        print(f"{name:>18} {len(body):>9} {old * 1e6:>12.1f} {new * 1e6:>10.1f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark request body validation")
+    parser.add_argument("--repeat", type=int, default=2000, help="Calls per small-body case")
+    parser.add_argument("--adversarial-kb", default="4,16,64", help="Comma-separated adversarial body sizes in KiB")
+    args = parser.parse_args()
+    main(args.repeat, [int(kb) for kb in args.adversarial_kb.split(",")])
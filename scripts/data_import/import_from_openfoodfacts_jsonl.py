@@ -35,6 +35,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Add the project root to the path so the cache purge helper can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from scripts.utils.cache_purge import purge_product_cache
+
 # Load environment variables
 load_dotenv()
 
@@ -286,14 +290,20 @@ class JSONLProductImporter:
     
     async def process_batch(self, batch):
         """Process a batch of products"""
-        tasks = []
+        products = []
         for raw_product in batch:
             product_data = self.process_product_data(raw_product)
             if product_data:
-                tasks.append(self.save_product(product_data))
+                products.append(product_data)
         
-        if tasks:
-            await asyncio.gather(*tasks)
+        if products:
+            results = await asyncio.gather(*(self.save_product(product) for product in products))
+            saved = [product for product, ok in zip(products, results) if ok]
+            # New products change the cached catalog responses
+            await purge_product_cache(
+                [product['code'] for product in saved],
+                [product['meat_type'] for product in saved]
+            )
     
     async def import_products(self):
         """Import products from the JSONL file"""
@@ -35,6 +35,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Add the project root to the path so the cache purge helper can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from scripts.utils.cache_purge import purge_product_cache
+
 # Load environment variables
 load_dotenv()
 
@@ -296,6 +300,7 @@ class StrictProductImporter:
             # Save the product
             if await self.save_product(structured_product):
                 products_added += 1
+                await purge_product_cache([structured_product['code']], [structured_product['meat_type']])
                 logger.info(f"Added product {products_added}/{self.target_count}: {structured_product['name']} ({structured_product['meat_type']})")
         
         # Log completion
@@ -37,6 +37,10 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Add the project root to the path so the cache purge helper can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from scripts.utils.cache_purge import purge_product_cache
+
 # Load environment variables
 load_dotenv()
 
@@ -657,6 +661,7 @@ class PopularMeatProductImporter:
                 continue
             
             # Process products
+            saved_products = []
             for product in products:
                 if products_added >= self.target_count:
                     break
@@ -665,12 +670,19 @@ class PopularMeatProductImporter:
                 if processed_product:
                     if await self.save_product(processed_product):
                         products_added += 1
+                        saved_products.append(processed_product)
                         logger.info(f"Added product: {processed_product['code']} - {processed_product['name']} ({processed_product['meat_type']}, {processed_product['processing_method']})")
                         
                         # Process ingredients periodically
                         if len(self.pending_ingredients) >= 60:
                             await self.process_ingredients()
             
+            # New products change the cached catalog responses
+            await purge_product_cache(
+                [p['code'] for p in saved_products],
+                [p['meat_type'] for p in saved_products]
+            )
+            
             # Move to next page
             page_number += 1
             
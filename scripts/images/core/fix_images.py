@@ -24,8 +24,13 @@ from urllib.parse import quote, urlparse
 import random
 import re
 import json
+import sys
 import time
 
+# Add the project root to the path so the cache purge helper can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from scripts.utils.cache_purge import purge_product_cache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -436,6 +441,7 @@ class ImageFixer:
                 SELECT 
                     code,
                     name,
+                    meat_type,
                     image_url
                 FROM products 
                 WHERE 
@@ -462,6 +468,10 @@ class ImageFixer:
                     stats['fixed'] += sum(1 for r in results if r)
                     stats['failed'] += sum(1 for r in results if not r)
                     
+                    # Drop cached API responses that show the broken image
+                    fixed = [p for p, r in zip(batch, results) if r]
+                    await purge_product_cache([p['code'] for p in fixed], [p['meat_type'] for p in fixed])
+                    
                     # Progress update
                     elapsed = datetime.now() - self.start_time
                     remaining = self.end_time - datetime.now()
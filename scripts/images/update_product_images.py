@@ -32,6 +32,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Add the project root to the path so the cache purge helper can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from scripts.utils.cache_purge import purge_product_cache
+
 # Load environment variables
 load_dotenv()
 
@@ -102,7 +106,7 @@ class ProductImageUpdater:
         try:
             async with self.pool.acquire() as conn:
                 query = """
-                    SELECT id, code, name FROM products 
+                    SELECT id, code, name, meat_type FROM products 
                     WHERE image_url = '' OR image_url IS NULL
                 """
                 
@@ -278,6 +282,13 @@ class ProductImageUpdater:
                 if isinstance(result, Exception):
                     logger.error(f"Error processing product: {str(result)}")
                     self.failed_count += 1
+            
+            # Drop cached API responses that show the old image
+            updated = [product for product, result in zip(batch, results) if result is True]
+            await purge_product_cache(
+                [product['code'] for product in updated],
+                [product['meat_type'] for product in updated]
+            )
     
     async def update_images(self):
         """Update product image URLs"""
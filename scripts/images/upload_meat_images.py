@@ -25,6 +25,10 @@ from urllib.parse import quote
 import asyncio
 import aiohttp
 
+# Add the project root to the path so the cache purge helper can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from scripts.utils.cache_purge import purge_product_cache
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -139,7 +143,7 @@ class ImageUploader:
             logger.error(f"Error processing image for {product_code}: {str(e)}")
             return None
 
-    async def update_product_image(self, product_code: str, image_url: str):
+    async def update_product_image(self, product_code: str, image_url: str, meat_type: Optional[str] = None):
         """Update product's image URL in database"""
         try:
             self.supabase.table('products') \
@@ -147,6 +151,7 @@ class ImageUploader:
                 .eq('code', product_code) \
                 .execute()
             logger.info(f"Updated image URL for product {product_code}")
+            await purge_product_cache([product_code], [meat_type])
         except Exception as e:
             logger.error(f"Error updating product {product_code}: {str(e)}")
 
@@ -163,7 +168,7 @@ class ImageUploader:
             storage_url = await self.download_and_upload_image(image_url, product['code'])
             if storage_url:
                 # Update database
-                await self.update_product_image(product['code'], storage_url)
+                await self.update_product_image(product['code'], storage_url, product.get('meat_type'))
                 logger.info(f"Successfully processed {product['name']}")
             else:
                 logger.warning(f"Failed to process image for {product['name']}")
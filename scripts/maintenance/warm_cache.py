@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Cache Warmer
+------------
+Pre-populates the API response cache for the most scanned products (recent
+scans weighted more), e.g. after a deploy or a Redis flush, or from cron.
+
+With --base-url the running API is called over HTTP, which warms Redis and the
+L1 of whichever worker answers. Without it the app is called in-process, which
+only helps other processes when REDIS_URL is set. Set CACHE_WARMER_TOKEN to the
+API's value so HTTP warming is exempt from rate limiting; without it the warmer
+is paced below RATE_LIMIT_PER_MINUTE.
+
+Health assessments are cached in each API process, so they are only warmed by
+the API itself (CACHE_WARM_ON_STARTUP / CACHE_WARM_INTERVAL), not from here.
+
+Usage: python scripts/maintenance/warm_cache.py [--base-url URL] [--top N]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Add the project root to the path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Load environment variables
+load_dotenv()
+
+from app.core.config import settings
+from app.services.cache_warming import warm_response_cache
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main(base_url, top: int) -> int:
+    app = None
+    if not base_url:
+        if not settings.REDIS_URL:
+            logger.warning("REDIS_URL not set: in-process warming will not reach the API's cache")
+        from app.main import app
+
+    stats = await warm_response_cache(app=app, base_url=base_url, limit=top, health_limit=0)
+    failed = stats["responses"]["failed"] + stats["health_assessments"]["failed"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the API response cache for popular products")
+    parser.add_argument("--base-url", help="URL of the running API (default: call the app in-process)")
+    parser.add_argument("--top", type=int, default=settings.CACHE_WARM_TOP_N, help="Number of products to warm")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.base_url, args.top)))
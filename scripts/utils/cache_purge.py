@@ -0,0 +1,53 @@
+"""Purge cached API responses after scripts write to the products table.
+
+Scripts update the database directly, bypassing the API, so they have to
+tell the API's response cache which products changed. This deletes the Redis
+entries tagged with those products and publishes the keys so every API
+process drops them from its in-process cache.
+
+Without REDIS_URL the API caches only in process; nothing can be purged from
+here and entries expire after REDIS_TTL.
+"""
+
+import logging
+import os
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+
+from app.core.cache import product_write_tags, purge_redis_tags
+from app.core.redis_client import get_redis_manager
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_product_cache(codes: Iterable[str], meat_types: Optional[Iterable[Optional[str]]] = None) -> int:
+    """
+    Purge cached API responses for products written by a script.
+
+    Never raises: a failed purge only means entries live until their TTL.
+
+    Args:
+        codes: Codes of the inserted, updated or deleted products
+        meat_types: Their meat types, if known (alternatives are cached per meat type)
+
+    Returns:
+        int: Number of cache entries purged
+    """
+    codes = list(codes)
+    if not codes:
+        return 0
+    redis = get_redis_manager(os.getenv("REDIS_URL"))
+    if redis is None:
+        logger.debug("REDIS_URL not set, skipping API cache purge")
+        return 0
+    tags = product_write_tags(codes, meat_types or [])
+    keys = await purge_redis_tags(redis, tags, origin="scripts")
+    if keys is None:
+        logger.warning(f"Failed to purge API cache for {len(codes)} products")
+        return 0
+    logger.info(f"Purged {len(keys)} cached API responses for {len(codes)} products")
+    return len(keys)
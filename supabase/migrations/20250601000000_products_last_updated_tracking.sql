@@ -0,0 +1,42 @@
+-- Products last_updated Tracking Migration
+-- The API derives ETag / Last-Modified validators for product responses from
+-- products.last_updated, so it must change on every write, not only on writes
+-- made through the SQLAlchemy ORM (which sets it via onupdate).
+
+-- =====================================================
+-- 1. KEEP last_updated CURRENT ON EVERY UPDATE
+-- =====================================================
+-- The original update_products_updated_at trigger sets an updated_at column
+-- that the products table does not have; replace it with one that maintains last_updated.
+
+DROP TRIGGER IF EXISTS update_products_updated_at ON public.products;
+
+-- Backfill before the new trigger exists so rows keep their creation time
+UPDATE public.products SET last_updated = COALESCE(created_at, NOW()) WHERE last_updated IS NULL;
+
+CREATE OR REPLACE FUNCTION public.touch_products_last_updated()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path = ''
+AS $$
+BEGIN
+    NEW.last_updated = NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS touch_products_last_updated ON public.products;
+
+CREATE TRIGGER touch_products_last_updated
+    BEFORE UPDATE ON public.products
+    FOR EACH ROW
+    EXECUTE FUNCTION public.touch_products_last_updated();
+
+-- =====================================================
+-- 2. INDEX FOR CONDITIONAL REQUEST METADATA
+-- =====================================================
+-- MAX(last_updated) backs the validators of the product count endpoint
+CREATE INDEX IF NOT EXISTS idx_products_last_updated ON public.products(last_updated DESC);
+
+COMMENT ON FUNCTION public.touch_products_last_updated IS
+'Sets products.last_updated on every update so API ETag / Last-Modified validators change with the row.';
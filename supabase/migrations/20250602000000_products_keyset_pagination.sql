@@ -0,0 +1,16 @@
+-- Products Keyset Pagination Migration
+-- GET /products pages with WHERE (sort key) > (last key) ORDER BY sort key,
+-- where the sort key is code, (meat_type, code) or (risk_rating, code). These
+-- indexes let every filter and sort combination read a page as one index
+-- range scan; idx_products_code_pagination already covers the unfiltered case.
+
+-- meat_type filter ordered by code, or sort by meat_type
+CREATE INDEX IF NOT EXISTS idx_products_meat_type_code ON public.products(meat_type, code);
+
+-- risk_rating filter ordered by code, or sort by risk_rating
+CREATE INDEX IF NOT EXISTS idx_products_risk_rating_code ON public.products(risk_rating, code);
+
+-- meat_type and risk_rating filters ordered by code, or meat_type filter sorted by risk_rating
+CREATE INDEX IF NOT EXISTS idx_products_meat_risk_code ON public.products(meat_type, risk_rating, code);
+
+ANALYZE public.products;
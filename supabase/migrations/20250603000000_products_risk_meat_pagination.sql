@@ -0,0 +1,9 @@
+-- Products Risk/Meat Keyset Pagination Migration
+-- GET /products filtered by risk_rating and sorted by meat_type pages on
+-- (meat_type, code) within one risk rating. None of the keyset pagination
+-- indexes covers that order, so the page was sorted after a filter scan.
+
+-- risk_rating filter sorted by meat_type
+CREATE INDEX IF NOT EXISTS idx_products_risk_meat_code ON public.products(risk_rating, meat_type, code);
+
+ANALYZE public.products;